@@ -0,0 +1,574 @@
+#!/usr/bin/env python
+"""
+Gallery Script Benchmarks
+
+Generates a synthetic gallery (any number of categories and images, with file names in
+the styles found in docs/images/gallery such as "Ada GP.jpg", "850_0761.jpg" or
+"autumn road.jpg") in a scratch folder and times each phase of the publishing pipeline
+against it:
+
+  scan_glob                   the Path.glob walk scan_gallery_folders used before the scan cache,
+                              for comparison (no budget)
+  scan_cold / scan_warm       update_gallery_data.scan_gallery_folders without / with the scan cache
+  scan_one_changed            the same with one new file in one category, so only that folder
+                              is listed again
+  merge_new / merge_existing  update_gallery_json into an empty / an up-to-date catalogue
+  merge_delta                 patch_gallery_data with the change scan_one_changed found, as a
+                              warm run of update_gallery_data.py merges it
+  save                        save_gallery_data
+  validate_local              the local and unreferenced checks of validate_gallery.py
+  validate_s3_head / _list    the S3 checks, against a fake_s3.py stand-in for the bucket
+                              that adds --latency milliseconds to every response
+  validate_s3_head_serial     the HEAD checks one at a time (--jobs 1), on the first
+                              SERIAL_S3_IMAGES images of the sample; the speedup of the
+                              concurrent checks per image is printed and saved as
+                              "s3_head_speedup"
+  sync_plan_cold / _warm      sync_s3 scan + build_sync_plan without / with a manifest
+  dimensions_header / _decode the size of a DIMENSIONS_IMAGE_SIZE JPEG, DIMENSIONS_READS times,
+                              from its header (image_headers.read_image_size, as the updater
+                              does) and by decoding it with Pillow; the speedup is saved as
+                              "dimensions_speedup" (skipped without Pillow)
+  cli_help                    `python joyful.py --help` in a new process (the best of a few runs)
+  log_open_per_line / _queued LOG_BENCHMARK_LINES debug log lines written the way log_message
+                              did before gallery_logging.py (open, append, close per line) and
+                              through gallery_logging's queued writer, each in a new process
+                              with the console kept in memory; the write syscalls each made
+                              (from /proc/self/io, Linux only) are saved as "log_write_syscalls"
+
+With --merge-scaling, update_gallery_json is also timed on in-memory catalogues of
+MERGE_SCALING_SIZES images (1k to 1M, into an empty and an up-to-date catalogue), and
+reported in microseconds per image under "merge_scaling". The merge is meant to be
+linear, so the run fails if the time per image at the largest size is more than
+MERGE_SCALING_LIMIT times that at the smallest.
+
+With --memory, the saved catalogue is also loaded once as plain dicts (json.load) and
+once as gallery_catalog.py records, and the memory each holds afterwards and at its peak
+is reported under "memory_mb" (traced with tracemalloc, which slows loading down a lot).
+
+Results are written as JSON. Each phase is also checked against the per-image budget in
+benchmark_thresholds.json (microseconds per image; cli_help has a fixed budget in
+milliseconds, cli_help_ms) and, with --baseline, against an
+earlier results file; the run exits with status 1 if any phase regressed. A phase with a
+setup cost that does not depend on the number of images, such as the S3 client and its
+connection pool, also gets "<phase>_fixed_ms" milliseconds on top of its per-image budget,
+so small --s3-images samples are not held to a budget sized for large ones. The S3 budgets
+assume the default --latency, since those phases mostly wait on the network.
+
+Usage:
+    python benchmark_gallery.py --images 20000 --categories 20
+    python benchmark_gallery.py --images 1000000 --root /tmp/big-gallery --keep
+    python benchmark_gallery.py --images 100000 --s3-images 0 --memory
+    python benchmark_gallery.py --startup-only --merge-scaling
+    python benchmark_gallery.py --baseline benchmark-results.json --output new-results.json
+    python benchmark_gallery.py --startup-only
+"""
+
+import os
+import sys
+
+from gallery_logging import setup_logging, print_error, print_success, print_info
+
+SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
+
+import io
+import json
+import time
+import random
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import contextlib
+import tracemalloc
+
+from pathlib import Path
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+import fake_s3
+import gallery_catalog
+import gallery_logging
+import update_gallery_data
+from image_headers import read_image_size
+import validate_gallery
+import sync_s3
+
+DEFAULT_IMAGES = 20000
+DEFAULT_CATEGORIES = 20
+DEFAULT_S3_IMAGES = 2000 # HEAD checks are one request each, so the S3 phases use a sample
+DEFAULT_LATENCY_MS = 20
+# Serial HEAD checks take a full round trip each, so they get a smaller sample
+SERIAL_S3_IMAGES = 100
+DEFAULT_TOLERANCE = 0.25
+THRESHOLDS_PATH = os.path.join(SCRIPT_DIR, 'benchmark_thresholds.json')
+GENERATOR_MARKER = '.benchmark_gallery.json'
+CLI_PATH = os.path.join(SCRIPT_DIR, 'joyful.py')
+STARTUP_RUNS = 5
+LOG_BENCHMARK_LINES = 20000
+DIMENSIONS_IMAGE_SIZE = (4000, 3000)
+DIMENSIONS_READS = 10
+MERGE_SCALING_SIZES = (1000, 10000, 100000, 1000000)
+# A quadratic merge would take ~1000x longer per image at 1M than at 1k; a linear one still
+# slows down a few times per image once its indexes no longer fit in the CPU caches
+MERGE_SCALING_LIMIT = 10.0
+# Timed per process rather than per image; their budgets are "<phase>_ms" in the thresholds file
+STARTUP_PHASES = {'cli_help'}
+# Suffix of the fixed part of a per-image budget, in milliseconds
+FIXED_BUDGET_SUFFIX = '_fixed_ms'
+
+FIRST_NAMES = ["Ada", "Annabelle", "Coco", "Ruby", "Angus", "Hanne", "Abigail", "Gus", "Annie", "Kate", "Josh", "Isla"]
+SUFFIXES = ["GP", "DMI", "class", "Dress", "LOVE", "Baby", "stage", "barre"]
+PLACES = ["Austria", "autumn road", "boats", "Glenfinlas", "Mound", "harbour", "castle", "loch"]
+CATEGORY_NAMES = ["ballet", "edinburgh", "events", "landscape", "portrait", "weddings"]
+
+def synthetic_file_name(rng, index):
+    """A unique file name in one of the styles used by the real gallery"""
+    style = index % 6
+    if style == 0:
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(SUFFIXES)} {index}.jpg"
+    if style == 1:
+        return f"{index // 10000:03d}_{index % 10000:04d}.jpg"
+    if style == 2:
+        return f"{rng.choice(FIRST_NAMES)}_{rng.choice(SUFFIXES)}_{index}.jpg"
+    if style == 3:
+        return f"{rng.choice(PLACES)} {index}.jpg"
+    if style == 4:
+        token = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789') for _ in range(7))
+        return f"i-{token}-{index}.jpeg"
+    return f"{index}.png"
+
+def generate_gallery(root, categories, images, seed=0):
+    """Create docs/images/gallery under `root` with `images` empty files spread over `categories` folders
+
+    A marker file records the parameters, so a kept --root is only regenerated when they change.
+    """
+    settings = {"categories": categories, "images": images, "seed": seed}
+    marker_path = os.path.join(root, GENERATOR_MARKER)
+    try:
+        with open(marker_path, 'r', encoding='utf-8') as f:
+            if json.load(f) == settings:
+                print_info(f"Reusing synthetic gallery in {root}")
+                return
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    gallery_path = os.path.join(root, update_gallery_data.GALLERY_IMAGES_PATH)
+    shutil.rmtree(os.path.join(root, 'docs'), ignore_errors=True)
+    for cache_path in (update_gallery_data.SCAN_CACHE_PATH, update_gallery_data.DIMENSIONS_CACHE_PATH):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(root, cache_path))
+    print_info(f"Generating {images} images in {categories} categories under {root} ...")
+    rng = random.Random(seed)
+    started = time.perf_counter()
+    folders = []
+    for index in range(categories):
+        base_name = CATEGORY_NAMES[index % len(CATEGORY_NAMES)]
+        folders.append(base_name if index < len(CATEGORY_NAMES) else f"{base_name}-{index}")
+    for folder in folders:
+        os.makedirs(os.path.join(gallery_path, folder))
+    for index in range(images):
+        folder = folders[index % categories]
+        with open(os.path.join(gallery_path, folder, synthetic_file_name(rng, index)), 'wb'):
+            pass
+    with open(marker_path, 'w', encoding='utf-8') as f:
+        json.dump(settings, f)
+    print_info(f"Generated the gallery in {time.perf_counter() - started:.1f}s")
+
+@contextlib.contextmanager
+def quiet():
+    """Swallow the per-item console output of the benchmarked functions"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+def timed(results, phase, func, *args, **kwargs):
+    with quiet():
+        started = time.perf_counter()
+        value = func(*args, **kwargs)
+        results[phase] = time.perf_counter() - started
+    print_info(f"{phase:<24} {results[phase]:9.3f}s")
+    return value
+
+def scan_with_glob():
+    """The category scan as it was before the scan cache: Path.glob and is_file() on every entry"""
+    gallery_structure = {}
+    for category_dir in [d for d in Path(update_gallery_data.GALLERY_IMAGES_PATH).iterdir() if d.is_dir()]:
+        gallery_structure[category_dir.name] = [
+            {"file_name": file_path.name, "relative_path": f"gallery/{category_dir.name}/{file_path.name}"}
+            for file_path in category_dir.glob("*")
+            if file_path.is_file() and file_path.suffix.lower() in update_gallery_data.SUPPORTED_EXTENSIONS
+        ]
+    return gallery_structure
+
+def scan_one_changed(folders):
+    """Add a file to one category and scan again; the file is removed afterwards"""
+    category = sorted(folders)[0]
+    path = os.path.join(update_gallery_data.GALLERY_IMAGES_PATH, category, 'benchmark-added.jpg')
+    with open(path, 'wb'):
+        pass
+    try:
+        return update_gallery_data.scan_gallery_folders()
+    finally:
+        os.remove(path)
+
+def read_sizes_from_headers(path, reads=DIMENSIONS_READS):
+    return [read_image_size(path) for _ in range(reads)]
+
+def read_sizes_by_decoding(path, reads=DIMENSIONS_READS):
+    sizes = []
+    for _ in range(reads):
+        with Image.open(path) as image:
+            image.load()
+            sizes.append(image.size)
+    return sizes
+
+def run_dimension_benchmarks(phases, folder):
+    """Time reading image sizes from headers and by full decodes of a camera-sized JPEG"""
+    if Image is None:
+        print_info("Pillow is not installed ('pip install Pillow'); skipping the header vs decode comparison")
+        return
+    path = os.path.join(folder, 'dimensions-benchmark.jpg')
+    Image.new('RGB', DIMENSIONS_IMAGE_SIZE, (90, 120, 150)).save(path, quality=90)
+    try:
+        from_headers = timed(phases, 'dimensions_header', read_sizes_from_headers, path)
+        from_decodes = timed(phases, 'dimensions_decode', read_sizes_by_decoding, path)
+    finally:
+        os.remove(path)
+    if from_headers != from_decodes:
+        print_error(f"Header and decoded sizes differ: {from_headers[0]} vs {from_decodes[0]}")
+
+def run_validation(passes):
+    validate_gallery.run_passes(validate_gallery.iter_catalog_records(validate_gallery.GALLERY_DATA_FILE), passes)
+    return sum(validation_pass.finish() for validation_pass in passes)
+
+def write_s3_sample(path, srcs):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"categories": [{"id": "sample", "name": "Sample", "images": [{"src": src} for src in srcs]}]}, f)
+
+def run_benchmarks(root, args):
+    """Time every phase against the gallery under `root`; returns {phase: seconds}"""
+    phases = {}
+    docs_path = os.path.join(root, 'docs')
+    images_path = os.path.join(docs_path, 'images')
+    os.chdir(root) # update_gallery_data.py works with paths relative to the repository root
+    for cache_path in (update_gallery_data.SCAN_CACHE_PATH, update_gallery_data.GALLERY_DATA_PATH):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(cache_path)
+
+    timed(phases, 'scan_glob', scan_with_glob)
+    folders, _ = timed(phases, 'scan_cold', update_gallery_data.scan_gallery_folders, full_rescan=True)
+    update_gallery_data.save_scan_cache(folders)
+    folders, _ = timed(phases, 'scan_warm', update_gallery_data.scan_gallery_folders)
+    _, changes = timed(phases, 'scan_one_changed', scan_one_changed, folders)
+    structure = update_gallery_data.gallery_structure(folders)
+    data = timed(phases, 'merge_new', update_gallery_data.update_gallery_json, {"categories": []}, structure)
+    data = timed(phases, 'merge_existing', update_gallery_data.update_gallery_json, data, structure)
+    timed(phases, 'merge_delta', update_gallery_data.patch_gallery_data, data, changes)
+    # Take the added entry out again: scan_one_changed has already removed its file
+    update_gallery_data.patch_gallery_data(data, {folder: (removed, added) for folder, (added, removed) in changes.items()})
+    timed(phases, 'save', update_gallery_data.save_gallery_data, data)
+
+    validate_gallery.GALLERY_DATA_FILE = os.path.join(docs_path, 'gallery-data.json')
+    validate_gallery.LOCAL_IMAGE_BASE_PATH = images_path
+    validate_gallery.LOCAL_GALLERY_IMAGE_PATH = os.path.join(images_path, 'gallery')
+    errors = timed(phases, 'validate_local', run_validation,
+                   [validate_gallery.LocalFilesPass(), validate_gallery.UnreferencedFilesPass()])
+    if errors:
+        print_error(f"Local validation of the synthetic gallery reported {errors} errors")
+
+    if args.s3_images:
+        import validate_gallery_s3
+        sample = [img["src"] for category in data["categories"] for img in category["images"]][:args.s3_images]
+        sample_path = os.path.join(docs_path, 'gallery-data-s3-sample.json')
+        write_s3_sample(sample_path, sample)
+        serial_sample_path = os.path.join(docs_path, 'gallery-data-s3-serial-sample.json')
+        write_s3_sample(serial_sample_path, sample[:SERIAL_S3_IMAGES])
+        validate_gallery.GALLERY_DATA_FILE = sample_path
+        with fake_s3.FakeS3Server(latency_ms=args.latency, buckets=[validate_gallery_s3.S3_BUCKET_NAME]) as server:
+            for src in sample:
+                server.put(validate_gallery_s3.S3_BUCKET_NAME, validate_gallery_s3.S3_PREFIX + src, b'\0')
+            validate_gallery_s3.S3_BASE_URL = f"{server.url}/{validate_gallery_s3.S3_BUCKET_NAME}/"
+            for mode in ('head', 'list'):
+                errors = timed(phases, f'validate_s3_{mode}', run_validation,
+                               [validate_gallery.S3Pass(mode=mode, rate_limit=0, retries=0)])
+                if errors:
+                    print_error(f"S3 validation ({mode}) of the synthetic gallery reported {errors} errors")
+            validate_gallery.GALLERY_DATA_FILE = serial_sample_path
+            timed(phases, 'validate_s3_head_serial', run_validation,
+                  [validate_gallery.S3Pass(mode='head', jobs=1, rate_limit=0, retries=0)])
+
+    def plan_sync(manifest_files):
+        local_files = sync_s3.scan_local_files(images_path)
+        return sync_s3.build_sync_plan(local_files, manifest_files, base_path=images_path)
+    uploads, _, _ = timed(phases, 'sync_plan_cold', plan_sync, {})
+    timed(phases, 'sync_plan_warm', plan_sync, dict(uploads))
+    run_dimension_benchmarks(phases, root)
+    return phases
+
+def synthetic_structure(categories, images, seed=0):
+    """An update_gallery_json input (see gallery_structure) for `images` generated file names, without touching the disk"""
+    rng = random.Random(seed)
+    folders = [f"{CATEGORY_NAMES[index % len(CATEGORY_NAMES)]}-{index}" for index in range(categories)]
+    structure = {folder: [] for folder in folders}
+    for index in range(images):
+        folder = folders[index % categories]
+        file_name = synthetic_file_name(rng, index)
+        structure[folder].append({"file_name": file_name, "relative_path": f"gallery/{folder}/{file_name}"})
+    return structure
+
+def best_time(func, *args, runs=1):
+    """(smallest wall-clock time of `runs` calls, value of the last call)"""
+    best = None
+    for _ in range(runs):
+        with quiet():
+            started = time.perf_counter()
+            value = func(*args)
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, value
+
+def measure_merge_scaling(categories, sizes=MERGE_SCALING_SIZES, seed=0):
+    """Microseconds per image of update_gallery_json into an empty and an up-to-date catalogue, per size"""
+    scaling = {}
+    for size in sizes:
+        structure = synthetic_structure(categories, size, seed)
+        # Small sizes finish in a millisecond or so; repeat them to get past timer and scheduling noise
+        runs = max(1, min(5, 100000 // size))
+        new_seconds, data = best_time(lambda: update_gallery_data.update_gallery_json({"categories": []}, structure), runs=runs)
+        existing_seconds, _ = best_time(update_gallery_data.update_gallery_json, data, structure, runs=runs)
+        scaling[str(size)] = {"new": new_seconds * 1e6 / size, "existing": existing_seconds * 1e6 / size}
+        print_info(f"{'merge_scaling':<24} {size:>9} images: {scaling[str(size)]['new']:6.2f} us/image new, "
+                   f"{scaling[str(size)]['existing']:6.2f} us/image existing")
+        del structure, data
+    return scaling
+
+def check_merge_scaling(scaling, limit=MERGE_SCALING_LIMIT):
+    """Messages for merges whose time per image grew more than `limit` times from the smallest size to the largest"""
+    sizes = sorted(scaling, key=int)
+    regressions = []
+    for merge in ('new', 'existing'):
+        smallest, largest = scaling[sizes[0]][merge], scaling[sizes[-1]][merge]
+        if largest > smallest * limit:
+            regressions.append(f"merge_scaling: {merge} merge takes {largest:.2f} us/image at {sizes[-1]} images but "
+                               f"{smallest:.2f} us/image at {sizes[0]}, more than {limit:g}x: not linear")
+    return regressions
+
+def load_catalog_dicts(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def measure_memory(catalog_path):
+    """Memory held after, and at the peak of, loading a catalogue as dicts and as records, in MB"""
+    memory = {}
+    for model, load in (('dicts', load_catalog_dicts), ('records', gallery_catalog.load_catalog)):
+        tracemalloc.start()
+        data = load(catalog_path)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del data
+        memory[model] = {"retained": retained / 2**20, "peak": peak / 2**20}
+        print_info(f"{'memory_' + model:<24} {memory[model]['retained']:9.1f} MB held, {memory[model]['peak']:.1f} MB peak")
+    return memory
+
+def measure_startup(command, runs=STARTUP_RUNS):
+    """Best wall-clock time of `runs` runs of a command; the minimum filters out scheduling noise"""
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=SCRIPT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def run_startup_benchmarks(phases):
+    phases['cli_help'] = measure_startup([sys.executable, CLI_PATH, '--help'])
+    print_info(f"{'cli_help':<24} {phases['cli_help']:9.3f}s")
+
+def write_syscalls():
+    """Write syscalls this process has made so far, or None where /proc/self/io is not available"""
+    try:
+        with open('/proc/self/io', 'r', encoding='ascii') as f:
+            return int(next(line for line in f if line.startswith('syscw:')).split()[1])
+    except (OSError, StopIteration, ValueError):
+        return None
+
+def log_benchmark_child(mode, log_path, lines=LOG_BENCHMARK_LINES):
+    """Run by measure_logging() in a new process: log `lines` lines and print "<seconds> <write syscalls>" to stderr"""
+    messages = [f"upload: gallery/category/image-{index}.jpg" for index in range(lines)]
+    # Keep the console in memory, so only the log file's writes are counted
+    with contextlib.redirect_stdout(io.StringIO()):
+        before = write_syscalls()
+        started = time.perf_counter()
+        if mode == 'queued':
+            gallery_logging.setup_logging(log_path, 'benchmark_gallery.py')
+            for message in messages:
+                gallery_logging.log_message(message, level='DEBUG')
+            gallery_logging.close_logging()
+        else:
+            for message in messages:
+                formatted_message = f"DEBUG: {message}\n"
+                print(formatted_message.strip(), file=sys.stdout)
+                with open(log_path, 'a', encoding='utf-8') as lf:
+                    lf.write(formatted_message)
+        elapsed = time.perf_counter() - started
+        after = write_syscalls()
+    print(elapsed, -1 if before is None else after - before, file=sys.stderr)
+
+def measure_logging(mode):
+    """(seconds, write syscalls or None) for log_benchmark_child(mode)"""
+    with tempfile.TemporaryDirectory(prefix='gallery-log-benchmark-') as folder:
+        code = f"import benchmark_gallery; benchmark_gallery.log_benchmark_child({mode!r}, {os.path.join(folder, 'debug.log')!r})"
+        result = subprocess.run([sys.executable, '-c', code], cwd=SCRIPT_DIR, stdout=subprocess.DEVNULL,
+                                stderr=subprocess.PIPE, text=True, check=True)
+    seconds, syscalls = result.stderr.split()[-2:]
+    return float(seconds), None if int(syscalls) < 0 else int(syscalls)
+
+def run_logging_benchmarks(phases):
+    """Time the two ways of writing the debug log; returns {mode: write syscalls}"""
+    syscalls = {}
+    for mode in ('open_per_line', 'queued'):
+        phases['log_' + mode], syscalls[mode] = measure_logging(mode)
+        print_info(f"{'log_' + mode:<24} {phases['log_' + mode]:9.3f}s"
+                   + (f", {syscalls[mode]} write syscalls" if syscalls[mode] is not None else ""))
+    return syscalls
+
+def check_regressions(phases, images, thresholds, baseline=None, tolerance=DEFAULT_TOLERANCE, s3_images=0):
+    """Compare phase timings with fixed plus per-image budgets and an optional earlier run
+
+    Returns a list of human-readable regression messages (empty if all phases passed).
+    """
+    regressions = []
+    for phase, seconds in phases.items():
+        if phase in STARTUP_PHASES:
+            # A fixed budget only: a few tens of milliseconds vary too much between runs for --tolerance
+            budget = thresholds.get(phase + '_ms')
+            if budget is not None and seconds * 1000 > budget:
+                regressions.append(f"{phase}: {seconds * 1000:.0f} ms exceeds the startup budget of {budget} ms")
+            continue
+        count = s3_images if phase.startswith('validate_s3') else images
+        budget = thresholds.get(phase)
+        fixed = thresholds.get(phase + FIXED_BUDGET_SUFFIX, 0)
+        if budget is not None and count and seconds * 1e6 > fixed * 1000 + budget * count:
+            limit = fixed + budget * count / 1000
+            if fixed:
+                regressions.append(f"{phase}: {seconds * 1000:.0f} ms exceeds the budget of {fixed} ms + "
+                                   f"{budget} us/image ({limit:.0f} ms for {count} images)")
+            else:
+                regressions.append(f"{phase}: {seconds * 1e6 / count:.1f} us/image exceeds the budget of {budget} us/image")
+        previous = (baseline or {}).get(phase)
+        if previous and seconds > previous * (1 + tolerance):
+            regressions.append(f"{phase}: {seconds:.3f}s is more than {tolerance:.0%} slower than the baseline {previous:.3f}s")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the gallery scripts against a synthetic gallery.")
+    parser.add_argument('--images', type=int, default=DEFAULT_IMAGES,
+                        help=f"Number of images to generate (default: {DEFAULT_IMAGES})")
+    parser.add_argument('--categories', type=int, default=DEFAULT_CATEGORIES,
+                        help=f"Number of category folders (default: {DEFAULT_CATEGORIES})")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed for file names (default: 0)")
+    parser.add_argument('--s3-images', type=int, default=DEFAULT_S3_IMAGES,
+                        help=f"Images checked in the S3 phases, 0 to skip them (default: {DEFAULT_S3_IMAGES})")
+    parser.add_argument('--latency', type=float, default=DEFAULT_LATENCY_MS,
+                        help=f"Milliseconds the S3 stand-in waits before each response (default: {DEFAULT_LATENCY_MS})")
+    parser.add_argument('--root', help="Folder for the synthetic gallery (default: a temporary folder)")
+    parser.add_argument('--keep', action='store_true', help="Keep the generated gallery for later runs")
+    parser.add_argument('--output', default='benchmark-results.json',
+                        help="Where to write the results (default: benchmark-results.json)")
+    parser.add_argument('--thresholds', default=THRESHOLDS_PATH,
+                        help="Per-image budgets in microseconds, plus optional fixed ones in milliseconds "
+                             "(default: benchmark_thresholds.json)")
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help=f"Allowed slowdown against --baseline as a fraction (default: {DEFAULT_TOLERANCE})")
+    parser.add_argument('--startup-only', action='store_true',
+                        help="Only time the command line startup, without generating a gallery")
+    parser.add_argument('--memory', action='store_true',
+                        help="Also compare the memory of the catalogue loaded as dicts and as records")
+    parser.add_argument('--merge-scaling', action='store_true',
+                        help="Also time the merge on 1k to 1M image catalogues and check that it scales linearly")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Claim the log before the benchmarked modules set up their own
+    setup_logging(os.path.join(SCRIPT_DIR, 'debug_benchmark.log'), 'benchmark_gallery.py')
+    if args.images < 1 or args.categories < 1:
+        print_error("--images and --categories must be at least 1")
+        sys.exit(2)
+    output_path = os.path.abspath(args.output)
+    phases = {}
+    memory = None
+    merge_scaling = None
+    run_startup_benchmarks(phases)
+    log_syscalls = run_logging_benchmarks(phases)
+    if args.merge_scaling:
+        merge_scaling = measure_merge_scaling(args.categories)
+    if not args.startup_only:
+        root = os.path.abspath(args.root) if args.root else tempfile.mkdtemp(prefix='gallery-benchmark-')
+        os.makedirs(root, exist_ok=True)
+        original_dir = os.getcwd()
+        try:
+            generate_gallery(root, args.categories, args.images, args.seed)
+            phases.update(run_benchmarks(root, args))
+            if args.memory:
+                memory = measure_memory(os.path.join(root, update_gallery_data.GALLERY_DATA_PATH))
+        finally:
+            os.chdir(original_dir)
+            if not args.keep:
+                shutil.rmtree(root, ignore_errors=True)
+
+    results = {
+        "images": args.images,
+        "categories": args.categories,
+        "s3_images": min(args.s3_images, args.images),
+        "latency_ms": args.latency,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "phases": phases,
+    }
+    results["log_write_syscalls"] = log_syscalls
+    if 'dimensions_decode' in phases:
+        results["dimensions_speedup"] = phases['dimensions_decode'] / phases['dimensions_header']
+        print_info(f"Image sizes: {phases['dimensions_header'] * 1e6 / DIMENSIONS_READS:.0f} us from the header, "
+                   f"{phases['dimensions_decode'] * 1e3 / DIMENSIONS_READS:.1f} ms by decoding "
+                   f"({results['dimensions_speedup']:.0f}x speedup)")
+    if memory:
+        results["memory_mb"] = memory
+    if merge_scaling:
+        results["merge_scaling"] = merge_scaling
+    if 'validate_s3_head_serial' in phases:
+        serial_per_image = phases['validate_s3_head_serial'] / min(results["s3_images"], SERIAL_S3_IMAGES)
+        concurrent_per_image = phases['validate_s3_head'] / results["s3_images"]
+        results["s3_head_speedup"] = serial_per_image / concurrent_per_image
+        print_info(f"HEAD checks: {concurrent_per_image * 1000:.2f} ms/image concurrently, {serial_per_image * 1000:.2f} "
+                   f"ms/image serially ({results['s3_head_speedup']:.1f}x speedup)")
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print_info(f"Results written to {output_path}")
+
+    try:
+        with open(args.thresholds, 'r', encoding='utf-8') as f:
+            thresholds = json.load(f)
+    except FileNotFoundError:
+        thresholds = {}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get("phases", {})
+    regressions = check_regressions(phases, args.images, thresholds, baseline, args.tolerance, results["s3_images"])
+    if merge_scaling:
+        regressions.extend(check_merge_scaling(merge_scaling))
+    for message in regressions:
+        print_error(message)
+    if regressions:
+        print_error(f"{len(regressions)} phases regressed.")
+        sys.exit(1)
+    print_success("All phases are within their thresholds.")
+
+if __name__ == "__main__":
+    main()
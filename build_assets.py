@@ -0,0 +1,315 @@
+#!/usr/bin/env python
+"""
+Static Asset Build
+
+Writes a deployable copy of the text assets in docs/ (HTML, CSS, JavaScript and the
+gallery JSON files) to dist/: each file minified, plus .gz and .br siblings compressed
+at maximum level. dist/asset-manifest.json records every output's size and ETag (the
+hex MD5 S3 reports for it), which `sync_s3.py --site` uses to upload only what changed,
+with the matching Content-Encoding.
+
+Minification is deliberately conservative: JSON is re-serialised without whitespace,
+CSS loses comments and insignificant whitespace, HTML loses comments, indentation and
+blank lines, and JavaScript loses comments, indentation and blank lines (line breaks
+stay, so automatic semicolon insertion is unaffected). CSS strings and url(...), and
+JavaScript strings, template literals and regular expressions, are found by a small
+scanner and copied unchanged. Files are only rebuilt when their source size or mtime changed, and the
+work runs in a process pool. Brotli output needs the brotli package ('pip install brotli').
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Configuration
+SOURCE_DIR = "docs"
+OUTPUT_DIR = "dist"
+MANIFEST_NAME = "asset-manifest.json"
+MANIFEST_VERSION = 1
+TEXT_EXTENSIONS = {'.html', '.css', '.js', '.json', '.svg', '.txt', '.xml'}
+SKIP_DIRS = {'images'} # served from S3 by sync_s3.py
+ENCODINGS = {"gzip": ".gz", "br": ".br"}
+
+HTML_COMMENT = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+HTML_PRESERVE = re.compile(r'(<(pre|textarea)\b.*?</\2>)', re.DOTALL | re.IGNORECASE)
+# Comments, strings and unquoted url(...) values, whichever starts first
+CSS_LITERAL = re.compile(r'''/\*.*?\*/|"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*'|url\(\s*[^\s'")][^)]*\)''',
+                         re.DOTALL | re.IGNORECASE)
+CSS_PUNCTUATION = re.compile(r'\s*([{};,>])\s*')
+# Stands in for a literal while the code around it is minified; sources never contain NUL
+LITERAL_PLACEHOLDER = re.compile(r'\x00(\d+)\x00')
+# After one of these characters or words a '/' starts a regular expression rather than a division
+JS_REGEX_PRECEDERS = set('(,=:[!&|?{};+-*%<>~^}')
+JS_REGEX_KEYWORDS = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw', 'case',
+                     'do', 'else', 'yield', 'await'}
+JS_WORD = re.compile(r'[\w$]+')
+
+def minify_json(text):
+    return json.dumps(json.loads(text), separators=(',', ':'), ensure_ascii=False)
+
+def _restore_literals(text, literals):
+    return LITERAL_PLACEHOLDER.sub(lambda match: literals[int(match.group(1))], text)
+
+def minify_css(text):
+    literals = []
+    def hold(match):
+        if match.group().startswith('/*'):
+            return ''
+        literals.append(match.group())
+        return f'\0{len(literals) - 1}\0'
+    text = CSS_LITERAL.sub(hold, text)
+    text = re.sub(r'\s+', ' ', text)
+    text = CSS_PUNCTUATION.sub(r'\1', text)
+    text = text.replace(': ', ':').replace(';}', '}')
+    return _restore_literals(text.strip(), literals)
+
+def _strip_lines(text):
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+def minify_html(text):
+    text = HTML_COMMENT.sub('', text)
+    # <pre> and <textarea> keep their whitespace
+    parts = HTML_PRESERVE.split(text)
+    pieces = []
+    index = 0
+    while index < len(parts):
+        pieces.append(_strip_lines(parts[index]))
+        if index + 1 < len(parts):
+            pieces.append(parts[index + 1])
+        index += 3 # split() also returns the tag-name group
+    return ''.join(pieces)
+
+def _js_literal_end(text, start):
+    """End of the comment, string, template or regular expression literal at `start`
+
+    Returns None if a regular expression does not end on its line, i.e. the '/' was a division.
+    """
+    length = len(text)
+    if text.startswith('//', start):
+        end = text.find('\n', start)
+        return length if end < 0 else end
+    if text.startswith('/*', start):
+        end = text.find('*/', start + 2)
+        return length if end < 0 else end + 2
+    quote = text[start]
+    index = start + 1
+    in_class = False
+    while index < length:
+        char = text[index]
+        if char == '\\':
+            index += 2
+            continue
+        if quote == '`':
+            if char == '`':
+                return index + 1
+            if text.startswith('${', index):
+                _, index = _scan_js(text, index + 2, nested=True)
+                continue
+        elif quote != '/':
+            if char == quote:
+                return index + 1
+            if char == '\n': # unterminated string: leave the line break to the code around it
+                return index
+        elif char == '\n':
+            return None
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '/':
+            flags = JS_WORD.match(text, index + 1)
+            return flags.end() if flags else index + 1
+        index += 1
+    return length if quote != '/' else None
+
+def _scan_js(text, index=0, nested=False):
+    """Find the comments and literals of a script as (start, end, is_comment) spans
+
+    With `nested`, scans a template literal's ${...} expression and stops after its closing
+    brace. Returns (spans, end).
+    """
+    spans = []
+    depth = 0
+    previous = '' # the last character or word that was not whitespace or a comment
+    while index < len(text):
+        char = text[index]
+        comment = text.startswith('//', index) or text.startswith('/*', index)
+        if char in '\'"`' or comment or (char == '/' and (previous in JS_REGEX_PRECEDERS or previous in JS_REGEX_KEYWORDS
+                                                          or not previous)):
+            end = _js_literal_end(text, index)
+            if end is not None:
+                spans.append((index, end, comment))
+                if not comment:
+                    previous = 'literal'
+                index = end
+                continue
+        if nested and char == '{':
+            depth += 1
+        elif nested and char == '}':
+            if not depth:
+                return spans, index + 1
+            depth -= 1
+        word = JS_WORD.match(text, index)
+        if word:
+            previous = word.group()
+            index = word.end()
+            continue
+        if not char.isspace():
+            previous = char
+        index += 1
+    return spans, index
+
+def minify_js(text):
+    literals = []
+    pieces = []
+    position = 0
+    for start, end, comment in _scan_js(text)[0]:
+        pieces.append(text[position:start])
+        literal = text[start:end]
+        if comment and not literal.startswith('/*!'):
+            # A comment that spans lines still separates them, for automatic semicolon insertion
+            pieces.append('\n' if '\n' in literal else ' ')
+        else:
+            pieces.append(f'\0{len(literals)}\0')
+            literals.append(literal)
+        position = end
+    pieces.append(text[position:])
+    lines = (line.strip() for line in ''.join(pieces).split('\n'))
+    return _restore_literals('\n'.join(line for line in lines if line), literals)
+
+MINIFIERS = {'.json': minify_json, '.css': minify_css, '.html': minify_html, '.js': minify_js}
+
+def _write_output(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+    return {"size": len(data), "etag": hashlib.md5(data).hexdigest()}
+
+def build_file(rel_path, source_path, output_dir):
+    """Minify one file and write it with its compressed siblings. Runs in a worker process."""
+    with open(source_path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    minifier = MINIFIERS.get(os.path.splitext(rel_path)[1].lower())
+    data = (minifier(text) if minifier else text).encode('utf-8')
+    output_path = os.path.join(output_dir, rel_path)
+    entry = _write_output(output_path, data)
+    entry["encodings"] = {"gzip": _write_output(output_path + ENCODINGS["gzip"], gzip.compress(data, 9, mtime=0))}
+    if brotli is not None:
+        entry["encodings"]["br"] = _write_output(output_path + ENCODINGS["br"], brotli.compress(data, quality=11))
+    return entry
+
+def list_sources(source_dir=SOURCE_DIR):
+    """Return {relative_path: os.stat_result} for the text assets under source_dir"""
+    sources = {}
+    pending = [(source_dir, '')]
+    while pending:
+        dir_path, rel_dir = pending.pop()
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                rel_path = rel_dir + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if rel_path not in SKIP_DIRS:
+                        pending.append((entry.path, rel_path + '/'))
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in TEXT_EXTENSIONS:
+                    sources[rel_path] = entry.stat()
+    return sources
+
+def load_manifest(output_dir=OUTPUT_DIR):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return manifest.get("files", {}) if manifest.get("version") == MANIFEST_VERSION else {}
+
+def outputs_present(rel_path, entry, output_dir):
+    names = [rel_path] + [rel_path + ENCODINGS[encoding] for encoding in entry.get("encodings", {})]
+    return all(os.path.exists(os.path.join(output_dir, name)) for name in names)
+
+def build_assets(source_dir=SOURCE_DIR, output_dir=OUTPUT_DIR, jobs=None, force=False):
+    """Build every changed asset and rewrite the manifest. Returns (built, unchanged, failed) counts."""
+    previous = {} if force else load_manifest(output_dir)
+    files = {}
+    pending = {}
+    for rel_path, stat in sorted(list_sources(source_dir).items()):
+        entry = previous.get(rel_path)
+        if entry and entry["source_size"] == stat.st_size and entry["source_mtime_ns"] == stat.st_mtime_ns \
+                and ("br" in entry["encodings"]) == (brotli is not None) and outputs_present(rel_path, entry, output_dir):
+            files[rel_path] = entry
+        else:
+            pending[rel_path] = stat
+
+    failed = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(build_file, rel_path, os.path.join(source_dir, rel_path), output_dir): rel_path
+                for rel_path in pending
+            }
+            for future in as_completed(futures):
+                rel_path = futures[future]
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    print(f"Error building {rel_path}: {e}")
+                    failed += 1
+                    continue
+                stat = pending[rel_path]
+                files[rel_path] = dict(source_size=stat.st_size, source_mtime_ns=stat.st_mtime_ns, **entry)
+
+    files = dict(sorted(files.items()))
+    os.makedirs(output_dir, exist_ok=True)
+    temp_path = os.path.join(output_dir, MANIFEST_NAME + '.tmp')
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": MANIFEST_VERSION, "files": files}, f, indent=2)
+    os.replace(temp_path, os.path.join(output_dir, MANIFEST_NAME))
+    remove_stale_outputs(files, output_dir)
+    return len(pending) - failed, len(files) - (len(pending) - failed), failed
+
+def remove_stale_outputs(files, output_dir):
+    """Delete outputs whose source was removed"""
+    expected = {MANIFEST_NAME}
+    for rel_path, entry in files.items():
+        expected.add(rel_path)
+        expected.update(rel_path + ENCODINGS[encoding] for encoding in entry["encodings"])
+    for root, _, names in os.walk(output_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            if os.path.relpath(path, output_dir).replace(os.sep, '/') not in expected:
+                os.remove(path)
+
+def main(argv=None):
+    """Main script execution"""
+    parser = argparse.ArgumentParser(description="Minify and precompress the text assets in docs/ into dist/.")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: number of CPU cores)")
+    parser.add_argument("--force", action="store_true", help="Rebuild every file, ignoring the manifest")
+    args = parser.parse_args(argv)
+
+    if brotli is None:
+        print("Warning: brotli is not installed, so no .br files are written. Install it with: pip install brotli")
+    print(f"Building assets from {SOURCE_DIR} into {OUTPUT_DIR}...")
+    built, unchanged, failed = build_assets(jobs=args.jobs, force=args.force)
+    files = load_manifest()
+    source_bytes = sum(entry["source_size"] for entry in files.values())
+    for encoding in ("gzip", "br"):
+        encoded = sum(entry["encodings"][encoding]["size"] for entry in files.values() if encoding in entry["encodings"])
+        if encoded:
+            print(f"  {encoding}: {source_bytes} -> {encoded} bytes ({encoded / source_bytes:.0%})")
+    print(f"Assets: {built} built, {unchanged} unchanged, {failed} failed")
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
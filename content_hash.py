@@ -0,0 +1,54 @@
+"""
+Cached SHA-256 content hashes for files under docs/images.
+
+HashCache remembers each file's size, mtime and hash in a small JSON file, so a
+file is only read again when it has changed on disk.
+"""
+
+import os
+import json
+import hashlib
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class HashCache:
+    """Maps relative paths to SHA-256 hashes, re-hashing only files whose size or mtime changed."""
+
+    def __init__(self, cache_path, base_path):
+        self.cache_path = cache_path
+        self.base_path = base_path
+        self.hashed = 0 # files actually read during this run
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+        self.used = {}
+
+    def get(self, rel_path, stat=None):
+        """Return the hash of base_path/rel_path, or None if the file does not exist"""
+        full_path = os.path.join(self.base_path, rel_path)
+        try:
+            stat = stat or os.stat(full_path)
+        except FileNotFoundError:
+            return None
+        entry = self.entries.get(rel_path)
+        if not entry or entry[0] != stat.st_size or entry[1] != stat.st_mtime_ns:
+            entry = [stat.st_size, stat.st_mtime_ns, file_sha256(full_path)]
+            self.hashed += 1
+        self.used[rel_path] = entry
+        return entry[2]
+
+    def save(self):
+        """Write the entries looked up during this run (dropping files that are gone)"""
+        temp_path = self.cache_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.used, f)
+        os.replace(temp_path, self.cache_path)
@@ -7,14 +7,22 @@ const siteConfig = {
   s3: {
     bucketUrl: 'https://photos-joyfulphotographs-com.s3.amazonaws.com',
     prefix: 'website-images',
+    // Logical image path -> content-hashed key, filled from gallery data when fingerprinting is enabled
+    assetMap: {},
+    addAssets: function(assets) {
+      Object.assign(this.assetMap, assets || {});
+    },
+    // Check if we're running on localhost - use local images for development
+    isLocal: function() {
+      return window.location.hostname === 'localhost' || window.location.hostname === '127.0.0.1';
+    },
     // Helper function to build full S3 URLs
     getImageUrl: function(imagePath) {
-      // Check if we're running on localhost - use local images for development
-      if (window.location.hostname === 'localhost' || window.location.hostname === '127.0.0.1') {
+      if (this.isLocal()) {
         return `/images/${imagePath}`;
       }
-      // Otherwise use S3 for production
-      return `${this.bucketUrl}/${this.prefix}/${imagePath}`;
+      // Otherwise use S3 for production, preferring the long-cacheable fingerprinted copy
+      return `${this.bucketUrl}/${this.prefix}/${this.assetMap[imagePath] || imagePath}`;
     }
   },
   
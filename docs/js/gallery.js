@@ -1,51 +1,166 @@
+// Rendered width of a gallery tile; keep in sync with the .gallery-item widths in style.css
+const GALLERY_IMAGE_SIZES = '(max-width: 480px) 100vw, (max-width: 768px) 50vw, 33vw';
+
 document.addEventListener('DOMContentLoaded', () => {
   const galleryContainer = document.getElementById('gallery-container');
   const tabsContainer = document.getElementById('gallery-tabs');
   const categoryHeading = document.getElementById('category-heading');
   const categoryDescription = document.getElementById('category-description');
 
-  if (galleryContainer) {
-    fetch('../gallery-data.json') // Assumes gallery.html is in docs/ and gallery-data.json is in docs/
-      .then(response => {
-        if (!response.ok) {
-          throw new Error(`HTTP error! status: ${response.status}`);
+  const fetchJson = (url) => fetch(url).then(response => {
+    if (!response.ok) {
+      throw new Error(`HTTP error! status: ${response.status}`);
+    }
+    return response.json();
+  });
+
+  // Function to create and initialize Masonry
+  const initMasonry = () => {
+    // Clear any existing Masonry instance
+    if (galleryContainer.masonry) {
+      galleryContainer.masonry.destroy();
+    }
+    
+    // Initialize new Masonry instance
+    const msnry = new Masonry(galleryContainer, {
+      itemSelector: '.gallery-item',
+      percentPosition: true,
+      gutter: 10
+    });
+    
+    // Store the Masonry instance on the container
+    galleryContainer.masonry = msnry;
+    
+    // Use imagesLoaded to recalculate layout after all images have loaded
+    imagesLoaded(galleryContainer).on('progress', () => {
+      msnry.layout();
+    });
+  };
+  
+  // gallery.html pre-rendered by render_gallery.py: the tabs and the first category are
+  // already in the page and the other categories wait in <template> elements, so only
+  // tab switching needs wiring up - no catalogue fetch, no DOM building
+  // The pre-rendered images point at S3; on localhost, point them at the local copies
+  // instead, from the catalogue paths render_gallery.py keeps in data-src/data-srcset
+  const localizeImages = (root) => {
+    root.querySelectorAll('img[data-src]').forEach(img => {
+      img.src = siteConfig.s3.getImageUrl(img.dataset.src);
+    });
+    root.querySelectorAll('source[data-srcset]').forEach(source => {
+      source.srcset = source.dataset.srcset
+        .split(', ')
+        .map(candidate => {
+          const [path, width] = candidate.split(' ');
+          return `${siteConfig.s3.getImageUrl(path)} ${width}`;
+        })
+        .join(', ');
+    });
+  };
+  
+  const hydrateGallery = () => {
+    const templates = {};
+    document.querySelectorAll('template[data-category]').forEach(template => {
+      templates[template.dataset.category] = template;
+    });
+    if (siteConfig.s3.isLocal()) {
+      localizeImages(galleryContainer);
+      Object.values(templates).forEach(template => localizeImages(template.content));
+    }
+    // Items of categories shown before, kept so switching back reuses the loaded images
+    const parked = {};
+    let activeCategoryId = galleryContainer.dataset.rendered;
+    
+    tabsContainer.querySelectorAll('.tab').forEach(tab => {
+      tab.addEventListener('click', () => {
+        const categoryId = tab.dataset.category;
+        if (categoryId === activeCategoryId) return;
+        
+        // Masonry positions the items absolutely; destroying it first restores their styles
+        if (galleryContainer.masonry) {
+          galleryContainer.masonry.destroy();
+          galleryContainer.masonry = null;
         }
-        return response.json();
-      })
+        const current = document.createDocumentFragment();
+        current.append(...galleryContainer.childNodes);
+        parked[activeCategoryId] = current;
+        
+        const template = templates[categoryId];
+        galleryContainer.append(parked[categoryId] || (template ? document.importNode(template.content, true) : ''));
+        delete parked[categoryId];
+        activeCategoryId = categoryId;
+        
+        tabsContainer.querySelectorAll('.tab').forEach(other => {
+          other.classList.toggle('active', other === tab);
+        });
+        if (categoryHeading) categoryHeading.textContent = tab.textContent;
+        if (categoryDescription) categoryDescription.textContent = tab.dataset.description || '';
+        if (galleryContainer.querySelector('.gallery-item')) initMasonry();
+      });
+    });
+    
+    if (galleryContainer.querySelector('.gallery-item')) initMasonry();
+  };
+  
+  if (galleryContainer && tabsContainer && 'rendered' in galleryContainer.dataset) {
+    hydrateGallery();
+  } else if (galleryContainer) {
+    // Not pre-rendered: build the page from the catalogue instead.
+    // The small index lists the categories; each category's images live in their own shard.
+    // Fall back to the full legacy file if the index is unavailable.
+    // Assumes gallery.html is in docs/ and the gallery JSON files are in docs/
+    fetchJson('../gallery-index.json')
+      .catch(() => fetchJson('../gallery-data.json'))
       .then(data => {
         if (!data.categories || data.categories.length === 0) {
           galleryContainer.innerHTML = '<p>No gallery categories found. Please check back later.</p>';
           return;
         }
+        // Only present in the legacy single-file format; shards carry their own assets
+        siteConfig.s3.addAssets(data.assets);
         
-        // Function to create and initialize Masonry
-        const initMasonry = () => {
-          // Clear any existing Masonry instance
-          if (galleryContainer.masonry) {
-            galleryContainer.masonry.destroy();
-          }
-          
-          // Initialize new Masonry instance
-          const msnry = new Masonry(galleryContainer, {
-            itemSelector: '.gallery-item',
-            percentPosition: true,
-            gutter: 10
-          });
+        // Wrap the image in a <picture> offering the resized WebP/AVIF variants, if any
+        const createPicture = (item, img) => {
+          if (!item.variants || item.variants.length === 0) return img;
           
-          // Store the Masonry instance on the container
-          galleryContainer.masonry = msnry;
-          
-          // Use imagesLoaded to recalculate layout after all images have loaded
-          imagesLoaded(galleryContainer).on('progress', () => {
-            msnry.layout();
+          const picture = document.createElement('picture');
+          const types = [...new Set(item.variants.map(variant => variant.type))];
+          types.forEach(type => {
+            const source = document.createElement('source');
+            source.type = type;
+            source.srcset = item.variants
+              .filter(variant => variant.type === type)
+              .map(variant => `${siteConfig.s3.getImageUrl(variant.src)} ${variant.width}w`)
+              .join(', ');
+            source.sizes = GALLERY_IMAGE_SIZES;
+            picture.appendChild(source);
           });
+          picture.appendChild(img);
+          return picture;
+        };
+        
+        // Fetch a category's shard the first time its tab is opened
+        const loadCategory = (category) => {
+          if (category.images) return Promise.resolve(category);
+          if (!category.loading) {
+            category.loading = fetchJson(`../${category.shard}`).then(shard => {
+              siteConfig.s3.addAssets(shard.assets);
+              category.images = shard.images || [];
+              return category;
+            });
+            // Allow a later click to retry if this request fails
+            category.loading.catch(() => { category.loading = null; });
+          }
+          return category.loading;
         };
         
+        let activeCategoryId = null;
+        
         // Function to display a category's images
         const displayCategory = (categoryId) => {
           // Find the selected category
           const category = data.categories.find(cat => cat.id === categoryId);
           if (!category) return;
+          activeCategoryId = categoryId;
           
           // Update active tab
           const tabs = tabsContainer.querySelectorAll('.tab');
@@ -53,13 +168,28 @@ document.addEventListener('DOMContentLoaded', () => {
             tab.classList.toggle('active', tab.dataset.category === categoryId);
           });
           
-          // Clear gallery container
-          galleryContainer.innerHTML = '';
-          
           // Update category heading and description if they exist
           if (categoryHeading) categoryHeading.textContent = category.name;
           if (categoryDescription) categoryDescription.textContent = category.description;
           
+          loadCategory(category)
+            .then(loaded => {
+              // Ignore the response if another tab was opened in the meantime
+              if (activeCategoryId === categoryId) renderImages(loaded);
+            })
+            .catch(error => {
+              console.error(`Error loading the ${category.name} category:`, error);
+              if (activeCategoryId === categoryId) {
+                galleryContainer.innerHTML = '<p>Sorry, something went wrong while loading the gallery. Please try again later.</p>';
+              }
+            });
+        };
+        
+        // Function to render a loaded category's images
+        const renderImages = (category) => {
+          // Clear gallery container
+          galleryContainer.innerHTML = '';
+          
           // If no images in this category
           if (!category.images || category.images.length === 0) {
             galleryContainer.innerHTML = `<p>No images available in the ${category.name} category yet.</p>`;
@@ -76,8 +206,13 @@ document.addEventListener('DOMContentLoaded', () => {
             img.src = siteConfig.s3.getImageUrl(item.src);
             img.alt = item.alt;
             img.loading = 'lazy'; // Lazy loading for better performance
+            if (item.width && item.height) {
+              // Intrinsic size lets the browser reserve the tile's space before the image arrives
+              img.width = item.width;
+              img.height = item.height;
+            }
             
-            galleryItem.appendChild(img);
+            galleryItem.appendChild(createPicture(item, img));
             
             // Only add description if it exists
             if (item.description) {
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+Duplicate Image Finder
+
+Reports images under docs/images that are stored more than once: byte-identical files
+saved under different names (found through their SHA-256), and, with --perceptual,
+re-exports of the same photo that differ in bytes but look alike (found through a
+64-bit difference hash, which needs Pillow).
+
+Both indexes are cached by file size and mtime, so only new or changed files are read
+on later runs. Run it from the repository root, like update_gallery_data.py.
+
+Identical files cost nothing extra to publish: sync_s3.py uploads the first copy and
+creates the others with a server-side copy, and with update_gallery_data.py
+--fingerprint they share a single hashed object in S3.
+"""
+
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from content_hash import HashCache
+from update_gallery_data import CONTENT_HASH_CACHE_PATH, SUPPORTED_EXTENSIONS
+from generate_derivatives import IMAGES_BASE_PATH, DERIVATIVES_DIR
+
+PERCEPTUAL_HASH_CACHE_PATH = ".perceptual_hash_cache.json"
+DHASH_SIZE = 8 # 8x8 comparisons = 64 bits
+# Hashes are split into this many bands: two hashes within MAX_DISTANCE bits share at least one band
+DHASH_BANDS = 8
+MAX_DISTANCE = DHASH_BANDS - 1
+DEFAULT_DISTANCE = 6
+
+def list_images(base_path=IMAGES_BASE_PATH):
+    """Return {relative_path: os.stat_result} for every image under base_path, skipping derivatives"""
+    images = {}
+    pending = [(base_path, '')]
+    while pending:
+        dir_path, rel_dir = pending.pop()
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                rel_path = rel_dir + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if rel_path != DERIVATIVES_DIR:
+                        pending.append((entry.path, rel_path + '/'))
+                elif entry.is_file() and os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS:
+                    images[rel_path] = entry.stat()
+    return images
+
+def find_identical(images, cache):
+    """Group files by content hash; returns clusters (sorted path lists) of two or more files"""
+    by_hash = {}
+    for rel_path, stat in sorted(images.items()):
+        content_hash = cache.get(rel_path, stat)
+        if content_hash:
+            by_hash.setdefault(content_hash, []).append(rel_path)
+    return [paths for paths in by_hash.values() if len(paths) > 1]
+
+def difference_hash(path):
+    """64-bit dHash: whether each pixel of a 9x8 greyscale thumbnail is brighter than its right neighbour"""
+    with Image.open(path) as image:
+        image.draft('L', (DHASH_SIZE * 8, DHASH_SIZE * 8)) # lets JPEGs decode at a fraction of full size
+        pixels = image.convert('L').resize((DHASH_SIZE + 1, DHASH_SIZE), Image.LANCZOS).tobytes()
+    value = 0
+    for row in range(DHASH_SIZE):
+        for col in range(DHASH_SIZE):
+            left = pixels[row * (DHASH_SIZE + 1) + col]
+            value = value << 1 | (left > pixels[row * (DHASH_SIZE + 1) + col + 1])
+    return value
+
+def perceptual_hashes(images, jobs=None):
+    """Return {relative_path: dHash}, computing only files missing from the cache"""
+    try:
+        with open(PERCEPTUAL_HASH_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        cache = {}
+    new_cache = {}
+    pending = []
+    for rel_path, stat in images.items():
+        cached = cache.get(rel_path)
+        if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+            new_cache[rel_path] = cached
+        else:
+            pending.append(rel_path)
+
+    if pending:
+        print(f"Computing perceptual hashes for {len(pending)} images...")
+        paths = [os.path.join(IMAGES_BASE_PATH, rel_path) for rel_path in pending]
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(difference_hash, path) for path in paths]
+            for rel_path, future in zip(pending, futures):
+                try:
+                    value = future.result()
+                except Exception as e:
+                    print(f"Could not hash {rel_path}: {e}")
+                    continue
+                stat = images[rel_path]
+                new_cache[rel_path] = [stat.st_size, stat.st_mtime_ns, f"{value:016x}"]
+
+    try:
+        temp_path = PERCEPTUAL_HASH_CACHE_PATH + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(new_cache, f)
+        os.replace(temp_path, PERCEPTUAL_HASH_CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: could not save perceptual hash cache: {e}")
+    return {rel_path: int(entry[2], 16) for rel_path, entry in new_cache.items()}
+
+def find_similar(hashes, max_distance=DEFAULT_DISTANCE):
+    """Cluster paths whose hashes differ in at most max_distance bits
+
+    Only hashes that share one of the DHASH_BANDS 8-bit bands are compared, which
+    finds every such pair as long as max_distance < DHASH_BANDS.
+    """
+    band_bits = DHASH_SIZE * DHASH_SIZE // DHASH_BANDS
+    band_mask = (1 << band_bits) - 1
+    buckets = {}
+    for rel_path, value in hashes.items():
+        for band in range(DHASH_BANDS):
+            buckets.setdefault((band, value >> (band * band_bits) & band_mask), []).append(rel_path)
+
+    parent = {rel_path: rel_path for rel_path in hashes}
+    def root(rel_path):
+        while parent[rel_path] != rel_path:
+            parent[rel_path] = parent[parent[rel_path]]
+            rel_path = parent[rel_path]
+        return rel_path
+
+    for paths in buckets.values():
+        for i, first in enumerate(paths):
+            for second in paths[i + 1:]:
+                if root(first) != root(second) and bin(hashes[first] ^ hashes[second]).count('1') <= max_distance:
+                    parent[root(second)] = root(first)
+
+    clusters = {}
+    for rel_path in hashes:
+        clusters.setdefault(root(rel_path), []).append(rel_path)
+    return [sorted(paths) for paths in clusters.values() if len(paths) > 1]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Report duplicate and near-duplicate images under docs/images.")
+    parser.add_argument("--perceptual", action="store_true",
+                        help="Also find re-exported copies with a perceptual hash (requires Pillow)")
+    parser.add_argument("--distance", type=int, default=DEFAULT_DISTANCE, choices=range(MAX_DISTANCE + 1),
+                        metavar=f"0-{MAX_DISTANCE}",
+                        help=f"Maximum differing hash bits for near-duplicates (default: {DEFAULT_DISTANCE})")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes for hashing (default: CPU cores)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the clusters to a JSON file")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main script execution"""
+    args = parse_args(argv)
+    if args.perceptual and Image is None:
+        print("Pillow is required for --perceptual. Install it with: pip install Pillow")
+        sys.exit(1)
+    if not os.path.isdir(IMAGES_BASE_PATH):
+        print(f"Image folder not found: {IMAGES_BASE_PATH}")
+        sys.exit(1)
+
+    images = list_images()
+    cache = HashCache(CONTENT_HASH_CACHE_PATH, IMAGES_BASE_PATH)
+    identical = find_identical(images, cache)
+    try:
+        cache.save()
+    except OSError as e:
+        print(f"Warning: could not save content hash cache: {e}")
+    print(f"Indexed {len(images)} images ({cache.hashed} hashed)")
+
+    wasted = sum(images[paths[0]].st_size * (len(paths) - 1) for paths in identical)
+    print(f"Identical files: {len(identical)} clusters, {wasted} bytes stored more than once")
+    for paths in identical:
+        print(f"  - {', '.join(paths)}")
+
+    similar = []
+    if args.perceptual:
+        # Identical files are already reported, so each cluster joins the search once
+        duplicates = {path for paths in identical for path in paths[1:]}
+        hashes = perceptual_hashes({p: s for p, s in images.items() if p not in duplicates}, jobs=args.jobs)
+        similar = find_similar(hashes, args.distance)
+        print(f"Similar images (at most {args.distance} bits apart): {len(similar)} clusters")
+        for paths in similar:
+            print(f"  - {', '.join(paths)}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({"identical": identical, "similar": similar, "duplicate_bytes": wasted}, f, indent=2)
+        print(f"Clusters written to {args.json}")
+
+if __name__ == "__main__":
+    main()
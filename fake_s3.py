@@ -0,0 +1,476 @@
+#!/usr/bin/env python
+"""
+Fake S3 Server
+
+An in-memory, S3-compatible HTTP server for testing and benchmarking the gallery
+scripts offline. It speaks the path-style REST API (http://host:port/bucket/key) for
+the calls the scripts make:
+
+  HEAD / GET / PUT / DELETE object, CopyObject (PUT with x-amz-copy-source)
+  ListObjectsV2 with prefix, max-keys and continuation tokens
+  CreateMultipartUpload, UploadPart, ListParts, CompleteMultipartUpload, AbortMultipartUpload
+  DeleteObjects (batch delete), HeadBucket, CreateBucket
+
+Requests are not authenticated. Every response can be delayed (--latency), and a share
+of requests can be answered with 503 SlowDown (--throttle) or 500 InternalError
+(--fail-rate); FakeS3Server.fail() schedules failures for particular operations.
+
+The scripts talk to it when JOYFUL_S3_ENDPOINT is set:
+
+    python fake_s3.py --port 9000
+    JOYFUL_S3_ENDPOINT=http://127.0.0.1:9000 python sync_s3.py
+
+In-process use (e.g. from benchmark_gallery.py):
+
+    with FakeS3Server(latency_ms=20) as server:
+        server.put(bucket, key, b'...')
+        ... server.url ...
+"""
+
+import sys
+import time
+import bisect
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote, quote
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+DEFAULT_PORT = 9000
+DEFAULT_BUCKET = "photos-joyfulphotographs-com"
+MAX_KEYS = 1000
+S3_XML_NS = 'http://s3.amazonaws.com/doc/2006-03-01/'
+# Request headers stored with an object and returned by HEAD and GET
+STORED_HEADERS = ('content-type', 'cache-control', 'content-encoding', 'content-disposition', 'content-language')
+
+def _timestamp(seconds):
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(seconds))
+
+def _http_date(seconds):
+    return time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime(seconds))
+
+def _xml(root, *elements, namespace=S3_XML_NS):
+    attributes = f' xmlns="{namespace}"' if namespace else ''
+    return (f'<?xml version="1.0" encoding="UTF-8"?><{root}{attributes}>'
+            + ''.join(elements) + f'</{root}>').encode('utf-8')
+
+def _element(name, value):
+    return f'<{name}>{escape(str(value))}</{name}>'
+
+def _decode_aws_chunked(body):
+    """Strips the chunk framing (and trailers) of an aws-chunked request body"""
+    data = bytearray()
+    position = 0
+    while True:
+        line_end = body.index(b'\r\n', position)
+        size = int(body[position:line_end].split(b';')[0], 16)
+        if size == 0:
+            return bytes(data)
+        data += body[line_end + 2:line_end + 2 + size]
+        position = line_end + 2 + size + 2
+
+class S3Error(Exception):
+    def __init__(self, status, code, message):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    """Routes one request to the FakeS3Server operation it names."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.handle_request('HEAD')
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def handle_request(self, method):
+        server = self.server
+        url = urlsplit(self.path)
+        query = {name: values[0] for name, values in parse_qs(url.query, keep_blank_values=True).items()}
+        bucket, _, key = unquote(url.path).lstrip('/').partition('/')
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if 'aws-chunked' in (self.headers.get('Content-Encoding') or ''):
+            body = _decode_aws_chunked(body)
+        operation = self.operation_name(method, bucket, key, query, self.headers)
+        if server.latency:
+            time.sleep(server.latency)
+        try:
+            server.count_request(operation)
+            server.inject_failure(operation)
+            status, headers, content = getattr(server, operation)(bucket, key, query, self.headers, body)
+        except S3Error as e:
+            status, headers = e.status, {'Content-Type': 'application/xml'}
+            content = _xml('Error', _element('Code', e.code), _element('Message', e), _element('Resource', url.path),
+                           namespace=None) # S3 error documents have no namespace
+            if e.code == 'SlowDown':
+                headers['Retry-After'] = '1'
+        if method == 'HEAD':
+            headers.setdefault('Content-Length', '0') # the size of the object, not of this (empty) response
+        else:
+            headers['Content-Length'] = str(len(content))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if method != 'HEAD':
+            self.wfile.write(content)
+
+    @staticmethod
+    def operation_name(method, bucket, key, query, headers):
+        if not bucket:
+            return 'unsupported'
+        if not key:
+            if method == 'GET':
+                return 'list_objects_v2'
+            if method == 'POST' and 'delete' in query:
+                return 'delete_objects'
+            return {'HEAD': 'head_bucket', 'PUT': 'create_bucket'}.get(method, 'unsupported')
+        if 'uploadId' in query:
+            return {'PUT': 'upload_part', 'GET': 'list_parts', 'POST': 'complete_multipart_upload',
+                    'DELETE': 'abort_multipart_upload'}.get(method, 'unsupported')
+        if method == 'POST':
+            return 'create_multipart_upload' if 'uploads' in query else 'unsupported'
+        if method == 'PUT' and headers.get('x-amz-copy-source'):
+            return 'copy_object'
+        return {'HEAD': 'head_object', 'GET': 'get_object', 'PUT': 'put_object',
+                'DELETE': 'delete_object'}[method]
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class FakeS3Server(ThreadingHTTPServer):
+    """In-memory S3 stand-in; each bucket maps keys to {'body', 'etag', 'modified', 'headers'}."""
+
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency_ms=0, throttle_rate=0.0, failure_rate=0.0,
+                 buckets=(DEFAULT_BUCKET,), seed=None, verbose=False):
+        super().__init__(address, FakeS3Handler)
+        self.latency = latency_ms / 1000.0
+        self.throttle_rate = throttle_rate
+        self.failure_rate = failure_rate
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.buckets = {name: {} for name in buckets}
+        self.uploads = {}        # upload id -> {'bucket', 'key', 'headers', 'parts': {number: (body, etag)}}
+        self.scheduled = {}      # operation -> [(status, code), ...] still to be returned
+        self.requests = {}       # operation -> requests received
+        self._sorted_keys = {}   # bucket -> sorted key list, rebuilt after changes
+        self._next_upload = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def environ(self):
+        """Environment variables that point the gallery scripts (and boto3) at this server"""
+        return {'JOYFUL_S3_ENDPOINT': self.url, 'AWS_ACCESS_KEY_ID': 'fake', 'AWS_SECRET_ACCESS_KEY': 'fake',
+                'AWS_DEFAULT_REGION': 'us-east-1'}
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='fake-s3', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    # --- Direct access, for seeding and inspecting the buckets ---
+
+    def add_bucket(self, bucket):
+        with self.lock:
+            self.buckets.setdefault(bucket, {})
+
+    def put(self, bucket, key, body=b'', content_type='application/octet-stream'):
+        with self.lock:
+            self._store(bucket, key, body, hashlib.md5(body).hexdigest(), {'content-type': content_type})
+
+    def keys(self, bucket=DEFAULT_BUCKET):
+        with self.lock:
+            return list(self._keys(bucket))
+
+    def object(self, bucket, key):
+        with self.lock:
+            return self.buckets.get(bucket, {}).get(key)
+
+    def fail(self, operation, count=1, status=500, code='InternalError', after=0):
+        """Makes the next `count` requests for `operation` (e.g. 'put_object') fail, once `after` more have succeeded"""
+        with self.lock:
+            self.scheduled.setdefault(operation, []).extend([None] * after + [(status, code)] * count)
+
+    # --- Request plumbing ---
+
+    def count_request(self, operation):
+        with self.lock:
+            self.requests[operation] = self.requests.get(operation, 0) + 1
+
+    def inject_failure(self, operation):
+        with self.lock:
+            scheduled = self.scheduled.get(operation)
+            if scheduled:
+                failure = scheduled.pop(0)
+                if failure is None:
+                    return
+                status, code = failure
+                raise S3Error(status, code, f"Injected failure for {operation}")
+            roll = self.random.random() if self.throttle_rate or self.failure_rate else 1.0
+        if roll < self.throttle_rate:
+            raise S3Error(503, 'SlowDown', "Please reduce your request rate.")
+        if roll < self.throttle_rate + self.failure_rate:
+            raise S3Error(500, 'InternalError', "We encountered an internal error. Please try again.")
+
+    def _bucket(self, bucket):
+        objects = self.buckets.get(bucket)
+        if objects is None:
+            raise S3Error(404, 'NoSuchBucket', "The specified bucket does not exist")
+        return objects
+
+    def _keys(self, bucket):
+        keys = self._sorted_keys.get(bucket)
+        if keys is None:
+            keys = self._sorted_keys[bucket] = sorted(self._bucket(bucket))
+        return keys
+
+    def _store(self, bucket, key, body, etag, headers):
+        self._bucket(bucket)[key] = {'body': body, 'etag': etag, 'modified': time.time(), 'headers': headers}
+        self._sorted_keys.pop(bucket, None)
+
+    def _object(self, bucket, key):
+        obj = self._bucket(bucket).get(key)
+        if obj is None:
+            raise S3Error(404, 'NoSuchKey', "The specified key does not exist.")
+        return obj
+
+    def _upload(self, query):
+        upload = self.uploads.get(query['uploadId'])
+        if upload is None:
+            raise S3Error(404, 'NoSuchUpload', "The specified upload does not exist.")
+        return upload
+
+    @staticmethod
+    def _object_headers(obj):
+        headers = {name.title(): value for name, value in obj['headers'].items()}
+        headers.update({'ETag': f'"{obj["etag"]}"', 'Last-Modified': _http_date(obj['modified']),
+                        'Content-Length': str(len(obj['body']))})
+        return headers
+
+    @staticmethod
+    def _request_headers(headers):
+        stored = {name: headers[name] for name in STORED_HEADERS if headers.get(name)}
+        stored.update({name.lower(): value for name, value in headers.items() if name.lower().startswith('x-amz-meta-')})
+        if stored.get('content-encoding') == 'aws-chunked':
+            del stored['content-encoding']
+        return stored
+
+    # --- Operations: each returns (status, headers, body) ---
+
+    def unsupported(self, bucket, key, query, headers, body):
+        raise S3Error(501, 'NotImplemented', "This operation is not supported by fake_s3.py")
+
+    def head_bucket(self, bucket, key, query, headers, body):
+        with self.lock:
+            self._bucket(bucket)
+        return 200, {}, b''
+
+    def create_bucket(self, bucket, key, query, headers, body):
+        self.add_bucket(bucket)
+        return 200, {'Location': f'/{bucket}'}, b''
+
+    def head_object(self, bucket, key, query, headers, body):
+        with self.lock:
+            return 200, self._object_headers(self._object(bucket, key)), b''
+
+    def get_object(self, bucket, key, query, headers, body):
+        with self.lock:
+            obj = self._object(bucket, key)
+            return 200, self._object_headers(obj), obj['body']
+
+    def put_object(self, bucket, key, query, headers, body):
+        etag = hashlib.md5(body).hexdigest()
+        with self.lock:
+            self._store(bucket, key, body, etag, self._request_headers(headers))
+        return 200, {'ETag': f'"{etag}"'}, b''
+
+    def copy_object(self, bucket, key, query, headers, body):
+        source_bucket, _, source_key = unquote(headers['x-amz-copy-source']).lstrip('/').partition('/')
+        with self.lock:
+            obj = self._object(source_bucket, source_key.split('?versionId=')[0])
+            if headers.get('x-amz-metadata-directive', 'COPY').upper() == 'REPLACE':
+                stored = self._request_headers(headers)
+            else:
+                stored = dict(obj['headers'])
+            self._store(bucket, key, obj['body'], obj['etag'], stored)
+            modified = self._bucket(bucket)[key]['modified']
+        content = _xml('CopyObjectResult', _element('LastModified', _timestamp(modified)),
+                       _element('ETag', f'"{obj["etag"]}"'))
+        return 200, {'Content-Type': 'application/xml'}, content
+
+    def delete_object(self, bucket, key, query, headers, body):
+        with self.lock:
+            self._bucket(bucket).pop(key, None)
+            self._sorted_keys.pop(bucket, None)
+        return 204, {}, b''
+
+    def list_objects_v2(self, bucket, key, query, headers, body):
+        prefix = query.get('prefix', '')
+        max_keys = min(int(query.get('max-keys') or MAX_KEYS), MAX_KEYS)
+        # The continuation token is simply the last key of the previous page
+        after = query.get('continuation-token') or query.get('start-after') or ''
+        with self.lock:
+            keys = self._keys(bucket)
+            objects = self.buckets[bucket]
+            start = max(bisect.bisect_left(keys, prefix), bisect.bisect_right(keys, after))
+            page = []
+            index = start
+            while index < len(keys) and len(page) < max_keys and keys[index].startswith(prefix):
+                page.append((keys[index], objects[keys[index]]))
+                index += 1
+            truncated = index < len(keys) and keys[index].startswith(prefix)
+        elements = [_element('Name', bucket), _element('Prefix', prefix), _element('KeyCount', len(page)),
+                    _element('MaxKeys', max_keys), _element('IsTruncated', 'true' if truncated else 'false')]
+        if query.get('continuation-token'):
+            elements.append(_element('ContinuationToken', query['continuation-token']))
+        if truncated:
+            elements.append(_element('NextContinuationToken', page[-1][0]))
+        elements.extend(
+            '<Contents>' + _element('Key', name) + _element('LastModified', _timestamp(obj['modified']))
+            + _element('ETag', f'"{obj["etag"]}"') + _element('Size', len(obj['body']))
+            + '<StorageClass>STANDARD</StorageClass></Contents>'
+            for name, obj in page
+        )
+        return 200, {'Content-Type': 'application/xml'}, _xml('ListBucketResult', *elements)
+
+    def delete_objects(self, bucket, key, query, headers, body):
+        try:
+            request = ElementTree.fromstring(body)
+        except ElementTree.ParseError:
+            raise S3Error(400, 'MalformedXML', "The XML you provided was not well-formed.")
+        # '{*}' matches the element with or without the S3 namespace
+        keys = [obj.findtext('{*}Key', '') for obj in request.findall('{*}Object')]
+        quiet = request.findtext('{*}Quiet', 'false').lower() == 'true'
+        if len(keys) > MAX_KEYS:
+            raise S3Error(400, 'MalformedXML', "DeleteObjects accepts at most 1000 keys.")
+        with self.lock:
+            objects = self._bucket(bucket)
+            for name in keys:
+                objects.pop(name, None)
+            self._sorted_keys.pop(bucket, None)
+        elements = [] if quiet else ['<Deleted>' + _element('Key', name) + '</Deleted>' for name in keys]
+        return 200, {'Content-Type': 'application/xml'}, _xml('DeleteResult', *elements)
+
+    def create_multipart_upload(self, bucket, key, query, headers, body):
+        with self.lock:
+            self._bucket(bucket)
+            self._next_upload += 1
+            upload_id = f"fake-upload-{self._next_upload}"
+            self.uploads[upload_id] = {'bucket': bucket, 'key': key, 'headers': self._request_headers(headers), 'parts': {}}
+        content = _xml('InitiateMultipartUploadResult', _element('Bucket', bucket), _element('Key', key),
+                       _element('UploadId', upload_id))
+        return 200, {'Content-Type': 'application/xml'}, content
+
+    def upload_part(self, bucket, key, query, headers, body):
+        etag = hashlib.md5(body).hexdigest()
+        with self.lock:
+            self._upload(query)['parts'][int(query['partNumber'])] = (body, etag)
+        return 200, {'ETag': f'"{etag}"'}, b''
+
+    def list_parts(self, bucket, key, query, headers, body):
+        with self.lock:
+            parts = sorted(self._upload(query)['parts'].items())
+        elements = [_element('Bucket', bucket), _element('Key', key), _element('UploadId', query['uploadId']),
+                    _element('IsTruncated', 'false')]
+        elements.extend('<Part>' + _element('PartNumber', number) + _element('ETag', f'"{etag}"')
+                        + _element('Size', len(data)) + '</Part>' for number, (data, etag) in parts)
+        return 200, {'Content-Type': 'application/xml'}, _xml('ListPartsResult', *elements)
+
+    def complete_multipart_upload(self, bucket, key, query, headers, body):
+        try:
+            request = ElementTree.fromstring(body)
+        except ElementTree.ParseError:
+            raise S3Error(400, 'MalformedXML', "The XML you provided was not well-formed.")
+        requested = [(int(part.findtext('{*}PartNumber')), part.findtext('{*}ETag', '').strip('"'))
+                     for part in request.findall('{*}Part')]
+        with self.lock:
+            upload = self._upload(query)
+            data = []
+            digests = b''
+            for number, etag in requested:
+                part = upload['parts'].get(number)
+                if part is None or part[1] != etag:
+                    raise S3Error(400, 'InvalidPart', f"Part {number} was not uploaded or its ETag does not match.")
+                data.append(part[0])
+                digests += bytes.fromhex(part[1])
+            etag = f"{hashlib.md5(digests).hexdigest()}-{len(requested)}"
+            self._store(bucket, key, b''.join(data), etag, upload['headers'])
+            del self.uploads[query['uploadId']]
+        content = _xml('CompleteMultipartUploadResult', _element('Location', f'/{bucket}/{quote(key)}'),
+                       _element('Bucket', bucket), _element('Key', key), _element('ETag', f'"{etag}"'))
+        return 200, {'Content-Type': 'application/xml'}, content
+
+    def abort_multipart_upload(self, bucket, key, query, headers, body):
+        with self.lock:
+            self._upload(query)
+            del self.uploads[query['uploadId']]
+        return 204, {}, b''
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run an in-memory S3 stand-in for offline testing.")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument('--bucket', action='append',
+                        help=f"Bucket to create; may be repeated (default: {DEFAULT_BUCKET})")
+    parser.add_argument('--latency', type=float, default=0, help="Milliseconds to wait before each response")
+    parser.add_argument('--throttle', type=float, default=0,
+                        help="Fraction of requests answered with 503 SlowDown (e.g. 0.05)")
+    parser.add_argument('--fail-rate', type=float, default=0,
+                        help="Fraction of requests answered with 500 InternalError")
+    parser.add_argument('--seed', type=int, default=None, help="Random seed for throttling and failures")
+    parser.add_argument('--verbose', action='store_true', help="Print every request")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main script execution"""
+    args = parse_args(argv)
+    server = FakeS3Server((args.host, args.port), latency_ms=args.latency, throttle_rate=args.throttle,
+                          failure_rate=args.fail_rate, buckets=args.bucket or [DEFAULT_BUCKET], seed=args.seed,
+                          verbose=args.verbose)
+    print(f"Fake S3 listening on {server.url} with buckets: {', '.join(server.buckets)}")
+    print("Point the gallery scripts at it with:")
+    for name, value in server.environ().items():
+        print(f"  {name}={value}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Stopping.")
+    finally:
+        server.server_close()
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
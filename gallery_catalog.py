@@ -0,0 +1,425 @@
+"""
+Compact in-memory model of gallery-data.json.
+
+Parsed with plain json.load(), every image is a dict of its own, and a dict costs several
+times the memory of the strings it holds. Here the catalogue is built from three record
+types instead:
+
+  Catalog          categories, assets
+  CatalogCategory  id, name, description, images
+  CatalogImage     src, alt, description, width, height, bytes, variants
+
+Records keep their known fields in __slots__, and anything else in a small `extra` dict
+that is only created when needed. Each record remembers the order its keys were added in
+as a tuple shared by every record with the same keys, so output keeps the order of the
+input. Category ids and names are interned.
+
+Records also behave like the dicts they replace (`img["src"]`, `img.get("width")`,
+`"description" in img`, `img.pop("variants", None)`, `.copy()`, `.items()`), so code
+written for json.load() output keeps working on either. Known fields can also be read
+as attributes, which give None when the key is absent.
+
+write_catalog() streams the catalogue to disk category by category, byte for byte as
+json.dump(data, f, indent=2) would, into a temporary file that replaces the target only
+once it is complete. json_default() lets json.dumps() serialise records too.
+"""
+
+import os
+import sys
+import json
+from json.encoder import encode_basestring_ascii
+
+WRITE_BUFFER_SIZE = 1 << 16 # characters collected before each write
+INDENT = '  '
+BATCH_ENTRIES = 256 # list entries joined into one piece
+
+# Key order tuples, shared between records with the same keys in the same order
+_key_orders = {}
+# Reads a slot without falling back to _Record.__getattr__, so an unset slot raises AttributeError
+_get_slot = object.__getattribute__
+_set_slot = object.__setattr__
+
+def _shared(keys):
+    return _key_orders.setdefault(keys, keys)
+
+class _Record:
+    """Slots-based record that reads and writes like a dict"""
+
+    __slots__ = ('_keys', '_extra')
+    FIELDS = ()
+    _fields = frozenset()
+    _converted = frozenset() # fields passed through _convert() when set
+
+    def __init__(self, pairs=()):
+        if isinstance(pairs, (dict, _Record)):
+            keys = tuple(pairs)
+            record_type, plain, shared_keys = _layouts.get(keys) or _layout(keys)
+            if plain and record_type is type(self):
+                for key, value in pairs.items():
+                    _set_slot(self, key, value)
+                _set_slot(self, '_keys', shared_keys)
+                _set_slot(self, '_extra', None)
+            else:
+                self._fill(pairs.items(), keys)
+        else:
+            self._fill(list(pairs))
+
+    @classmethod
+    def from_pairs(cls, pairs):
+        """Build a record from (key, value) pairs; a repeated key keeps its first position and last value"""
+        record = cls.__new__(cls)
+        record._fill(pairs)
+        return record
+
+    def _fill(self, pairs, keys=None):
+        fields = self._fields
+        converted = self._converted
+        extra = None
+        for key, value in pairs:
+            if key in fields:
+                _set_slot(self, key, self._convert(key, value) if key in converted else value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        if keys is None:
+            keys = tuple(dict.fromkeys([key for key, _ in pairs]))
+        _set_slot(self, '_keys', _shared(keys))
+        _set_slot(self, '_extra', extra)
+
+    @staticmethod
+    def _convert(key, value):
+        return value
+
+    def __getattr__(self, name):
+        # Only called for unset slots and unknown names
+        if name in self._fields:
+            return None
+        raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+
+    def __setattr__(self, name, value):
+        if name not in self._fields:
+            raise AttributeError(f"{type(self).__name__!r} object has no field {name!r}")
+        self[name] = value
+
+    def __delattr__(self, name):
+        if name not in self._fields or name not in self._keys:
+            raise AttributeError(name)
+        del self[name]
+
+    def __getitem__(self, key):
+        if key in self._fields:
+            try:
+                return _get_slot(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def __setitem__(self, key, value):
+        if key in self._fields:
+            _set_slot(self, key, self._convert(key, value) if key in self._converted else value)
+        else:
+            if self._extra is None:
+                _set_slot(self, '_extra', {})
+            self._extra[key] = value
+        if key not in self._keys:
+            _set_slot(self, '_keys', _shared(self._keys + (key,)))
+
+    def __delitem__(self, key):
+        if key not in self._keys:
+            raise KeyError(key)
+        if key in self._fields:
+            object.__delattr__(self, key)
+        else:
+            del self._extra[key]
+        _set_slot(self, '_keys', _shared(tuple(k for k in self._keys if k != key)))
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __eq__(self, other):
+        if isinstance(other, (dict, _Record)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def get(self, key, default=None):
+        if key in self._fields:
+            try:
+                return _get_slot(self, key)
+            except AttributeError:
+                return default
+        return self._extra.get(key, default) if self._extra else default
+
+    def setdefault(self, key, default=None):
+        if key not in self._keys:
+            self[key] = default
+        return self[key]
+
+    def pop(self, key, *default):
+        if key not in self._keys:
+            if default:
+                return default[0]
+            raise KeyError(key)
+        value = self[key]
+        del self[key]
+        return value
+
+    def keys(self):
+        return self._keys
+
+    def values(self):
+        fields = self._fields
+        extra = self._extra
+        return [_get_slot(self, key) if key in fields else extra[key] for key in self._keys]
+
+    def items(self):
+        return list(zip(self._keys, self.values()))
+
+    def copy(self):
+        """Shallow copy, sharing values and the key order with this record"""
+        record = type(self).__new__(type(self))
+        for key in self._keys:
+            if key in self._fields:
+                _set_slot(record, key, _get_slot(self, key))
+        _set_slot(record, '_keys', self._keys)
+        _set_slot(record, '_extra', dict(self._extra) if self._extra else None)
+        return record
+
+    def to_dict(self):
+        """This record as a plain dict (values are not converted)"""
+        return dict(self.items())
+
+class CatalogImage(_Record):
+    """One entry of a category's image list"""
+
+    FIELDS = ('src', 'alt', 'description', 'width', 'height', 'bytes', 'variants')
+    __slots__ = FIELDS
+    _fields = frozenset(FIELDS)
+
+class CatalogCategory(_Record):
+    """One gallery category; id and name are interned, as every category repeats them elsewhere"""
+
+    FIELDS = ('id', 'name', 'description', 'images')
+    __slots__ = FIELDS
+    _fields = frozenset(FIELDS)
+    _converted = frozenset(('id', 'name'))
+
+    @staticmethod
+    def _convert(key, value):
+        return sys.intern(value) if type(value) is str else value
+
+class Catalog(_Record):
+    """The whole of gallery-data.json"""
+
+    FIELDS = ('categories', 'assets')
+    __slots__ = FIELDS
+    _fields = frozenset(FIELDS)
+
+# Record type, shared key order and "every key is a plain field" for each distinct
+# key sequence met while parsing, so most objects are classified by one dict lookup
+_layouts = {}
+_LAYOUT_CACHE_KEYS = 16 # larger objects (such as the asset map) are not cached
+
+def _layout(keys):
+    if 'categories' in keys:
+        record_type = Catalog
+    elif 'images' in keys:
+        record_type = CatalogCategory
+    elif 'src' in keys:
+        record_type = CatalogImage
+    else:
+        return None, False, keys
+    plain = len(set(keys)) == len(keys) and record_type._fields.issuperset(keys) and not record_type._converted
+    layout = record_type, plain, _shared(keys) if plain else keys
+    if len(keys) <= _LAYOUT_CACHE_KEYS:
+        _layouts[keys] = layout
+    return layout
+
+def _object_hook(pairs):
+    # json calls this innermost object first, so nested objects are converted already
+    if not pairs:
+        return {}
+    keys, _ = zip(*pairs)
+    record_type, plain, keys = _layouts.get(keys) or _layout(keys)
+    if record_type is None:
+        return dict(pairs)
+    if not plain:
+        return record_type.from_pairs(pairs)
+    record = record_type.__new__(record_type)
+    for key, value in pairs:
+        _set_slot(record, key, value)
+    _set_slot(record, '_keys', keys)
+    _set_slot(record, '_extra', None)
+    return record
+
+def loads_catalog(text):
+    """Parse gallery-data.json text into records. Raises json.JSONDecodeError on invalid input."""
+    catalog = json.loads(text, object_pairs_hook=_object_hook)
+    if not isinstance(catalog, Catalog):
+        # Not an object with a "categories" key: still give the caller something to work with
+        catalog = Catalog(catalog if isinstance(catalog, dict) else ())
+    return catalog
+
+def load_catalog(path):
+    """Read gallery-data.json into records. Raises OSError or json.JSONDecodeError."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return loads_catalog(f.read())
+
+def json_default(value):
+    """`default` for json.dump(s), so records serialise like the dicts they stand for"""
+    if isinstance(value, _Record):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _float_text(value):
+    if value != value:
+        return 'NaN'
+    if value == float('inf'):
+        return 'Infinity'
+    if value == -float('inf'):
+        return '-Infinity'
+    return float.__repr__(value)
+
+def _key_text(key):
+    # json.dump's rules for non-string keys
+    if isinstance(key, str):
+        return encode_basestring_ascii(key)
+    if key is True:
+        return '"true"'
+    if key is False:
+        return '"false"'
+    if key is None:
+        return '"null"'
+    if isinstance(key, int):
+        return encode_basestring_ascii(int.__repr__(key))
+    if isinstance(key, float):
+        return encode_basestring_ascii(_float_text(key))
+    raise TypeError(f"keys must be str, int, float, bool or None, not {type(key).__name__}")
+
+_SCALARS = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+    float: _float_text,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null',
+}
+# '"key": ' texts for each record key order
+_key_prefixes = {}
+
+def _flat_text(value, level):
+    """The whole text of a non-empty list, dict or record of plain values, or None if it holds containers
+
+    Most of a catalogue is image entries like this, and writing each in one piece
+    is what makes the writer quicker than json.dump's pure-Python indented encoder.
+    """
+    try:
+        if isinstance(value, (list, tuple)):
+            opening, closing = '[', ']'
+            parts = [_SCALARS[type(item)](item) for item in value]
+        elif isinstance(value, _Record):
+            opening, closing = '{', '}'
+            prefixes = _key_prefixes.get(value._keys)
+            if prefixes is None:
+                prefixes = _key_prefixes[value._keys] = [_key_text(key) + ': ' for key in value._keys]
+            parts = [prefix + _SCALARS[type(item)](item) for prefix, item in zip(prefixes, value.values())]
+        else:
+            opening, closing = '{', '}'
+            parts = [_key_text(key) + ': ' + _SCALARS[type(item)](item) for key, item in value.items()]
+    except KeyError:
+        return None
+    newline = '\n' + INDENT * (level + 1)
+    return opening + newline + (',' + newline).join(parts) + '\n' + INDENT * level + closing
+
+def iter_json(value, level=0):
+    """Yield the text of json.dumps(value, indent=2) in pieces, one value at a time"""
+    if isinstance(value, str):
+        yield encode_basestring_ascii(value)
+    elif value is None:
+        yield 'null'
+    elif value is True:
+        yield 'true'
+    elif value is False:
+        yield 'false'
+    elif isinstance(value, int):
+        yield int.__repr__(value)
+    elif isinstance(value, float):
+        yield _float_text(value)
+    elif isinstance(value, (list, tuple, dict, _Record)):
+        if not value:
+            yield '[]' if isinstance(value, (list, tuple)) else '{}'
+            return
+        text = _flat_text(value, level)
+        if text is not None:
+            yield text
+            return
+        newline = '\n' + INDENT * (level + 1)
+        if isinstance(value, (list, tuple)):
+            separator = '[' + newline
+            # Entries of plain values (image entries) are yielded in batches, not one generator each
+            batch = []
+            for item in value:
+                text = _flat_text(item, level + 1) if isinstance(item, (list, tuple, dict, _Record)) and item else None
+                if text is None:
+                    batch.append(separator)
+                    yield ''.join(batch)
+                    batch.clear()
+                    yield from iter_json(item, level + 1)
+                else:
+                    batch.append(separator + text)
+                    if len(batch) >= BATCH_ENTRIES:
+                        yield ''.join(batch)
+                        batch.clear()
+                separator = ',' + newline
+            batch.append('\n' + INDENT * level + ']')
+            yield ''.join(batch)
+        else:
+            separator = '{' + newline
+            for key, item in value.items():
+                yield separator
+                yield _key_text(key)
+                yield ': '
+                yield from iter_json(item, level + 1)
+                separator = ',' + newline
+            yield '\n' + INDENT * level + '}'
+    else:
+        raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def write_catalog(data, path):
+    """Write data (records or plain dicts) to path exactly as json.dump(data, f, indent=2) would
+
+    Pieces are written as they are produced, so the full text is never held in memory,
+    and the file replaces path only once it is complete: a crash leaves the old file.
+    """
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            buffer = []
+            size = 0
+            for piece in iter_json(data):
+                buffer.append(piece)
+                size += len(piece)
+                if size >= WRITE_BUFFER_SIZE:
+                    f.write(''.join(buffer))
+                    buffer.clear()
+                    size = 0
+            f.write(''.join(buffer))
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,124 @@
+"""
+Shared logging for the gallery scripts.
+
+Every script logs through log_message(), which echoes "LEVEL: message" to the console
+(stderr for errors, stdout otherwise) and appends the same line to the script's debug
+log file. File writes go through a queue to a single background writer that keeps the
+file open and writes in batches, so logging from several threads is safe and costs no
+open/close per line.
+
+Two environment variables adjust the output:
+  JOYFUL_LOG_LEVEL   lowest level that is logged (default DEBUG). Use is_enabled('DEBUG')
+                     to skip building expensive DEBUG messages when they would be dropped.
+  JOYFUL_LOG_FORMAT  'json' writes one JSON object per line to the log file instead of text.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import threading
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'SUCCESS': 25, 'WARNING': 30, 'ERROR': 40}
+WRITE_BATCH_SIZE = 512
+
+_threshold = LEVELS.get(os.environ.get('JOYFUL_LOG_LEVEL', 'DEBUG').upper(), LEVELS['DEBUG'])
+_json_format = os.environ.get('JOYFUL_LOG_FORMAT', '').lower() == 'json'
+_script_name = ''
+_console_lock = threading.Lock()
+_writer = None
+
+class _LogWriter:
+    """Background thread that owns the log file and drains the line queue in batches."""
+
+    _STOP = object()
+
+    def __init__(self, log_file):
+        self.log_file = log_file
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self._run, name='gallery-log-writer', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            line = self.queue.get()
+            batch = []
+            while line is not self._STOP:
+                batch.append(line)
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    break
+                try:
+                    line = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                self.log_file.write(''.join(batch))
+                if line is self._STOP or self.queue.empty():
+                    self.log_file.flush()
+            except Exception as e:
+                print(f"ERROR: Failed to write to log file {self.log_file.name}: {e}", file=sys.stderr)
+            if line is self._STOP:
+                return
+
+    def close(self):
+        self.queue.put(self._STOP)
+        self.thread.join()
+        self.log_file.close()
+
+def setup_logging(log_file_path, script_name):
+    """Truncates the script's debug log and starts the background writer for it.
+
+    The first script to set up logging in a process owns the log file; calls made
+    later by modules it imports (e.g. from validate_gallery.py) keep using it.
+    """
+    global _writer, _script_name
+    if _writer is not None:
+        return
+    _script_name = script_name
+    try:
+        log_file = open(log_file_path, 'w', encoding='utf-8')
+        log_file.write(f"--- Log Start ({script_name}) ---\n")
+        log_file.write(f"Initial log path: {log_file_path}\n")
+    except Exception as e:
+        print(f"CRITICAL: Failed to initialize logging for {script_name}: {e}", file=sys.stderr)
+        return
+    _writer = _LogWriter(log_file)
+
+def close_logging():
+    """Writes out everything still queued and closes the log file."""
+    global _writer
+    if _writer is not None:
+        _writer.close()
+        _writer = None
+
+atexit.register(close_logging)
+
+def is_enabled(level):
+    return LEVELS.get(level, LEVELS['INFO']) >= _threshold
+
+def log_message(message, level='INFO'):
+    if LEVELS.get(level, LEVELS['INFO']) < _threshold:
+        return
+    formatted_message = f"{level}: {message}"
+    with _console_lock:
+        print(formatted_message, file=sys.stderr if level == 'ERROR' else sys.stdout)
+    if _writer is not None:
+        if _json_format:
+            line = json.dumps({'ts': time.time(), 'script': _script_name, 'level': level, 'message': str(message)})
+        else:
+            line = formatted_message
+        _writer.queue.put(line + '\n')
+
+def print_error(message):
+    log_message(message, level='ERROR')
+
+def print_success(message):
+    log_message(message, level='SUCCESS')
+
+def print_info(message):
+    log_message(message, level='INFO')
+
+def print_warning(message):
+    log_message(message, level='WARNING')
@@ -0,0 +1,208 @@
+"""
+Run metrics for the gallery scripts.
+
+Scripts record where their time goes through three kinds of measurement:
+  span(name)          a timed phase (e.g. 'sync.plan'); repeated spans add up
+  add(name, value)    a counter (files scanned, bytes uploaded, requests made, retries, cache hits)
+  timer(name)         one remote call, recorded in a latency histogram (e.g. 's3.head')
+
+Nothing is recorded unless a report was asked for, through setup_metrics() arguments
+(`python joyful.py --report PATH --prometheus PATH`) or these environment variables:
+  JOYFUL_METRICS_REPORT  JSON report written when the process exits
+  JOYFUL_METRICS_PROM    Prometheus text file (for node_exporter's textfile collector)
+When disabled, span() and timer() return a shared do-nothing context manager and add()
+returns at once, so instrumented code runs at practically full speed.
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import threading
+
+# Upper bounds in seconds, as Prometheus histograms use them
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REPORT_VERSION = 1
+
+_enabled = False
+_lock = threading.Lock()
+_script_name = ''
+_report_path = None
+_prometheus_path = None
+_started = 0.0
+_started_wall = 0.0
+_spans = {}       # name -> [count, total seconds, longest seconds, first start offset]
+_counters = {}    # name -> value
+_histograms = {}  # name -> [count, sum, min, max, per-bucket counts (last is +Inf)]
+
+class _NoOp:
+    """Stands in for a span or timer when metrics are disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+_NO_OP = _NoOp()
+
+class _Span:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        end = time.perf_counter()
+        elapsed = end - self.start
+        with _lock:
+            entry = _spans.get(self.name)
+            if entry is None:
+                _spans[self.name] = [1, elapsed, elapsed, self.start - _started]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] = max(entry[2], elapsed)
+        return False
+
+class _Timer(_Span):
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+def setup_metrics(script_name, report_path=None, prometheus_path=None):
+    """Turns recording on if a JSON report or Prometheus file was requested.
+
+    Paths default to the environment variables above. As with setup_logging(), the
+    first call in a process wins, so joyful.py's settings cover the scripts it runs.
+    """
+    global _enabled, _script_name, _report_path, _prometheus_path, _started, _started_wall
+    if _enabled:
+        return
+    report_path = report_path or os.environ.get('JOYFUL_METRICS_REPORT')
+    prometheus_path = prometheus_path or os.environ.get('JOYFUL_METRICS_PROM')
+    if not report_path and not prometheus_path:
+        return
+    _script_name = script_name
+    _report_path = os.path.abspath(report_path) if report_path else None
+    _prometheus_path = os.path.abspath(prometheus_path) if prometheus_path else None
+    _started = time.perf_counter()
+    _started_wall = time.time()
+    _enabled = True
+    atexit.register(write_reports)
+
+def is_enabled():
+    return _enabled
+
+def span(name):
+    return _Span(name) if _enabled else _NO_OP
+
+def timer(name):
+    return _Timer(name) if _enabled else _NO_OP
+
+def add(name, value=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def observe(name, seconds):
+    if not _enabled:
+        return
+    bucket = 0
+    while bucket < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[bucket]:
+        bucket += 1
+    with _lock:
+        entry = _histograms.get(name)
+        if entry is None:
+            entry = _histograms[name] = [0, 0.0, seconds, seconds, [0] * (len(LATENCY_BUCKETS) + 1)]
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = min(entry[2], seconds)
+        entry[3] = max(entry[3], seconds)
+        entry[4][bucket] += 1
+
+def _cumulative(counts):
+    total = 0
+    for count in counts:
+        total += count
+        yield total
+
+def build_report():
+    """Returns everything recorded so far as a JSON-serialisable dict."""
+    with _lock:
+        spans = sorted(_spans.items(), key=lambda item: item[1][3])
+        histograms = {}
+        for name, (count, total, low, high, counts) in sorted(_histograms.items()):
+            bounds = [str(bound) for bound in LATENCY_BUCKETS] + ['+Inf']
+            histograms[name] = {'count': count, 'sum_seconds': total, 'min_seconds': low, 'max_seconds': high,
+                                'buckets': dict(zip(bounds, _cumulative(counts)))}
+        return {
+            'version': REPORT_VERSION,
+            'script': _script_name,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(_started_wall)),
+            'duration_seconds': time.perf_counter() - _started,
+            'spans': {name: {'count': count, 'seconds': total, 'max_seconds': longest}
+                      for name, (count, total, longest, _) in spans},
+            'counters': dict(sorted(_counters.items())),
+            'histograms': histograms,
+        }
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def prometheus_text(report):
+    """Formats a report in the Prometheus text exposition format."""
+    script = _label(report['script'])
+    lines = [
+        '# HELP joyful_run_duration_seconds Wall-clock duration of the last run.',
+        '# TYPE joyful_run_duration_seconds gauge',
+        f'joyful_run_duration_seconds{{script="{script}"}} {report["duration_seconds"]:.6f}',
+        '# HELP joyful_run_timestamp_seconds Unix time at which the last run started.',
+        '# TYPE joyful_run_timestamp_seconds gauge',
+        f'joyful_run_timestamp_seconds{{script="{script}"}} {_started_wall:.3f}',
+        '# HELP joyful_span_seconds Time spent in each phase of the last run.',
+        '# TYPE joyful_span_seconds gauge',
+    ]
+    lines.extend(f'joyful_span_seconds{{script="{script}",span="{_label(name)}"}} {entry["seconds"]:.6f}'
+                 for name, entry in report['spans'].items())
+    lines.extend([
+        '# HELP joyful_events_total Counts recorded during the last run.',
+        '# TYPE joyful_events_total counter',
+    ])
+    lines.extend(f'joyful_events_total{{script="{script}",counter="{_label(name)}"}} {value}'
+                 for name, value in report['counters'].items())
+    lines.extend([
+        '# HELP joyful_remote_call_seconds Latency of remote calls during the last run.',
+        '# TYPE joyful_remote_call_seconds histogram',
+    ])
+    for name, histogram in report['histograms'].items():
+        labels = f'script="{script}",call="{_label(name)}"'
+        lines.extend(f'joyful_remote_call_seconds_bucket{{{labels},le="{bound}"}} {count}'
+                     for bound, count in histogram['buckets'].items())
+        lines.append(f'joyful_remote_call_seconds_sum{{{labels}}} {histogram["sum_seconds"]:.6f}')
+        lines.append(f'joyful_remote_call_seconds_count{{{labels}}} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+def _write(path, content):
+    # Written under a temporary name first, so a collector never reads half a file
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(content)
+    os.replace(temp_path, path)
+
+def write_reports():
+    """Writes the JSON report and Prometheus file, if requested. Runs automatically at exit."""
+    if not _enabled:
+        return
+    report = build_report()
+    try:
+        if _report_path:
+            _write(_report_path, json.dumps(report, indent=2) + '\n')
+        if _prometheus_path:
+            _write(_prometheus_path, prometheus_text(report))
+    except OSError as e:
+        print(f"WARNING: Could not write the run report: {e}", file=sys.stderr)
@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+"""
+Responsive Image Derivative Generator
+
+This script creates smaller, modern-format copies (WebP and, where Pillow supports it,
+AVIF) of every gallery image listed in gallery-data.json and records them on each image
+entry as "variants", so the gallery page can offer the browser a srcset instead of the
+full-size original. Run it after update_gallery_data.py; `joyful.py all` and
+watch_gallery.py run it for you.
+
+Derivatives are written to docs/images/derivatives under content-addressed names
+(<source hash>-<width>w.<ext>), so an unchanged source is never re-encoded and an edited
+one gets fresh URLs. Encoding runs in a process pool sized to the available cores.
+"""
+
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+
+from content_hash import file_sha256
+from update_gallery_data import load_gallery_data, save_gallery_data, save_gallery_shards
+
+# Configuration
+IMAGES_BASE_PATH = "docs/images"
+DERIVATIVES_DIR = "derivatives" # relative to IMAGES_BASE_PATH, like every "src"
+DERIVATIVE_CACHE_PATH = ".derivatives_cache.json"
+DERIVATIVE_WIDTHS = [400, 800, 1600]
+# Preferred first: browsers take the first <source> whose type they support
+DERIVATIVE_FORMATS = [
+    {"format": "AVIF", "extension": "avif", "type": "image/avif", "quality": 50},
+    {"format": "WEBP", "extension": "webp", "type": "image/webp", "quality": 80},
+]
+
+def available_formats():
+    """Return the derivative formats the installed Pillow can encode"""
+    return [fmt for fmt in DERIVATIVE_FORMATS if features.check(fmt["format"].lower())]
+
+def load_cache():
+    try:
+        with open(DERIVATIVE_CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_cache(cache):
+    temp_path = DERIVATIVE_CACHE_PATH + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(cache, f)
+    os.replace(temp_path, DERIVATIVE_CACHE_PATH)
+
+def target_widths(source_width):
+    """Widths to generate for a source image; originals are never upscaled"""
+    widths = [w for w in DERIVATIVE_WIDTHS if w < source_width]
+    return widths or [source_width]
+
+def encode_derivatives(source_path, source_hash, formats):
+    """Encode every width/format variant of one image. Runs in a worker process."""
+    variants = []
+    with Image.open(source_path) as opened:
+        image = ImageOps.exif_transpose(opened)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+        for width in target_widths(image.width):
+            height = max(1, round(image.height * width / image.width))
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+            for fmt in formats:
+                name = f"{source_hash[:16]}-{width}w.{fmt['extension']}"
+                output_path = os.path.join(IMAGES_BASE_PATH, DERIVATIVES_DIR, name)
+                if not os.path.exists(output_path):
+                    # Duplicate sources share a hash, so another worker may be writing the same name
+                    temp_path = f"{output_path}.{os.getpid()}.tmp"
+                    resized.save(temp_path, format=fmt["format"], quality=fmt["quality"])
+                    os.replace(temp_path, output_path)
+                variants.append({
+                    "src": f"{DERIVATIVES_DIR}/{name}",
+                    "width": width,
+                    "height": height,
+                    "type": fmt["type"],
+                })
+    return variants
+
+def variants_present(variants):
+    return bool(variants) and all(
+        os.path.exists(os.path.join(IMAGES_BASE_PATH, variant["src"])) for variant in variants
+    )
+
+def generate_derivatives(gallery_data, jobs=None, force=False):
+    """Create missing derivatives and record them on each image entry
+
+    Returns (encoded, reused, failed) image counts.
+    """
+    formats = available_formats()
+    os.makedirs(os.path.join(IMAGES_BASE_PATH, DERIVATIVES_DIR), exist_ok=True)
+    cache = {} if force else load_cache()
+    new_cache = {}
+    images_by_src = {}
+    for category in gallery_data.get("categories", []):
+        for img in category.get("images", []):
+            if "src" in img:
+                images_by_src.setdefault(img["src"], []).append(img)
+
+    pending = {}
+    reused = 0
+    for src in images_by_src:
+        source_path = os.path.join(IMAGES_BASE_PATH, src)
+        try:
+            stat = os.stat(source_path)
+        except FileNotFoundError:
+            print(f"Skipping missing image: {src}")
+            continue
+        entry = cache.get(src)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            source_hash = entry["hash"]
+            if variants_present(entry.get("variants")):
+                new_cache[src] = entry
+                reused += 1
+                continue
+        else:
+            source_hash = file_sha256(source_path)
+        new_cache[src] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": source_hash}
+        pending[src] = (source_path, source_hash)
+
+    failed = 0
+    if pending:
+        print(f"Encoding derivatives for {len(pending)} images with {jobs or os.cpu_count()} processes...")
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(encode_derivatives, source_path, source_hash, formats): src
+                for src, (source_path, source_hash) in pending.items()
+            }
+            for future in as_completed(futures):
+                src = futures[future]
+                try:
+                    new_cache[src]["variants"] = future.result()
+                except Exception as e:
+                    print(f"Error creating derivatives for {src}: {e}")
+                    del new_cache[src]
+                    failed += 1
+
+    for src, imgs in images_by_src.items():
+        for img in imgs:
+            if src in new_cache:
+                img["variants"] = new_cache[src]["variants"]
+            else:
+                img.pop("variants", None)
+
+    save_cache(new_cache)
+    remove_stale_derivatives(new_cache)
+    return len(pending) - failed, reused, failed
+
+def remove_stale_derivatives(cache):
+    """Delete derivative files that no current image refers to"""
+    referenced = {os.path.basename(v["src"]) for entry in cache.values() for v in entry.get("variants", [])}
+    derivatives_path = os.path.join(IMAGES_BASE_PATH, DERIVATIVES_DIR)
+    with os.scandir(derivatives_path) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name not in referenced:
+                os.remove(entry.path)
+
+def main(argv=None):
+    """Main script execution"""
+    parser = argparse.ArgumentParser(description="Generate responsive derivatives for gallery images.")
+    parser.add_argument("--jobs", type=int, default=None, help="Worker processes (default: number of CPU cores)")
+    parser.add_argument("--force", action="store_true", help="Ignore the cache and re-hash every source image")
+    parser.add_argument("--if-available", action="store_true",
+                        help="Skip with a warning instead of failing when Pillow is not installed")
+    args = parser.parse_args(argv)
+
+    if Image is None:
+        print("Pillow is required to generate derivatives. Install it with: pip install Pillow")
+        if args.if_available:
+            print("Skipping derivatives; images keep the variants they already have.")
+            return
+        sys.exit(1)
+
+    print("Starting derivative generation...")
+    gallery_data = load_gallery_data()
+    encoded, reused, failed = generate_derivatives(gallery_data, jobs=args.jobs, force=args.force)
+    print(f"Derivatives: {encoded} images encoded, {reused} unchanged, {failed} failed")
+    if not (save_gallery_data(gallery_data) and save_gallery_shards(gallery_data)) or failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Staged changes from git, for the --changed-only mode of the validators and sync_s3.py.
+
+The pre-commit hook only needs to look at what the commit touches: the image files
+staged under docs/images and the gallery-data.json entries that differ between HEAD
+and the index. Both come from a couple of quick git commands, so a one-photo commit
+is checked without walking the image tree or the whole catalogue.
+"""
+
+import json
+import subprocess
+
+GIT_TIMEOUT = 30 # seconds
+
+class GitUnavailable(Exception):
+    """git is not installed, or the folder is not inside a git work tree."""
+
+def _git(repo_dir, *args):
+    try:
+        result = subprocess.run(['git', '-C', repo_dir, *args], capture_output=True, timeout=GIT_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise GitUnavailable(f"Could not run git: {e}")
+    return result
+
+def staged_changes(repo_dir):
+    """Return {path: status} for every file staged for the next commit
+
+    Paths are relative to repo_dir with forward slashes. Status is git's letter:
+    'A' added, 'M' modified, 'D' deleted, 'T' type changed. Renames are reported
+    as a deletion plus an addition.
+    """
+    result = _git(repo_dir, 'diff', '--cached', '--name-status', '--no-renames', '--relative', '-z')
+    if result.returncode != 0:
+        raise GitUnavailable(result.stderr.decode('utf-8', 'replace').strip() or "git diff failed")
+    fields = result.stdout.decode('utf-8').split('\0')
+    return {path: status[0] for status, path in zip(fields[0::2], fields[1::2]) if path}
+
+def changes_under(changes, folder):
+    """Narrow staged_changes() output to one folder; keys become relative to it"""
+    prefix = folder.rstrip('/') + '/'
+    return {path[len(prefix):]: status for path, status in changes.items() if path.startswith(prefix)}
+
+def _catalog_at(repo_dir, revision_path):
+    """Parse gallery-data.json as stored at a revision (':' + path for the index); {} if absent or invalid"""
+    result = _git(repo_dir, 'show', revision_path)
+    if result.returncode != 0:
+        return {}
+    try:
+        return json.loads(result.stdout)
+    except ValueError:
+        return {}
+
+def _catalog_entries(catalog):
+    entries = {}
+    categories = catalog.get('categories') if isinstance(catalog, dict) else None
+    for category in categories if isinstance(categories, list) else []:
+        images = category.get('images') if isinstance(category, dict) else None
+        for item in images if isinstance(images, list) else []:
+            if isinstance(item, dict) and 'src' in item:
+                entries[item['src']] = json.dumps(item, sort_keys=True)
+    assets = catalog.get('assets') if isinstance(catalog, dict) else None
+    return entries, assets if isinstance(assets, dict) else {}
+
+def _catalog_diff(repo_dir, catalog_path):
+    """Return (changed, removed): srcs of entries new or different in the index, and srcs only in HEAD"""
+    old_entries, old_assets = _catalog_entries(_catalog_at(repo_dir, f'HEAD:./{catalog_path}'))
+    new_entries, new_assets = _catalog_entries(_catalog_at(repo_dir, f':./{catalog_path}'))
+    changed = {src for src, entry in new_entries.items()
+               if old_entries.get(src) != entry or old_assets.get(src) != new_assets.get(src)}
+    return changed, old_entries.keys() - new_entries.keys()
+
+def changed_catalog_srcs(repo_dir, catalog_path):
+    """Return the srcs of catalogue entries added, changed or removed in the index compared with HEAD
+
+    An entry counts as changed when any of its fields changed, or when its
+    fingerprinted asset key did. catalog_path is relative to repo_dir.
+    """
+    changed, removed = _catalog_diff(repo_dir, catalog_path)
+    return changed | removed
+
+def staged_gallery_changes(repo_dir, catalog_path='docs/gallery-data.json', images_path='docs/images'):
+    """Return (srcs, image_files) touched by the staged commit
+
+    `srcs` are the catalogue entries worth checking: entries added, changed or
+    removed in the catalogue plus the srcs of all staged image files (deleted ones
+    included, since an entry may still point at them). `image_files` are the files
+    that may have become unreferenced: the staged files under images_path that
+    still exist, plus the srcs of removed entries, whose files may have been kept.
+    Both are relative to images_path.
+    """
+    changes = staged_changes(repo_dir)
+    image_changes = changes_under(changes, images_path)
+    srcs = set(image_changes)
+    image_files = {path for path, status in image_changes.items() if status != 'D'}
+    if catalog_path in changes:
+        changed, removed = _catalog_diff(repo_dir, catalog_path)
+        srcs |= changed | removed
+        image_files |= removed
+    return srcs, image_files
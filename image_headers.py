@@ -0,0 +1,102 @@
+"""
+Image dimension extraction from file headers.
+
+read_image_size() finds the pixel size of a JPEG, PNG, GIF or WebP file by parsing
+only its header (a few KB at most) instead of decoding the image. For JPEGs the
+EXIF orientation is honoured, so the result is the size the browser displays.
+A truncated or malformed header gives None, like an unrecognised format.
+"""
+
+import struct
+
+# JPEG start-of-frame markers carry the frame size; C4 (DHT), C8 (JPG) and CC (DAC) share the range but do not
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+JPEG_APP1 = 0xE1
+EXIF_READ_LIMIT = 4096 # the orientation tag sits in IFD0, right at the start of the EXIF block
+EXIF_ORIENTATION_TAG = 0x0112
+
+def read_image_size(path):
+    """Return (width, height) for an image file, or None if the format is not recognised"""
+    with open(path, 'rb') as f:
+        head = f.read(32)
+        if head.startswith(b'\x89PNG\r\n\x1a\n') and head[12:16] == b'IHDR':
+            return struct.unpack('>II', head[16:24]) if len(head) >= 24 else None
+        if head[:6] in (b'GIF87a', b'GIF89a'):
+            return struct.unpack('<HH', head[6:10]) if len(head) >= 10 else None
+        if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+            return _webp_size(head)
+        if head[:2] == b'\xff\xd8':
+            f.seek(2)
+            return _jpeg_size(f)
+    return None
+
+def _webp_size(head):
+    chunk = head[12:16]
+    if chunk == b'VP8 ' and head[23:26] == b'\x9d\x01\x2a' and len(head) >= 30:
+        width, height = struct.unpack('<HH', head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L' and head[20:21] == b'\x2f' and len(head) >= 25:
+        b = head[21:25]
+        width = 1 + (b[0] | (b[1] & 0x3F) << 8)
+        height = 1 + (b[1] >> 6 | b[2] << 2 | (b[3] & 0x0F) << 10)
+        return width, height
+    if chunk == b'VP8X' and len(head) >= 30:
+        width = 1 + int.from_bytes(head[24:27], 'little')
+        height = 1 + int.from_bytes(head[27:30], 'little')
+        return width, height
+    return None
+
+def _jpeg_size(f):
+    orientation = 1
+    while True:
+        byte = f.read(1)
+        while byte and byte != b'\xff':
+            byte = f.read(1)
+        while byte == b'\xff': # markers may be preceded by any number of fill bytes
+            byte = f.read(1)
+        if not byte:
+            return None
+        marker = byte[0]
+        if marker == 0xD9 or marker == 0xDA: # end of image / start of scan without a frame header
+            return None
+        if 0xD0 <= marker <= 0xD8 or marker == 0x01: # standalone markers have no length
+            continue
+        length_bytes = f.read(2)
+        if len(length_bytes) < 2:
+            return None
+        segment_length = struct.unpack('>H', length_bytes)[0] - 2
+        if segment_length < 0: # a length below 2 cannot cover the length field itself
+            return None
+        if marker in JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) < 5:
+                return None
+            height, width = struct.unpack('>HH', frame[1:5])
+            # Orientations 5-8 rotate the image by 90 degrees when displayed
+            return (height, width) if orientation >= 5 else (width, height)
+        if marker == JPEG_APP1:
+            data = f.read(min(segment_length, EXIF_READ_LIMIT))
+            orientation = _exif_orientation(data) or orientation
+            f.seek(segment_length - len(data), 1)
+        else:
+            f.seek(segment_length, 1)
+
+def _exif_orientation(data):
+    if not data.startswith(b'Exif\x00\x00') or len(data) < 14:
+        return None
+    tiff = data[6:]
+    byte_order = {b'II': '<', b'MM': '>'}.get(tiff[:2])
+    if not byte_order:
+        return None
+    ifd_offset = struct.unpack(byte_order + 'I', tiff[4:8])[0]
+    if ifd_offset + 2 > len(tiff):
+        return None
+    entry_count = struct.unpack(byte_order + 'H', tiff[ifd_offset:ifd_offset + 2])[0]
+    for index in range(entry_count):
+        entry = ifd_offset + 2 + index * 12
+        if entry + 12 > len(tiff):
+            return None
+        tag, _, _ = struct.unpack(byte_order + 'HHI', tiff[entry:entry + 8])
+        if tag == EXIF_ORIENTATION_TAG:
+            return struct.unpack(byte_order + 'H', tiff[entry + 8:entry + 10])[0]
+    return None
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Joyful Gallery Command Line
+
+One entry point for the gallery scripts, so the pre-commit hook starts Python once:
+
+  python joyful.py update [options]    update_gallery_data.py
+  python joyful.py derivatives [opts]  generate_derivatives.py
+  python joyful.py render [options]    render_gallery.py
+  python joyful.py validate [options]  validate_gallery.py
+  python joyful.py sync [options]      sync_s3.py
+  python joyful.py all [--changed-only] [--dry-run]
+                                       update, derivatives, render, validate, sync, then
+                                       validate --s3 --skip-local
+
+`--report PATH` and `--prometheus PATH` (before the subcommand) write where the time
+went, as JSON and as a Prometheus text file; see gallery_metrics.py.
+
+Options after a subcommand are passed to its script unchanged, so
+`python joyful.py sync --help` shows sync_s3.py's options. Nothing is imported until a
+subcommand runs, and each subcommand imports only the script it needs (boto3 and
+requests are loaded later still, on first use), which keeps `--help` and the hook fast.
+"""
+
+import os
+import sys
+import argparse
+
+SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
+LOG_FILE_PATH = os.path.join(SCRIPT_DIR, 'debug_joyful.log')
+
+def run_update(argv):
+    import update_gallery_data
+    update_gallery_data.main(argv)
+
+def run_derivatives(argv):
+    import generate_derivatives
+    generate_derivatives.main(argv)
+
+def run_render(argv):
+    import render_gallery
+    render_gallery.main(argv)
+
+def run_validate(argv):
+    import validate_gallery
+    validate_gallery.main(argv)
+
+def run_sync(argv):
+    import sync_s3
+    sync_s3.main(argv)
+
+COMMANDS = {
+    'update': (run_update, "Update gallery-data.json from docs/images/gallery (update_gallery_data.py)"),
+    'derivatives': (run_derivatives, "Create resized WebP/AVIF copies of new gallery images (generate_derivatives.py)"),
+    'render': (run_render, "Pre-render the gallery page from gallery-data.json (render_gallery.py)"),
+    'validate': (run_validate, "Validate gallery-data.json against local files and S3 (validate_gallery.py)"),
+    'sync': (run_sync, "Upload changed images to S3 (sync_s3.py)"),
+}
+
+def exit_code(run, argv):
+    """Run a subcommand and return its exit status instead of leaving the process"""
+    try:
+        run(argv)
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    return 0
+
+def run_all(args):
+    """The full pre-commit sequence; stops at the first step that fails"""
+    from gallery_logging import print_error, print_info
+    changed_only = ['--changed-only'] if args.changed_only else []
+    steps = [
+        ("update", run_update, []),
+        # Derivatives are an optimisation, so a missing Pillow only skips them
+        ("derivatives", run_derivatives, ['--if-available']),
+        ("render", run_render, []),
+        ("validate", run_validate, changed_only),
+        ("sync", run_sync, changed_only + (['--dry-run'] if args.dry_run else [])),
+    ]
+    if not args.dry_run:
+        steps.append(("validate --s3", run_validate, ['--s3', '--skip-local'] + changed_only))
+    for name, run, argv in steps:
+        print_info(f"=== joyful {name} ===")
+        code = exit_code(run, argv)
+        if code:
+            print_error(f"'{name}' failed with exit status {code}; stopping.")
+            return code
+    return 0
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='joyful', description="Manage the Joyful Photography gallery.")
+    parser.add_argument('--report', metavar='PATH', help="Write per-phase timings and counters to a JSON file")
+    parser.add_argument('--prometheus', metavar='PATH', help="Also write them as a Prometheus text file")
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+    subparsers.required = True
+    for name, (_, help_text) in COMMANDS.items():
+        # The script's own parser handles the options, including --help
+        subparsers.add_parser(name, help=help_text, add_help=False)
+    all_parser = subparsers.add_parser('all', help="Run update, derivatives, render, validate, sync and the S3 validation in turn")
+    all_parser.add_argument('--changed-only', action='store_true',
+                            help="Validate and sync only what is staged for the next commit")
+    all_parser.add_argument('--dry-run', action='store_true',
+                            help="Print the sync plan without uploading (skips the S3 validation)")
+    args, extra = parser.parse_known_args(argv)
+    if args.command == 'all' and extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    return args, extra
+
+def main(argv=None):
+    args, extra = parse_args(argv)
+    from gallery_logging import setup_logging
+    from gallery_metrics import setup_metrics
+    # Claim the log and the run report first; the scripts run below keep using them
+    setup_logging(LOG_FILE_PATH, f'joyful.py {args.command}')
+    setup_metrics(f'joyful.py {args.command}', args.report, args.prometheus)
+    # update_gallery_data.py works with paths relative to the repository root
+    os.chdir(SCRIPT_DIR)
+    if args.command == 'all':
+        sys.exit(run_all(args))
+    run, _ = COMMANDS[args.command]
+    run(extra)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Resumable multipart uploads to S3.
+
+Large originals are split into fixed-size parts that are uploaded concurrently.
+Every completed part is recorded in a small JSON checkpoint file, so a run that
+is interrupted part-way resumes the same multipart upload instead of sending
+the whole file again. An optional BandwidthLimiter caps the combined upload
+rate of every thread that shares it.
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import gallery_metrics as metrics
+
+MB = 1024 * 1024
+MIN_PART_SIZE = 5 * MB # S3 rejects smaller parts (except the last one)
+MAX_PARTS = 10000
+DEFAULT_PART_SIZE = 8 * MB
+DEFAULT_PART_JOBS = 4
+CHECKPOINT_VERSION = 1
+
+class BandwidthLimiter:
+    """Token bucket shared between threads, refilled at `bytes_per_second`."""
+
+    def __init__(self, bytes_per_second):
+        self.rate = float(bytes_per_second)
+        self._lock = threading.Lock()
+        self._tokens = self.rate
+        self._last = time.monotonic()
+
+    def consume(self, num_bytes):
+        """Blocks until `num_bytes` may be sent without exceeding the rate."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= num_bytes
+            deficit = -self._tokens
+        if deficit > 0:
+            time.sleep(deficit / self.rate)
+
+def choose_part_size(file_size, part_size=DEFAULT_PART_SIZE):
+    """Returns a part size of at least `part_size` that keeps the upload within S3's 10,000-part limit."""
+    part_size = max(part_size, MIN_PART_SIZE)
+    while file_size > part_size * MAX_PARTS:
+        part_size *= 2
+    return part_size
+
+def multipart_etag(file_path, part_size):
+    """Returns the ETag S3 gives `file_path` uploaded in parts of `part_size` bytes.
+
+    That is the MD5 of the concatenated binary MD5s of the parts, followed by '-' and
+    the number of parts, rather than the MD5 of the whole file.
+    """
+    digests = []
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(part_size), b''):
+            digests.append(hashlib.md5(chunk).digest())
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+def checkpoint_path(checkpoint_dir, bucket, key):
+    name = hashlib.sha1(f"{bucket}/{key}".encode('utf-8')).hexdigest()
+    return os.path.join(checkpoint_dir, name + '.json')
+
+def _load_checkpoint(path, key, stat, part_size):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    # A checkpoint only applies to the exact same file contents and part layout
+    if checkpoint.get('version') != CHECKPOINT_VERSION or checkpoint.get('key') != key or \
+       checkpoint.get('size') != stat.st_size or checkpoint.get('mtime_ns') != stat.st_mtime_ns or \
+       checkpoint.get('part_size') != part_size:
+        return None
+    return checkpoint
+
+def _save_checkpoint(path, checkpoint):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, path)
+
+def multipart_upload(client, bucket, key, file_path, checkpoint_dir, part_size=DEFAULT_PART_SIZE,
+                     part_jobs=DEFAULT_PART_JOBS, limiter=None, extra_args=None):
+    """Uploads `file_path` to s3://bucket/key in parts, resuming from a checkpoint if one exists.
+
+    Returns the number of parts that were actually sent in this call (0 when
+    everything had been uploaded by an earlier, interrupted run). On failure
+    the checkpoint is kept and the exception propagates.
+    """
+    stat = os.stat(file_path)
+    part_size = choose_part_size(stat.st_size, part_size)
+    part_count = max(1, -(-stat.st_size // part_size))
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    state_path = checkpoint_path(checkpoint_dir, bucket, key)
+
+    checkpoint = _load_checkpoint(state_path, key, stat, part_size)
+    if checkpoint:
+        try:
+            # Trust S3's view of the completed parts over our own, in case the last write was lost
+            completed = {}
+            paginator = client.get_paginator('list_parts')
+            for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=checkpoint['upload_id']):
+                for part in page.get('Parts', []):
+                    completed[str(part['PartNumber'])] = part['ETag']
+            checkpoint['parts'] = completed
+        except client.exceptions.NoSuchUpload:
+            checkpoint = None
+    if not checkpoint:
+        response = client.create_multipart_upload(Bucket=bucket, Key=key, **(extra_args or {}))
+        checkpoint = {
+            'version': CHECKPOINT_VERSION,
+            'key': key,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'part_size': part_size,
+            'upload_id': response['UploadId'],
+            'parts': {},
+        }
+        _save_checkpoint(state_path, checkpoint)
+
+    lock = threading.Lock()
+
+    def upload_part(part_number):
+        with open(file_path, 'rb') as f:
+            f.seek((part_number - 1) * part_size)
+            data = f.read(part_size)
+        if limiter:
+            limiter.consume(len(data))
+        with metrics.timer('s3.upload_part'):
+            response = client.upload_part(Bucket=bucket, Key=key, UploadId=checkpoint['upload_id'],
+                                          PartNumber=part_number, Body=data)
+        metrics.add('s3.requests')
+        metrics.add('s3.retries', response.get('ResponseMetadata', {}).get('RetryAttempts', 0))
+        metrics.add('s3.bytes_uploaded', len(data))
+        with lock:
+            checkpoint['parts'][str(part_number)] = response['ETag']
+            _save_checkpoint(state_path, checkpoint)
+
+    pending = [n for n in range(1, part_count + 1) if str(n) not in checkpoint['parts']]
+    with ThreadPoolExecutor(max_workers=max(1, min(part_jobs, len(pending) or 1))) as executor:
+        # list() re-raises the first failed part after the others have finished
+        list(executor.map(upload_part, pending))
+
+    client.complete_multipart_upload(
+        Bucket=bucket, Key=key, UploadId=checkpoint['upload_id'],
+        MultipartUpload={'Parts': [
+            {'PartNumber': n, 'ETag': checkpoint['parts'][str(n)]} for n in range(1, part_count + 1)
+        ]},
+    )
+    os.remove(state_path)
+    return len(pending)
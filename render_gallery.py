@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+"""
+Gallery Page Renderer
+
+Expands gallery-data.json into static HTML inside docs/gallery.html, so the first photos
+appear without waiting for gallery.js to fetch the catalogue and build the page:
+
+  - the category tabs, with the first one active
+  - the first category's heading, description and images, inline
+  - every other category's images in a <template>, which the browser parses but does
+    not render or download images for until gallery.js moves them into the page
+
+The generated HTML goes between the RENDER_START and RENDER_END comments of the page;
+everything outside them is left as it is. Image URLs are resolved as
+siteConfig.s3.getImageUrl does in production (bucketUrl/prefix/key, with the key taken
+from the asset map when fingerprinting is on), reading bucketUrl and prefix from
+docs/js/config.js. Each image also carries its catalogue path in data-src (and its
+variants in data-srcset), from which gallery.js resolves the /images/ URLs getImageUrl
+uses on localhost, so the same committed page works for local previews.
+
+Rendering is incremental: each category's HTML is cached in .gallery_render_cache.json
+with a hash of its catalogue data, and only categories whose data changed are rendered
+again. The page is only rewritten when its content changes.
+"""
+
+import os
+import re
+import sys
+import json
+import html
+import hashlib
+import argparse
+from urllib.parse import quote
+
+import gallery_metrics as metrics
+from gallery_catalog import load_catalog, json_default
+
+# Configuration
+GALLERY_DATA_PATH = "docs/gallery-data.json"
+GALLERY_PAGE_PATH = "docs/gallery.html"
+CONFIG_JS_PATH = "docs/js/config.js"
+RENDER_CACHE_PATH = ".gallery_render_cache.json"
+RENDER_VERSION = 2 # bump when the generated markup changes, to re-render every category
+RENDER_START = "<!-- gallery:render -->"
+RENDER_END = "<!-- /gallery:render -->"
+# Keep in sync with GALLERY_IMAGE_SIZES in gallery.js and the .gallery-item widths in style.css
+GALLERY_IMAGE_SIZES = '(max-width: 480px) 100vw, (max-width: 768px) 50vw, 33vw'
+# Images of the first category loaded at once rather than lazily: about the first row
+EAGER_IMAGES = 3
+INDENT = '  '
+
+def load_image_url_settings(path=CONFIG_JS_PATH):
+    """Return (bucketUrl, prefix) from the s3 section of config.js"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    settings = []
+    for name in ('bucketUrl', 'prefix'):
+        match = re.search(r'\b' + name + r"""\s*:\s*['"]([^'"]*)['"]""", text)
+        if not match:
+            raise ValueError(f"No {name} setting found in {path}")
+        settings.append(match.group(1))
+    return tuple(settings)
+
+def image_url_resolver(base_url, assets=None):
+    """Return a function mapping an image path to its production URL, as siteConfig.s3.getImageUrl does"""
+    assets = assets or {}
+    return lambda path: f"{base_url}/{quote(assets.get(path) or path)}"
+
+def render_image(item, image_url, eager=False):
+    """HTML for one gallery tile, matching what gallery.js builds for it"""
+    attributes = (f' src="{html.escape(image_url(item["src"]))}" data-src="{html.escape(item["src"])}"'
+                  f' alt="{html.escape(item.get("alt") or "")}"')
+    if not eager:
+        attributes += ' loading="lazy"'
+    if item.get("width") and item.get("height"):
+        attributes += f' width="{item["width"]}" height="{item["height"]}"'
+    tile = f'<img{attributes}>'
+
+    # A hand-edited variant without a src cannot be offered (validate_gallery.py reports it)
+    variants = [variant for variant in item.get("variants") or [] if 'src' in variant]
+    if variants:
+        # One <source> per format, in the order the formats first appear
+        sources = []
+        for variant_type in dict.fromkeys(variant["type"] for variant in variants):
+            typed = [variant for variant in variants if variant["type"] == variant_type]
+            srcset = ', '.join(f'{image_url(variant["src"])} {variant["width"]}w' for variant in typed)
+            paths = ', '.join(f'{variant["src"]} {variant["width"]}w' for variant in typed)
+            sources.append(f'<source type="{html.escape(variant_type)}" srcset="{html.escape(srcset)}" '
+                           f'data-srcset="{html.escape(paths)}" sizes="{GALLERY_IMAGE_SIZES}">')
+        tile = f'<picture>{"".join(sources)}{tile}</picture>'
+
+    if item.get("description"):
+        tile += f'<p class="gallery-item-description">{html.escape(item["description"], quote=False)}</p>'
+    return f'<div class="gallery-item">{tile}</div>'
+
+def render_category(category, image_url, first=False):
+    """HTML for the images of one category, one tile per line"""
+    images = [item for item in category.get("images", []) if item.get("src")]
+    if not images:
+        return f'<p>No images available in the {html.escape(category.get("name", ""), quote=False)} category yet.</p>'
+    return '\n'.join(render_image(item, image_url, eager=first and index < EAGER_IMAGES)
+                     for index, item in enumerate(images))
+
+def category_hash(category, assets, first):
+    """Hash of everything render_category() output depends on for this category"""
+    images = category.get("images", [])
+    paths = {item["src"] for item in images if item.get("src")}
+    paths.update(variant["src"] for item in images for variant in item.get("variants") or [] if 'src' in variant)
+    used_assets = {path: assets[path] for path in paths if path in assets}
+    content = json.dumps([category, used_assets, first], sort_keys=True, default=json_default)
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def load_render_cache(settings):
+    """Return {category id: {"hash", "html"}} from the last run with the same settings"""
+    try:
+        with open(RENDER_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if cache.get("version") != RENDER_VERSION or cache.get("settings") != settings:
+        return {}
+    return cache.get("categories", {})
+
+def save_render_cache(settings, categories):
+    temp_path = RENDER_CACHE_PATH + ".tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({"version": RENDER_VERSION, "settings": settings, "categories": categories}, f)
+    os.replace(temp_path, RENDER_CACHE_PATH)
+
+def indent_lines(text, prefix):
+    return '\n'.join(prefix + line if line else line for line in text.split('\n'))
+
+def render_gallery_section(data, fragments):
+    """Assemble the generated part of gallery.html from the rendered categories"""
+    categories = data.get("categories", [])
+    lines = [RENDER_START, "<!-- Generated by render_gallery.py from gallery-data.json; edits here are overwritten -->"]
+    if not categories:
+        lines.extend([
+            '<div id="gallery-tabs" class="gallery-tabs"></div>',
+            '<div class="category-info">',
+            '  <h3 id="category-heading"></h3>',
+            '  <p id="category-description" class="category-description"></p>',
+            '</div>',
+            '<div id="gallery-container" class="gallery-grid" data-rendered="">',
+            '  <p>No gallery categories found. Please check back later.</p>',
+            '</div>',
+        ])
+    else:
+        first = categories[0]
+        lines.append('<div id="gallery-tabs" class="gallery-tabs">')
+        for index, category in enumerate(categories):
+            active = ' active' if index == 0 else ''
+            lines.append(f'  <button class="tab{active}" data-category="{html.escape(category.get("id", ""))}" '
+                         f'data-description="{html.escape(category.get("description") or "")}">'
+                         f'{html.escape(category.get("name", ""), quote=False)}</button>')
+        lines.extend([
+            '</div>',
+            '<div class="category-info">',
+            f'  <h3 id="category-heading">{html.escape(first.get("name", ""), quote=False)}</h3>',
+            f'  <p id="category-description" class="category-description">{html.escape(first.get("description") or "", quote=False)}</p>',
+            '</div>',
+            f'<div id="gallery-container" class="gallery-grid" data-rendered="{html.escape(first.get("id", ""))}">',
+            indent_lines(fragments[0], INDENT),
+            '</div>',
+        ])
+        for category, fragment in zip(categories[1:], fragments[1:]):
+            lines.append(f'<template data-category="{html.escape(category.get("id", ""))}">')
+            lines.append(indent_lines(fragment, INDENT))
+            lines.append('</template>')
+    lines.append(RENDER_END)
+    return '\n'.join(lines)
+
+def render_gallery(data, page_html, base_url):
+    """Return (new page HTML, rendered, reused) for the catalogue `data`
+
+    Categories whose data is unchanged since the last run reuse their cached HTML.
+    Raises ValueError if the page has no RENDER_START/RENDER_END region.
+    """
+    start = page_html.find(RENDER_START)
+    end = page_html.find(RENDER_END, start)
+    if start < 0 or end < 0:
+        raise ValueError(f"{GALLERY_PAGE_PATH} has no '{RENDER_START}' ... '{RENDER_END}' section")
+
+    settings = {"base_url": base_url, "sizes": GALLERY_IMAGE_SIZES, "eager": EAGER_IMAGES}
+    cache = load_render_cache(settings)
+    assets = data.get("assets") or {}
+    image_url = image_url_resolver(base_url, assets)
+    new_cache = {}
+    fragments = []
+    rendered = reused = 0
+    for index, category in enumerate(data.get("categories", [])):
+        key = category.get("id", "")
+        content_hash = category_hash(category, assets, index == 0)
+        cached = cache.get(key)
+        if cached and cached["hash"] == content_hash:
+            reused += 1
+        else:
+            cached = {"hash": content_hash, "html": render_category(category, image_url, first=index == 0)}
+            rendered += 1
+        new_cache[key] = cached
+        fragments.append(cached["html"])
+    save_render_cache(settings, new_cache)
+
+    # Indent the section like the line the start marker is on
+    line_start = page_html.rfind('\n', 0, start) + 1
+    section = indent_lines(render_gallery_section(data, fragments), page_html[line_start:start])[start - line_start:]
+    page_html = page_html[:start] + section + page_html[end + len(RENDER_END):]
+    return page_html, rendered, reused
+
+def write_page(page_html, path=GALLERY_PAGE_PATH):
+    """Write the page if its content changed; returns True if it was written"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            if f.read() == page_html:
+                return False
+    except FileNotFoundError:
+        pass
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(page_html)
+    os.replace(temp_path, path)
+    return True
+
+def render_page(data):
+    """Render `data` into gallery.html; returns (rendered, reused, written)
+
+    Raises OSError if a file cannot be read or written and ValueError if config.js or
+    the page lacks what rendering needs.
+    """
+    bucket_url, prefix = load_image_url_settings()
+    base_url = f"{bucket_url}/{prefix}"
+    with open(GALLERY_PAGE_PATH, 'r', encoding='utf-8') as f:
+        page_html = f.read()
+    with metrics.span('render.categories'):
+        page_html, rendered, reused = render_gallery(data, page_html, base_url)
+    with metrics.span('render.save'):
+        written = write_page(page_html)
+    return rendered, reused, written
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Render the gallery from gallery-data.json into docs/gallery.html.")
+    parser.add_argument("--force", action="store_true", help="Render every category, ignoring the render cache")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Main script execution"""
+    args = parse_args(argv)
+    metrics.setup_metrics('render_gallery.py')
+    if args.force:
+        try:
+            os.remove(RENDER_CACHE_PATH)
+        except FileNotFoundError:
+            pass
+
+    try:
+        with metrics.span('render.load'):
+            data = load_catalog(GALLERY_DATA_PATH)
+        rendered, reused, written = render_page(data)
+    except (OSError, ValueError) as e:
+        print(f"Error rendering the gallery: {e}")
+        sys.exit(1)
+
+    metrics.add('render.categories_rendered', rendered)
+    metrics.add('render.categories_reused', reused)
+    print(f"Gallery categories: {rendered} rendered, {reused} unchanged")
+    print(f"{GALLERY_PAGE_PATH} {'updated' if written else 'already up to date'}")
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,7 @@ $LOCAL_IMAGE_PATH = "$PSScriptRoot\docs\images"
 $S3_BUCKET = "photos-joyfulphotographs-com"  # S3 bucket name for images
 $S3_PREFIX = "website-images/"  # Prefix within bucket
 $AWS_PROFILE = "joyful-photos"  # AWS profile to use (from ~/.aws/credentials)
+$S3_ENDPOINT = $env:JOYFUL_S3_ENDPOINT  # Another S3-compatible endpoint (e.g. fake_s3.py); empty for AWS
 
 # Check if the local directory exists
 if (-not (Test-Path -Path $LOCAL_IMAGE_PATH)) {
@@ -35,7 +36,9 @@ if ($NonInteractive) {
 if ($uploadChoice -eq "y") {
     Write-Host "Uploading images to S3..."
     # No ACL flag since bucket has Object Ownership set to "Bucket owner enforced"
-    aws s3 sync $LOCAL_IMAGE_PATH "s3://$S3_BUCKET/$S3_PREFIX" --profile $AWS_PROFILE
+    $endpointArgs = @()
+    if ($S3_ENDPOINT) { $endpointArgs = @("--endpoint-url", $S3_ENDPOINT) }
+    aws s3 sync $LOCAL_IMAGE_PATH "s3://$S3_BUCKET/$S3_PREFIX" --profile $AWS_PROFILE @endpointArgs
     
     if ($LASTEXITCODE -eq 0) {
         Write-Host "✓ Successfully uploaded images to S3!" -ForegroundColor Green
@@ -46,6 +49,7 @@ if ($uploadChoice -eq "y") {
     
     # Generate URLs file
     $baseUrl = "https://$S3_BUCKET.s3.amazonaws.com/$S3_PREFIX"
+    if ($S3_ENDPOINT) { $baseUrl = "$($S3_ENDPOINT.TrimEnd('/'))/$S3_BUCKET/$S3_PREFIX" }
     $urlsFile = "$PSScriptRoot\s3-image-urls.txt"
     
     Write-Host "Generating image URLs file at $urlsFile"
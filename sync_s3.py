@@ -1,66 +1,636 @@
 import os
 import sys
 
-# Attempt to set up logging as the VERY FIRST operation
-LOG_FILE_PATH = '' # Initialize
-try:
-    # Determine script directory for logging
-    # Note: __file__ might not be defined if script is run in certain embedded ways, but usually is.
-    script_dir_for_log = os.path.dirname(__file__) if '__file__' in locals() else os.getcwd()
-    LOG_FILE_PATH = os.path.join(script_dir_for_log, 'debug_sync_s3.log')
-    with open(LOG_FILE_PATH, 'w', encoding='utf-8') as lf:
-        lf.write("--- Log Start (sync_s3.py) ---\n")
-        lf.write(f"Initial log path: {LOG_FILE_PATH}\n")
-except Exception as e:
-    # If logging setup itself fails, print to stderr as a last resort
-    print(f"CRITICAL: Failed to initialize logging for sync_s3.py: {e}", file=sys.stderr)
-    # We might not have LOG_FILE_PATH correctly set here, so can't log to file.
-
-# Now, define the log_message function that uses LOG_FILE_PATH
-def log_message(message, level='INFO'):
-    formatted_message = f"{level}: {message}\n"
-    # Also print to original stdout/stderr for good measure
-    if level == 'ERROR':
-        print(formatted_message.strip(), file=sys.stderr)
-    else:
-        print(formatted_message.strip(), file=sys.stdout)
-    
-    if LOG_FILE_PATH: # Only attempt to log to file if path was set
-        try:
-            with open(LOG_FILE_PATH, 'a', encoding='utf-8') as lf:
-                lf.write(formatted_message)
-        except Exception as e:
-            print(f"ERROR: Failed to write to log file {LOG_FILE_PATH}: {e}", file=sys.stderr)
+import gallery_metrics as metrics
+from gallery_logging import setup_logging, log_message, print_error, print_success, print_info, print_warning
 
-# Proceed with other imports AFTER basic logging is attempted
-import subprocess # To run AWS CLI
-log_message("Successfully imported subprocess.", level='DEBUG')
+import re
+import json
+import fnmatch
+import hashlib
+import argparse
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from multipart_upload import (BandwidthLimiter, multipart_upload, multipart_etag, choose_part_size, MB,
+                              MIN_PART_SIZE, DEFAULT_PART_SIZE, DEFAULT_PART_JOBS)
 
 ABS_SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
-
-log_message(f"DEBUG: __file__ = {__file__}", level='DEBUG')
-log_message(f"DEBUG: ABS_SCRIPT_DIR = {ABS_SCRIPT_DIR}", level='DEBUG')
-
-log_message(f"DEBUG: __file__ = {__file__}", level='DEBUG')
-log_message(f"DEBUG: ABS_SCRIPT_DIR = {ABS_SCRIPT_DIR}", level='DEBUG')
+# Logging is set up in main(), so importing this module (e.g. from joyful.py) does no work
+LOG_FILE_PATH = os.path.join(ABS_SCRIPT_DIR, 'debug_sync_s3.log')
 
 # Configuration
 LOCAL_IMAGE_BASE_PATH = os.path.join(ABS_SCRIPT_DIR, 'docs', 'images')
-log_message(f"DEBUG: LOCAL_IMAGE_BASE_PATH = {LOCAL_IMAGE_BASE_PATH}", level='DEBUG')
+LOCAL_IMAGE_GIT_PATH = 'docs/images' # as git reports it, relative to the repository root
 S3_BUCKET_NAME = "photos-joyfulphotographs-com"
 S3_PREFIX = "website-images/"
 AWS_PROFILE_NAME = "joyful-photos"
+# Another S3-compatible endpoint to use instead of AWS, such as a local fake_s3.py server
+S3_ENDPOINT_URL = os.environ.get('JOYFUL_S3_ENDPOINT', '').rstrip('/') or None
+# Local record of what has already been uploaded; lets unchanged runs skip all remote calls
+SYNC_MANIFEST_PATH = os.path.join(ABS_SCRIPT_DIR, '.s3_sync_manifest.json')
+SYNC_MANIFEST_VERSION = 1
+DEFAULT_JOBS = 8
+HASH_CHUNK_SIZE = 1024 * 1024
+# Files at least this large are sent as resumable multipart uploads
+DEFAULT_MULTIPART_THRESHOLD = 16 * MB
+# Part sizes tried, after --part-size, when matching a multipart ETag from a listing: the
+# AWS CLI and boto3 use 8 MB parts by default and S3's minimum is 5 MB
+MULTIPART_ETAG_PART_SIZES = (DEFAULT_PART_SIZE, MIN_PART_SIZE, 16 * MB)
+MULTIPART_CHECKPOINT_DIR = os.path.join(ABS_SCRIPT_DIR, '.s3_multipart')
+GALLERY_DATA_FILE = os.path.join(ABS_SCRIPT_DIR, 'docs', 'gallery-data.json')
+# siteConfig.homepageImages and siteConfig.siteImages also point into the prefix
+CONFIG_JS_FILE = os.path.join(ABS_SCRIPT_DIR, 'docs', 'js', 'config.js')
+CONFIG_IMAGE_SECTIONS = ('homepageImages', 'siteImages')
+# Full bucket keys (fnmatch patterns, including S3_PREFIX) that --prune never deletes, in addition to
+# --protect. Prune only lists keys under S3_PREFIX, so the site assets under SITE_S3_PREFIX are never at risk.
+PRUNE_PROTECTED_PATTERNS = [S3_PREFIX + 'website/*', S3_PREFIX + 'logo.*']
+# Fingerprinted copies (see update_gallery_data.py --fingerprint) live under this folder of the prefix
+ASSETS_PREFIX = "assets/"
+# Derivatives have content-addressed names (see generate_derivatives.py), so they never change in place
+DERIVATIVES_PREFIX = "derivatives/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Built site assets (see build_assets.py) and the record of which of them are already uploaded
+SITE_BUILD_DIR = os.path.join(ABS_SCRIPT_DIR, 'dist')
+SITE_BUILD_MANIFEST = os.path.join(SITE_BUILD_DIR, 'asset-manifest.json')
+SITE_S3_PREFIX = "website/"
+SITE_SYNC_MANIFEST_PATH = os.path.join(ABS_SCRIPT_DIR, '.s3_site_manifest.json')
+SITE_ENCODING_SUFFIXES = {'gzip': '.gz', 'br': '.br'}
+# Not every platform's MIME table knows the modern formats generate_derivatives.py writes
+mimetypes.add_type('image/webp', '.webp')
+mimetypes.add_type('image/avif', '.avif')
+
+def import_boto3():
+    """Imports boto3 on first use so that no-op syncs never pay for it."""
+    try:
+        import boto3
+        import botocore.config
+        return boto3, botocore.config
+    except ImportError as e:
+        log_message(f"Failed to import 'boto3': {e}. Please ensure it is installed ('pip install boto3').", level='ERROR')
+        sys.exit(1)
+
+def create_s3_client(jobs=DEFAULT_JOBS):
+    """Creates an S3 client whose connection pool is sized for `jobs` concurrent uploads."""
+    boto3, botocore_config = import_boto3()
+    config = botocore_config.Config(max_pool_connections=max(jobs, 1), retries={'max_attempts': 5, 'mode': 'standard'})
+    if S3_ENDPOINT_URL:
+        # Credentials come from the environment; fake_s3.py accepts any, so fall back to placeholders
+        session = boto3.session.Session()
+        if session.get_credentials() is None:
+            session = boto3.session.Session(aws_access_key_id='fake', aws_secret_access_key='fake')
+        config = config.merge(botocore_config.Config(s3={'addressing_style': 'path'}))
+        return session.client('s3', endpoint_url=S3_ENDPOINT_URL, region_name=session.region_name or 'us-east-1',
+                              config=config)
+    session = boto3.session.Session(profile_name=AWS_PROFILE_NAME)
+    return session.client('s3', config=config)
+
+def scan_local_files(base_path):
+    """Walks `base_path` with os.scandir.
+
+    Returns a dict mapping each file's path relative to `base_path` (with forward
+    slashes) to a (size, mtime_ns) tuple.
+    """
+    local_files = {}
+    pending = [(base_path, '')]
+    while pending:
+        dir_path, rel_dir = pending.pop()
+        with os.scandir(dir_path) as entries:
+            for entry in entries:
+                rel_path = rel_dir + entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, rel_path + '/'))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    local_files[rel_path] = (stat.st_size, stat.st_mtime_ns)
+    metrics.add('sync.files_scanned', len(local_files))
+    return local_files
+
+def file_md5(path):
+    """Returns the hex MD5 of a file, which is what S3 reports as the ETag of a single-part upload."""
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def etag_matches(path, size, md5, etag, part_size=DEFAULT_PART_SIZE):
+    """Returns True if `etag`, from a bucket listing, is that of the local file at `path`.
+
+    A single-part upload's ETag is the file's MD5. A multipart upload's is
+    "<MD5 of the part MD5s>-<part count>", which depends on the part size the listing
+    does not record, so it is recomputed for each likely part size that gives that
+    many parts. The file is only read again when the ETag is a multipart one.
+    """
+    _, _, parts = etag.partition('-')
+    if not parts:
+        return etag == md5
+    if not parts.isdigit():
+        return False
+    for candidate in dict.fromkeys(choose_part_size(size, p) for p in (part_size,) + MULTIPART_ETAG_PART_SIZES):
+        if -(-size // candidate) == int(parts) and multipart_etag(path, candidate) == etag:
+            return True
+    return False
+
+def load_manifest(path=SYNC_MANIFEST_PATH):
+    """Loads the sync manifest, or returns None if there is no usable manifest for this bucket/prefix.
+
+    Returns (files, assets): local files keyed by relative path, and the
+    fingerprinted asset keys already uploaded, mapped to their source path.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if manifest.get('version') != SYNC_MANIFEST_VERSION or \
+       manifest.get('bucket') != S3_BUCKET_NAME or manifest.get('prefix') != S3_PREFIX:
+        return None
+    return manifest.get('files', {}), manifest.get('assets', {})
+
+def save_manifest(files, assets, path=SYNC_MANIFEST_PATH):
+    """Writes the manifest atomically so an interrupted sync never leaves it half-written."""
+    manifest = {'version': SYNC_MANIFEST_VERSION, 'bucket': S3_BUCKET_NAME, 'prefix': S3_PREFIX,
+                'files': files, 'assets': assets}
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(temp_path, path)
+
+def list_remote_objects(client):
+    """Lists the S3 prefix once; returns {relative_key: {'size': ..., 'etag': ...}}."""
+    remote_objects = {}
+    paginator = client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=S3_BUCKET_NAME, Prefix=S3_PREFIX):
+        metrics.add('s3.requests')
+        for obj in page.get('Contents', []):
+            remote_objects[obj['Key'][len(S3_PREFIX):]] = {'size': obj['Size'], 'etag': obj['ETag'].strip('"')}
+    return remote_objects
+
+def build_sync_plan(local_files, manifest_files, remote_objects=None, delete=False, base_path=LOCAL_IMAGE_BASE_PATH,
+                    part_size=DEFAULT_PART_SIZE):
+    """Decides which files need uploading (and, with `delete`, which keys need removing).
+
+    A file whose size and mtime match its manifest entry is unchanged without being
+    read. Otherwise it is hashed, and only uploaded if the hash differs from both the
+    manifest and (when given) the remote listing, whose multipart ETags are matched
+    with etag_matches(). Returns (uploads, deletes, files) where `files` is the
+    manifest as it will look once the plan has been applied.
+    """
+    uploads = []
+    files = {}
+    hashed = hashed_bytes = 0
+    for rel_path, (size, mtime_ns) in sorted(local_files.items()):
+        entry = manifest_files.get(rel_path)
+        if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+            files[rel_path] = entry
+            continue
+        file_path = os.path.join(base_path, rel_path)
+        md5 = file_md5(file_path)
+        hashed += 1
+        hashed_bytes += size
+        new_entry = {'size': size, 'mtime_ns': mtime_ns, 'md5': md5}
+        remote = remote_objects.get(rel_path) if remote_objects else None
+        if (entry and entry['size'] == size and entry['md5'] == md5) or \
+           (remote and remote['size'] == size and etag_matches(file_path, size, md5, remote['etag'], part_size)):
+            files[rel_path] = new_entry
+        else:
+            uploads.append((rel_path, new_entry))
+
+    deletes = []
+    if delete:
+        known_remote = set(manifest_files) | set(remote_objects or ())
+        deletes = sorted(key for key in known_remote - set(local_files) if not key.startswith(ASSETS_PREFIX))
+    metrics.add('sync.manifest_hits', len(local_files) - hashed)
+    metrics.add('sync.files_hashed', hashed)
+    metrics.add('sync.bytes_hashed', hashed_bytes)
+    return uploads, deletes, files
+
+def find_server_side_copies(uploads, files):
+    """Splits off uploads whose bytes are already in the bucket, or are being uploaded under another name.
+
+    Files are matched by size and MD5: the first file of each group is uploaded and
+    the others become (rel_path, entry, source_rel_path) copies made inside S3 with
+    CopyObject, which sends no image data. Returns (uploads, copies).
+    """
+    synced = {}
+    for rel_path, entry in files.items():
+        if entry['md5']:
+            synced.setdefault((entry['size'], entry['md5']), rel_path)
+    remaining = []
+    copies = []
+    for rel_path, entry in uploads:
+        source = synced.get((entry['size'], entry['md5']))
+        if source is None:
+            synced[(entry['size'], entry['md5'])] = rel_path
+            remaining.append((rel_path, entry))
+        else:
+            copies.append((rel_path, entry, source))
+    return remaining, copies
+
+def load_asset_map():
+    """Reads the src -> hashed key map that update_gallery_data.py --fingerprint writes to gallery-data.json."""
+    try:
+        with open(GALLERY_DATA_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get('assets', {})
+    except (FileNotFoundError, json.JSONDecodeError) as e:
+        log_message(f"Could not read asset map from {GALLERY_DATA_FILE}: {e}", level='WARNING')
+        return {}
+
+def build_asset_plan(asset_map, synced_assets, local_files, remote_objects=None):
+    """Lists the fingerprinted keys that still need uploading as (key, src, size) tuples.
+
+    Keys are content hashes, so a key that was uploaded once never needs uploading
+    again, and images with identical bytes share one key and are uploaded once.
+    Returns (uploads, assets) where `assets` is the manifest's asset section.
+    """
+    uploads = []
+    assets = {}
+    for src, key in asset_map.items():
+        if key in assets or src not in local_files:
+            continue
+        assets[key] = src
+        if key not in synced_assets and not (remote_objects and key in remote_objects):
+            uploads.append((key, src, local_files[src][0]))
+    return uploads, assets
+
+def object_headers(rel_path, key):
+    """Content-Type (and, for content-addressed keys, Cache-Control) for an uploaded object."""
+    extra_args = {'ContentType': mimetypes.guess_type(rel_path)[0] or 'application/octet-stream'}
+    if key.startswith(DERIVATIVES_PREFIX) or key.startswith(ASSETS_PREFIX):
+        extra_args['CacheControl'] = IMMUTABLE_CACHE_CONTROL
+    return extra_args
+
+def upload_file(client, rel_path, size, key=None, base_path=LOCAL_IMAGE_BASE_PATH, multipart_threshold=DEFAULT_MULTIPART_THRESHOLD,
+                part_size=DEFAULT_PART_SIZE, part_jobs=DEFAULT_PART_JOBS, limiter=None):
+    """Uploads one file, switching to a resumable multipart upload for large files.
+
+    The object key is S3_PREFIX + `key`, defaulting to the file's relative path.
+    """
+    file_path = os.path.join(base_path, rel_path)
+    key = key or rel_path
+    extra_args = object_headers(rel_path, key)
+    if size >= multipart_threshold:
+        multipart_upload(client, S3_BUCKET_NAME, S3_PREFIX + key, file_path, MULTIPART_CHECKPOINT_DIR,
+                         part_size=part_size, part_jobs=part_jobs, limiter=limiter, extra_args=extra_args)
+        return
+    with open(file_path, 'rb') as f:
+        body = f.read()
+    if limiter:
+        limiter.consume(len(body))
+    put_object(client, S3_PREFIX + key, body, extra_args)
+
+def put_object(client, key, body, extra_args):
+    """PutObject, recording the request, its latency, botocore's retries and the bytes sent."""
+    with metrics.timer('s3.put'):
+        response = client.put_object(Bucket=S3_BUCKET_NAME, Key=key, Body=body, **extra_args)
+    metrics.add('s3.requests')
+    metrics.add('s3.retries', response.get('ResponseMetadata', {}).get('RetryAttempts', 0))
+    metrics.add('s3.bytes_uploaded', len(body))
+
+def copy_file(client, rel_path, size, source_rel_path, **upload_options):
+    """Creates S3_PREFIX + rel_path as a server-side copy of an object that is already uploaded.
+
+    Falls back to uploading the file if the copy fails, e.g. because the source
+    object was removed from the bucket behind the manifest's back.
+    """
+    metrics.add('s3.requests')
+    try:
+        with metrics.timer('s3.copy'):
+            client.copy_object(Bucket=S3_BUCKET_NAME, Key=S3_PREFIX + rel_path,
+                               CopySource={'Bucket': S3_BUCKET_NAME, 'Key': S3_PREFIX + source_rel_path},
+                               MetadataDirective='REPLACE', **object_headers(rel_path, rel_path))
+    except Exception as e:
+        log_message(f"Copy of {source_rel_path} to {rel_path} failed ({e}); uploading instead", level='WARNING')
+        metrics.add('sync.copy_fallbacks')
+        upload_file(client, rel_path, size, **upload_options)
+
+def run_uploads(client, uploads, asset_uploads, files, assets, jobs=DEFAULT_JOBS, upload_options=None, copies=()):
+    """Uploads planned files and fingerprinted assets through a bounded worker pool.
+
+    `copies` (see find_server_side_copies) run once the uploads have finished; a copy
+    whose source failed to upload is uploaded itself instead. `files` and `assets`
+    (the manifest sections) are updated in place: successful file transfers are
+    recorded and failed asset uploads are dropped, so the next run retries them.
+    Returns the number of failed transfers.
+    """
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = {
+            executor.submit(upload_file, client, rel_path, entry['size'], **(upload_options or {})): (rel_path, rel_path, entry)
+            for rel_path, entry in uploads
+        }
+        futures.update({
+            executor.submit(upload_file, client, src, size, key=key, **(upload_options or {})): (src, key, None)
+            for key, src, size in asset_uploads
+        })
+        for future in as_completed(futures):
+            rel_path, key, entry = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print_error(f"Failed to upload {rel_path}: {e}")
+                failures += 1
+                if entry is None:
+                    del assets[key]
+                continue
+            if entry is not None:
+                files[rel_path] = entry
+            log_message(f"upload: {rel_path} -> s3://{S3_BUCKET_NAME}/{S3_PREFIX}{key}", level='INFO')
+
+        futures = {}
+        for rel_path, entry, source in copies:
+            if source in files:
+                future = executor.submit(copy_file, client, rel_path, entry['size'], source, **(upload_options or {}))
+            else:
+                future = executor.submit(upload_file, client, rel_path, entry['size'], **(upload_options or {}))
+            futures[future] = (rel_path, entry, source)
+        for future in as_completed(futures):
+            rel_path, entry, source = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print_error(f"Failed to copy {source} to {rel_path}: {e}")
+                failures += 1
+                continue
+            files[rel_path] = entry
+            log_message(f"copy: {source} -> s3://{S3_BUCKET_NAME}/{S3_PREFIX}{rel_path}", level='INFO')
+    return failures
+
+def delete_objects(client, rel_paths):
+    """Deletes keys in batches of 1000, the DeleteObjects limit. Returns the keys that failed."""
+    failed = []
+    for start in range(0, len(rel_paths), 1000):
+        batch = rel_paths[start:start + 1000]
+        metrics.add('s3.requests')
+        with metrics.timer('s3.delete'):
+            response = client.delete_objects(
+                Bucket=S3_BUCKET_NAME,
+                Delete={'Objects': [{'Key': S3_PREFIX + rel_path} for rel_path in batch], 'Quiet': True},
+            )
+        failed.extend(error['Key'][len(S3_PREFIX):] for error in response.get('Errors', []))
+    return failed
+
+def load_site_sync_manifest():
+    """Returns {key: etag} for the site assets already uploaded to this bucket/prefix."""
+    try:
+        with open(SITE_SYNC_MANIFEST_PATH, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if manifest.get('bucket') != S3_BUCKET_NAME or manifest.get('prefix') != SITE_S3_PREFIX:
+        return {}
+    return manifest.get('objects', {})
+
+def save_site_sync_manifest(objects):
+    temp_path = SITE_SYNC_MANIFEST_PATH + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump({'bucket': S3_BUCKET_NAME, 'prefix': SITE_S3_PREFIX, 'objects': objects}, f, indent=1, sort_keys=True)
+    os.replace(temp_path, SITE_SYNC_MANIFEST_PATH)
+
+def build_site_plan(build_files, synced):
+    """Lists (key, etag) for every built output (plain, .gz and .br) whose ETag differs from the last upload."""
+    uploads = []
+    for rel_path, entry in build_files.items():
+        outputs = [(rel_path, entry['etag'])]
+        outputs.extend((rel_path + SITE_ENCODING_SUFFIXES[encoding], encoded['etag'])
+                       for encoding, encoded in entry.get('encodings', {}).items())
+        uploads.extend((key, etag) for key, etag in outputs if synced.get(key) != etag)
+    return uploads
+
+def upload_site_file(client, key):
+    """Uploads one built asset; .gz/.br files keep the original Content-Type and get a Content-Encoding."""
+    content_type, encoding = mimetypes.guess_type(key)
+    extra_args = {'ContentType': content_type or 'application/octet-stream'}
+    if encoding in SITE_ENCODING_SUFFIXES:
+        extra_args['ContentEncoding'] = encoding
+    with open(os.path.join(SITE_BUILD_DIR, key), 'rb') as f:
+        put_object(client, SITE_S3_PREFIX + key, f.read(), extra_args)
+
+def sync_site(args):
+    """Uploads the changed outputs of build_assets.py. Returns the process exit code."""
+    try:
+        with open(SITE_BUILD_MANIFEST, 'r', encoding='utf-8') as f:
+            build_files = json.load(f)['files']
+    except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
+        print_error(f"No usable build manifest at {SITE_BUILD_MANIFEST} ({e}). Run 'python build_assets.py' first.")
+        return 1
+    synced = load_site_sync_manifest()
+    uploads = build_site_plan(build_files, synced)
+    print_info(f"Site plan: {len(uploads)} files to upload to s3://{S3_BUCKET_NAME}/{SITE_S3_PREFIX}.")
+    if args.dry_run:
+        for key, _ in uploads:
+            print_info(f"  upload: {key}")
+        print_success("Dry run complete; nothing was changed in S3.")
+        return 0
+    if not uploads:
+        print_success("Site assets are up to date.")
+        return 0
+
+    client = create_s3_client(args.jobs)
+    failures = 0
+    with metrics.span('sync.site_upload'), ThreadPoolExecutor(max_workers=max(args.jobs, 1)) as executor:
+        futures = {executor.submit(upload_site_file, client, key): (key, etag) for key, etag in uploads}
+        for future in as_completed(futures):
+            key, etag = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print_error(f"Failed to upload {key}: {e}")
+                failures += 1
+                continue
+            synced[key] = etag
+            log_message(f"upload: {key} -> s3://{S3_BUCKET_NAME}/{SITE_S3_PREFIX}{key}", level='INFO')
+    save_site_sync_manifest(synced)
+    if failures:
+        print_error(f"Site sync failed for {failures} files. Check debug_sync_s3.log")
+        return 1
+    print_success(f"Site sync completed successfully. Uploaded {len(uploads)} files.")
+    return 0
+
+def load_config_images(path=CONFIG_JS_FILE):
+    """Returns the image paths listed in the homepageImages and siteImages sections of config.js."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    paths = set()
+    for section in CONFIG_IMAGE_SECTIONS:
+        match = re.search(r'\b' + section + r'\s*:\s*\{', text)
+        if not match:
+            log_message(f"No {section} section found in {path}", level='WARNING')
+            continue
+        # The section ends at the brace that balances the one just matched
+        depth = 1
+        end = match.end()
+        while depth and end < len(text):
+            depth += {'{': 1, '}': -1}.get(text[end], 0)
+            end += 1
+        paths.update(re.findall(r"""['"]([^'"]+\.[A-Za-z0-9]+)['"]""", text[match.end():end]))
+    return paths
+
+def referenced_keys(gallery_data, config_images):
+    """Returns every key below S3_PREFIX the site can request.
+
+    That is each gallery image, its variants and fingerprinted copy, and the config.js images.
+    """
+    referenced = set(config_images)
+    for category in gallery_data.get('categories', []):
+        for item in category.get('images', []):
+            if 'src' in item:
+                referenced.add(item['src'])
+            referenced.update(variant['src'] for variant in item.get('variants', []) if 'src' in variant)
+    referenced.update(gallery_data.get('assets', {}).values())
+    return referenced
+
+def find_orphans(remote_objects, referenced, local_files, protected_patterns):
+    """Splits the unreferenced keys into (orphans, protected, local_only) sorted lists.
 
-def print_error(message):
-    log_message(message, level='ERROR')
+    `remote_objects` keys are relative to S3_PREFIX, but `protected_patterns` are matched
+    against the full bucket key (S3_PREFIX + key), so a pattern like 'website-images/press/*'
+    reads the same as the key in the S3 console. Keys matching one are kept, and so are keys
+    whose file still exists under docs/images: deleting those would only make the next sync
+    upload them again.
+    """
+    orphans = []
+    protected = []
+    local_only = []
+    for key in sorted(set(remote_objects) - referenced):
+        if any(fnmatch.fnmatchcase(S3_PREFIX + key, pattern) for pattern in protected_patterns):
+            protected.append(key)
+        elif key in local_files:
+            local_only.append(key)
+        else:
+            orphans.append(key)
+    return orphans, protected, local_only
+
+def prune_bucket(args):
+    """Deletes objects under S3_PREFIX that nothing references. Returns the process exit code."""
+    try:
+        with open(GALLERY_DATA_FILE, 'r', encoding='utf-8') as f:
+            gallery_data = json.load(f)
+        config_images = load_config_images(CONFIG_JS_FILE)
+    except (OSError, json.JSONDecodeError) as e:
+        print_error(f"Cannot work out which objects are in use: {e}")
+        return 1
+    referenced = referenced_keys(gallery_data, config_images)
+    if not any(category.get('images') for category in gallery_data.get('categories', [])):
+        # An empty catalogue would mark the whole bucket as orphaned
+        print_error(f"{GALLERY_DATA_FILE} lists no images; refusing to prune.")
+        return 1
+
+    print_info(f"Listing s3://{S3_BUCKET_NAME}/{S3_PREFIX} ...")
+    try:
+        client = create_s3_client(args.jobs)
+        with metrics.span('prune.list'):
+            remote_objects = list_remote_objects(client)
+    except Exception as e:
+        print_error(f"Could not list S3 bucket contents: {e}")
+        return 1
+    local_files = scan_local_files(LOCAL_IMAGE_BASE_PATH) if os.path.isdir(LOCAL_IMAGE_BASE_PATH) else {}
+    orphans, protected, local_only = find_orphans(remote_objects, referenced, local_files,
+                                                  PRUNE_PROTECTED_PATTERNS + (args.protect or []))
+    orphan_bytes = sum(remote_objects[key]['size'] for key in orphans)
+    print_info(f"Prune plan: {len(remote_objects)} objects, {len(referenced)} referenced keys, "
+               f"{len(orphans)} orphans ({orphan_bytes} bytes), {len(protected)} protected, "
+               f"{len(local_only)} unreferenced but still in docs/images.")
+    for key in protected:
+        log_message(f"  protected: {key}", level='DEBUG')
+    for key in local_only:
+        print_warning(f"  kept (local file exists, not referenced): {key}")
+
+    if args.dry_run:
+        for key in orphans:
+            print_info(f"  delete: {key} ({remote_objects[key]['size']} bytes)")
+        print_success("Dry run complete; nothing was deleted from S3.")
+        return 0
+    if not orphans:
+        print_success("No orphaned objects to prune.")
+        return 0
+
+    try:
+        with metrics.span('prune.delete'):
+            failed = set(delete_objects(client, orphans))
+    except Exception as e:
+        print_error(f"Failed to delete orphaned objects: {e}")
+        return 1
+    for key in orphans:
+        if key in failed:
+            print_error(f"Failed to delete {key}")
+        else:
+            log_message(f"delete: s3://{S3_BUCKET_NAME}/{S3_PREFIX}{key}", level='INFO')
 
-def print_success(message):
-    log_message(message, level='SUCCESS')
+    # Forget the deleted keys, so a later sync does not assume they are still uploaded
+    manifest = load_manifest()
+    if manifest is not None:
+        files, assets = manifest
+        deleted = set(orphans) - failed
+        save_manifest({rel_path: entry for rel_path, entry in files.items() if rel_path not in deleted},
+                      {key: src for key, src in assets.items() if key not in deleted})
+    metrics.add('prune.deleted', len(orphans) - len(failed))
+    if failed:
+        print_error(f"Prune failed for {len(failed)} of {len(orphans)} objects. Check debug_sync_s3.log")
+        return 1
+    print_success(f"Pruned {len(orphans)} orphaned objects ({orphan_bytes} bytes).")
+    return 0
 
-def print_info(message):
-    log_message(message, level='INFO')
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Upload new and changed images under docs/images to S3.")
+    parser.add_argument('--dry-run', action='store_true', help="Print the upload/delete plan without touching S3")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f"Number of concurrent uploads (default: {DEFAULT_JOBS})")
+    parser.add_argument('--multipart-threshold', type=float, default=DEFAULT_MULTIPART_THRESHOLD / MB,
+                        help=f"Size in MB from which files use multipart upload (default: {DEFAULT_MULTIPART_THRESHOLD // MB})")
+    parser.add_argument('--part-size', type=float, default=DEFAULT_PART_SIZE / MB,
+                        help=f"Multipart part size in MB, minimum 5 (default: {DEFAULT_PART_SIZE // MB})")
+    parser.add_argument('--part-jobs', type=int, default=DEFAULT_PART_JOBS,
+                        help=f"Concurrent parts per multipart upload (default: {DEFAULT_PART_JOBS})")
+    parser.add_argument('--max-bandwidth', type=float, default=0,
+                        help="Cap on total upload bandwidth in MB/s, 0 for unlimited (default: 0)")
+    parser.add_argument('--delete', action='store_true',
+                        help="Also delete previously synced objects whose local file has been removed")
+    parser.add_argument('--refresh-remote', action='store_true',
+                        help="Ignore the local manifest and compare against a fresh listing of the bucket")
+    parser.add_argument('--changed-only', action='store_true',
+                        help="Only sync files under docs/images staged in git (for the pre-commit hook)")
+    parser.add_argument('--site', action='store_true',
+                        help="Upload the minified and precompressed site assets from dist/ (see build_assets.py) "
+                             "instead of the images")
+    parser.add_argument('--prune', action='store_true',
+                        help="Delete objects under the prefix that gallery-data.json and config.js no longer "
+                             "reference (combine with --dry-run to only report them)")
+    parser.add_argument('--protect', action='append', metavar='PATTERN',
+                        help="Full bucket key pattern (e.g. 'website-images/press/*') that --prune must keep; may be repeated")
+    return parser.parse_args(argv)
 
-def main():
+def staged_local_files():
+    """Returns ({rel_path: (size, mtime_ns)}, deleted_rel_paths) for files under docs/images staged in git.
+
+    Returns None if git cannot tell, so the caller can fall back to a full scan.
+    """
+    import git_changes
+    try:
+        changes = git_changes.changes_under(git_changes.staged_changes(ABS_SCRIPT_DIR), LOCAL_IMAGE_GIT_PATH)
+    except git_changes.GitUnavailable as e:
+        log_message(f"Cannot read staged changes ({e}); scanning everything.", level='WARNING')
+        return None
+    local_files = {}
+    deleted = []
+    for rel_path, status in changes.items():
+        try:
+            stat = os.stat(os.path.join(LOCAL_IMAGE_BASE_PATH, rel_path))
+        except FileNotFoundError:
+            deleted.append(rel_path)
+            continue
+        local_files[rel_path] = (stat.st_size, stat.st_mtime_ns)
+    return local_files, sorted(deleted)
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging(LOG_FILE_PATH, 'sync_s3.py')
+    metrics.setup_metrics('sync_s3.py')
+    log_message(f"ABS_SCRIPT_DIR = {ABS_SCRIPT_DIR}", level='DEBUG')
+    if args.site:
+        sys.exit(sync_site(args))
+    if args.prune:
+        sys.exit(prune_bucket(args))
     print_info("Starting S3 sync process...")
     log_message(f"Local image source: {LOCAL_IMAGE_BASE_PATH}", level='DEBUG')
     log_message(f"S3 Bucket: {S3_BUCKET_NAME}", level='DEBUG')
@@ -71,53 +641,117 @@ def main():
         log_message(f"Local image directory not found: {LOCAL_IMAGE_BASE_PATH}", level='ERROR')
         sys.exit(1)
 
-    s3_target_uri = f"s3://{S3_BUCKET_NAME}/{S3_PREFIX}"
-    local_source_path = os.path.join(LOCAL_IMAGE_BASE_PATH, '') 
+    with metrics.span('sync.load_manifest'):
+        manifest = None if args.refresh_remote else load_manifest()
+    staged = staged_local_files() if args.changed_only else None
+    if staged is not None and manifest is None:
+        print_info("No sync manifest yet, so --changed-only cannot be used; syncing everything.")
+        staged = None
+    if staged is not None:
+        local_files, staged_deletes = staged
+        print_info(f"Syncing {len(local_files)} staged files ({len(staged_deletes)} staged deletions).")
+    else:
+        with metrics.span('sync.scan'):
+            local_files = scan_local_files(LOCAL_IMAGE_BASE_PATH)
+    client = None
+    remote_objects = None
+    if manifest is None:
+        # No trustworthy record of what is in the bucket yet: list it once and
+        # seed the manifest from objects whose size and ETag already match.
+        print_info(f"Listing s3://{S3_BUCKET_NAME}/{S3_PREFIX} to build the sync manifest...")
+        try:
+            client = create_s3_client(args.jobs * max(args.part_jobs, 1))
+            with metrics.span('sync.list_remote'):
+                remote_objects = list_remote_objects(client)
+        except Exception as e:
+            print_error(f"Could not list S3 bucket contents: {e}")
+            sys.exit(1)
+        manifest = ({}, {})
+    manifest_files, synced_assets = manifest
 
-    aws_command = [
-        "aws", "s3", "sync",
-        local_source_path,
-        s3_target_uri,
-        "--profile", AWS_PROFILE_NAME,
-    ]
+    with metrics.span('sync.plan'):
+        if staged is None:
+            uploads, deletes, files = build_sync_plan(local_files, manifest_files, remote_objects, delete=args.delete,
+                                                      part_size=int(args.part_size * MB))
+            asset_uploads, assets = build_asset_plan(load_asset_map(), synced_assets, local_files, remote_objects)
+        else:
+            # Plan the staged files only and keep the rest of the manifest as it is
+            uploads, _, staged_files = build_sync_plan(local_files, manifest_files)
+            files = dict(manifest_files, **staged_files)
+            deletes = [rel_path for rel_path in staged_deletes if rel_path in manifest_files] if args.delete else []
+            for rel_path in [rel_path for rel_path, _ in uploads] + deletes:
+                files.pop(rel_path, None)
+            staged_assets = {src: key for src, key in load_asset_map().items() if src in local_files}
+            asset_uploads, new_assets = build_asset_plan(staged_assets, synced_assets, local_files)
+            assets = dict(synced_assets, **new_assets)
+        uploads, copies = find_server_side_copies(uploads, files)
+    unchanged_count = len(local_files) - len(uploads) - len(copies)
+    print_info(f"Sync plan: {len(uploads)} to upload, {len(copies)} to copy from identical files, "
+               f"{len(deletes)} to delete, {unchanged_count} unchanged.")
+    if asset_uploads:
+        print_info(f"Fingerprinted assets: {len(asset_uploads)} to upload.")
 
-    log_message(f"Executing AWS CLI command: {' '.join(aws_command)}", level='INFO')
+    if args.dry_run:
+        for rel_path, entry in uploads:
+            print_info(f"  upload: {rel_path} ({entry['size']} bytes)")
+        for key, src, size in asset_uploads:
+            print_info(f"  upload: {src} as {key} ({size} bytes)")
+        for rel_path, entry, source in copies:
+            print_info(f"  copy: {rel_path} from {source}")
+        for rel_path in deletes:
+            print_info(f"  delete: {rel_path}")
+        print_success("Dry run complete; nothing was changed in S3.")
+        sys.exit(0)
 
-    try:
-        process = subprocess.run(aws_command, capture_output=True, text=True, check=False, shell=False)
-        
-        if process.stdout:
-            log_message("AWS CLI stdout:", level='INFO')
-            for line in process.stdout.splitlines():
-                log_message(line, level='INFO') # Log each line of stdout
-        
-        if process.stderr:
-            log_message("AWS CLI stderr:", level='WARNING')
-            for line in process.stderr.splitlines():
-                log_message(line, level='WARNING') # Log each line of stderr
-
-        if process.returncode == 0:
-            log_message("AWS S3 sync completed successfully.", level='SUCCESS')
-            print_success("S3 sync completed successfully.")
-            sys.exit(0)
-        elif process.returncode == 2:
-            log_message("AWS S3 sync completed, but some files may not have been transferred (exit code 2). Review logs.", level='WARNING')
-            print_warning("S3 sync completed, but some files may not have been transferred. Check debug_sync_s3.log")
-            sys.exit(0) # Still treat as success for the hook
-        else:
-            log_message(f"AWS S3 sync failed with exit code {process.returncode}. Error: {process.stderr}", level='ERROR')
-            print_error(f"S3 sync failed. Check debug_sync_s3.log")
-            sys.exit(1)
-            
-    except FileNotFoundError:
-        log_message("Error: 'aws' command not found. Please ensure AWS CLI is installed and in your PATH.", level='ERROR')
-        print_error("'aws' command not found. Ensure AWS CLI is installed and in PATH.")
-        sys.exit(1)
-    except Exception as e:
-        log_message(f"An unexpected error occurred while running AWS CLI sync: {e}", level='ERROR')
-        print_error(f"An unexpected error occurred during S3 sync. Check debug_sync_s3.log")
+    if not uploads and not copies and not deletes and not asset_uploads:
+        if files != manifest_files or assets != synced_assets:
+            save_manifest(files, assets)
+        print_success("S3 sync completed successfully. Everything is up to date.")
+        sys.exit(0)
+
+    if client is None:
+        client = create_s3_client(args.jobs * max(args.part_jobs, 1))
+    limiter = BandwidthLimiter(args.max_bandwidth * MB) if args.max_bandwidth > 0 else None
+    upload_options = {
+        'multipart_threshold': int(args.multipart_threshold * MB),
+        'part_size': int(args.part_size * MB),
+        'part_jobs': args.part_jobs,
+        'limiter': limiter,
+    }
+
+    with metrics.span('sync.transfer'):
+        failures = run_uploads(client, uploads, asset_uploads, files, assets, args.jobs, upload_options, copies)
+
+    if deletes:
+        try:
+            with metrics.span('sync.delete'):
+                failed_deletes = set(delete_objects(client, deletes))
+        except Exception as e:
+            print_error(f"Failed to delete removed files from S3: {e}")
+            failed_deletes = set(deletes)
+        for rel_path in deletes:
+            if rel_path in failed_deletes:
+                print_error(f"Failed to delete {rel_path}")
+                failures += 1
+                # Keep the key in the manifest so the next run retries the delete. An ETag is not
+                # always an MD5 (multipart uploads), so a key only known from the listing gets none.
+                files[rel_path] = manifest_files.get(rel_path) or \
+                    {'size': remote_objects[rel_path]['size'], 'mtime_ns': 0, 'md5': None}
+            else:
+                log_message(f"delete: s3://{S3_BUCKET_NAME}/{S3_PREFIX}{rel_path}", level='INFO')
+
+    # Record successful transfers even when some failed, so the next run only retries the failures
+    with metrics.span('sync.save_manifest'):
+        save_manifest(files, assets)
+    metrics.add('sync.failures', failures)
+
+    if failures:
+        print_error(f"S3 sync failed for {failures} files. Check debug_sync_s3.log")
         sys.exit(1)
+    print_success(f"S3 sync completed successfully. Uploaded {len(uploads) + len(asset_uploads)} files, "
+                  f"copied {len(copies)}, deleted {len(deletes)}.")
+    sys.exit(0)
 
 if __name__ == "__main__":
-    log_message("This script uses AWS CLI. Ensure it's installed and configured ('aws configure --profile joyful-photos').", level='INFO')
+    log_message("This script uses boto3 with the 'joyful-photos' AWS profile ('aws configure --profile joyful-photos').", level='INFO')
     main()
@@ -0,0 +1,35 @@
+"""benchmark_gallery.check_regressions: per-image, fixed plus per-image and startup budgets."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark_gallery import check_regressions
+
+THRESHOLDS = {"save": 30, "validate_s3_head": 2000, "validate_s3_head_fixed_ms": 1000, "cli_help_ms": 250}
+
+class CheckRegressionsTest(unittest.TestCase):
+    def test_per_image_budget(self):
+        self.assertEqual(check_regressions({"save": 0.25}, 10000, THRESHOLDS), [])
+        self.assertEqual(len(check_regressions({"save": 0.35}, 10000, THRESHOLDS)), 1)
+
+    def test_fixed_cost_covers_small_samples(self):
+        # 200 images at 5400 us each would fail a plain 2000 us/image budget
+        self.assertEqual(check_regressions({"validate_s3_head": 1.08}, 10000, THRESHOLDS, s3_images=200), [])
+        self.assertEqual(check_regressions({"validate_s3_head": 4.9}, 10000, THRESHOLDS, s3_images=2000), [])
+        regressions = check_regressions({"validate_s3_head": 5.2}, 10000, THRESHOLDS, s3_images=2000)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn("1000 ms + 2000 us/image", regressions[0])
+
+    def test_startup_budget(self):
+        self.assertEqual(check_regressions({"cli_help": 0.2}, 10000, THRESHOLDS), [])
+        self.assertEqual(len(check_regressions({"cli_help": 0.3}, 10000, THRESHOLDS)), 1)
+
+    def test_baseline(self):
+        self.assertEqual(len(check_regressions({"save": 0.1}, 10000, {}, baseline={"save": 0.05})), 1)
+        self.assertEqual(check_regressions({"save": 0.055}, 10000, {}, baseline={"save": 0.05}), [])
+
+if __name__ == '__main__':
+    unittest.main()
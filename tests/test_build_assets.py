@@ -0,0 +1,100 @@
+"""Minifying the shipped docs/ assets keeps every literal and changes nothing but whitespace and comments."""
+
+import os
+import re
+import sys
+import glob
+import shutil
+import tempfile
+import unittest
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import build_assets
+from build_assets import minify_css, minify_js
+
+def css_parts(text):
+    """(literals, code without comments) of a stylesheet"""
+    literals = [match.group() for match in build_assets.CSS_LITERAL.finditer(text) if not match.group().startswith('/*')]
+    return literals, build_assets.CSS_LITERAL.sub(lambda match: '' if match.group().startswith('/*') else '\0', text)
+
+def js_parts(text):
+    """(literals, code without comments) of a script"""
+    literals = []
+    code = []
+    position = 0
+    for start, end, comment in build_assets._scan_js(text)[0]:
+        code.append(text[position:start])
+        if not comment:
+            literals.append(text[start:end])
+            code.append('\0')
+        position = end
+    code.append(text[position:])
+    return literals, ''.join(code)
+
+def squeeze(code):
+    return re.sub(r'\s+', '', code).replace(';}', '}')
+
+class ShippedAssetsTest(unittest.TestCase):
+    def assert_round_trip(self, minify, parts, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            source = f.read()
+        minified = minify(source)
+        source_literals, source_code = parts(source)
+        minified_literals, minified_code = parts(minified)
+        self.assertEqual(minified_literals, source_literals, path)
+        self.assertEqual(squeeze(minified_code), squeeze(source_code), path)
+        self.assertEqual(minify(minified), minified, path)
+        self.assertLess(len(minified), len(source), path)
+        return minified
+
+    def test_stylesheets(self):
+        paths = glob.glob(os.path.join(ROOT, 'docs', '**', '*.css'), recursive=True)
+        self.assertTrue(paths)
+        for path in paths:
+            self.assert_round_trip(minify_css, css_parts, path)
+
+    def test_scripts(self):
+        paths = glob.glob(os.path.join(ROOT, 'docs', '**', '*.js'), recursive=True)
+        self.assertTrue(paths)
+        node = shutil.which('node')
+        for path in paths:
+            minified = self.assert_round_trip(minify_js, js_parts, path)
+            if node:
+                with tempfile.TemporaryDirectory() as folder:
+                    output = os.path.join(folder, os.path.basename(path))
+                    with open(output, 'w', encoding='utf-8') as f:
+                        f.write(minified)
+                    result = subprocess.run([node, '--check', output], capture_output=True, text=True)
+                    self.assertEqual(result.returncode, 0, f"{path}: {result.stderr}")
+
+class LiteralTest(unittest.TestCase):
+    def test_css_strings_and_urls_are_kept(self):
+        css = ('a::before { content: "a: b ; c , d" ; }\n'
+               '.b { background: url(data:image/svg+xml;utf8,<svg a="1"> </svg>) , url( "x y.png" ); }\n'
+               ".c { content: '/* not a comment */'; } /* a: comment */")
+        self.assertEqual(minify_css(css),
+                         'a::before{content:"a: b ; c , d"}'
+                         '.b{background:url(data:image/svg+xml;utf8,<svg a="1"> </svg>),url( "x y.png" )}'
+                         ".c{content:'/* not a comment */'}")
+
+    def test_js_backticks_in_comments_and_regexes(self):
+        js = ("// a ` in a comment\n"
+              "const re = /`[a-z]/g; // and `\n"
+              "const t = `line 1\n    line 2 ${a ? `x ${b}` : '}'} end`;\n"
+              "  const s = 'http://x//y'; /* a\n   block */ let d = a / b / c;\n"
+              "const e = x.replace(/\\/+/g, '/');\n")
+        self.assertEqual(minify_js(js),
+                         "const re = /`[a-z]/g;\n"
+                         "const t = `line 1\n    line 2 ${a ? `x ${b}` : '}'} end`;\n"
+                         "const s = 'http://x//y';\n"
+                         "let d = a / b / c;\n"
+                         "const e = x.replace(/\\/+/g, '/');")
+
+    def test_js_keeps_preserved_comments(self):
+        self.assertEqual(minify_js("/*! licence */\n  f();  // call\n"), "/*! licence */\nf();")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+"""Duplicate detection: near-duplicate dHash clusters and uploads turned into server-side copies."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import duplicate_images
+import sync_s3
+
+class FindSimilarTest(unittest.TestCase):
+    def test_hashes_within_the_distance_are_clustered(self):
+        base = 0x0123456789abcdef
+        hashes = {
+            "gallery/a.jpg": base,
+            "gallery/a-export.jpg": base ^ 0b111, # 3 bits apart
+            "gallery/a-crop.jpg": base ^ 0x8000000000000003, # 3 bits apart, in two different bands
+            "gallery/other.jpg": ~base & 0xffffffffffffffff,
+        }
+        self.assertEqual(duplicate_images.find_similar(hashes, max_distance=3),
+                         [["gallery/a-crop.jpg", "gallery/a-export.jpg", "gallery/a.jpg"]])
+        # The export and the crop are 2 bits apart from each other
+        self.assertEqual(duplicate_images.find_similar(hashes, max_distance=2),
+                         [["gallery/a-crop.jpg", "gallery/a-export.jpg"]])
+
+class FindServerSideCopiesTest(unittest.TestCase):
+    def test_identical_bytes_are_uploaded_once(self):
+        def entry(md5, size=10):
+            return {'size': size, 'mtime_ns': 0, 'md5': md5}
+        files = {"gallery/synced.jpg": entry('aaa')}
+        uploads = [("gallery/b.jpg", entry('bbb')), ("gallery/b-copy.jpg", entry('bbb')),
+                   ("gallery/a-copy.jpg", entry('aaa')), ("gallery/c.jpg", entry('bbb', size=11))]
+        remaining, copies = sync_s3.find_server_side_copies(uploads, files)
+        self.assertEqual([rel_path for rel_path, _ in remaining], ["gallery/b.jpg", "gallery/c.jpg"])
+        self.assertEqual([(rel_path, source) for rel_path, _, source in copies],
+                         [("gallery/b-copy.jpg", "gallery/b.jpg"), ("gallery/a-copy.jpg", "gallery/synced.jpg")])
+
+if __name__ == '__main__':
+    unittest.main()
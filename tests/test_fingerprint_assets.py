@@ -0,0 +1,68 @@
+"""update_gallery_data.fingerprint_assets and sync_s3.build_asset_plan: content-hashed keys for images."""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sync_s3
+import update_gallery_data
+
+class FingerprintAssetsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.original_dir = os.getcwd()
+        os.chdir(self.dir.name)
+        self.addCleanup(os.chdir, self.original_dir)
+        self.write('gallery/nature/a.jpg', b'same bytes')
+        self.write('gallery/city/b.JPG', b'same bytes')
+        self.write('gallery/city/c.png', b'other bytes')
+        self.data = {"categories": [
+            {"id": "nature", "images": [{"src": "gallery/nature/a.jpg"}, {"src": "gallery/nature/gone.jpg"}]},
+            {"id": "city", "images": [{"src": "gallery/city/b.JPG"}, {"src": "gallery/city/c.png"}]},
+        ]}
+
+    def write(self, src, content):
+        path = os.path.join(os.path.dirname(update_gallery_data.GALLERY_IMAGES_PATH), src)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def fingerprint(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return update_gallery_data.fingerprint_assets(self.data)
+
+    def test_keys_follow_the_content(self):
+        self.assertEqual(self.fingerprint(), 3)
+        assets = self.data["assets"]
+        self.assertEqual(sorted(assets), ["gallery/city/b.JPG", "gallery/city/c.png", "gallery/nature/a.jpg"])
+        self.assertTrue(assets["gallery/nature/a.jpg"].startswith(update_gallery_data.ASSETS_DIR + '/'))
+        # Identical bytes share a key; the extension is kept, lowercased
+        self.assertEqual(assets["gallery/city/b.JPG"], assets["gallery/nature/a.jpg"])
+        self.assertNotEqual(assets["gallery/city/c.png"], assets["gallery/nature/a.jpg"])
+        self.assertTrue(assets["gallery/city/c.png"].endswith('.png'))
+
+        # Unchanged files are not read again; a replaced photo gets a new key
+        self.assertEqual(self.fingerprint(), 0)
+        old_key = assets["gallery/nature/a.jpg"]
+        self.write('gallery/nature/a.jpg', b'new photo, new size')
+        self.assertEqual(self.fingerprint(), 1)
+        self.assertNotEqual(self.data["assets"]["gallery/nature/a.jpg"], old_key)
+
+    def test_each_key_is_uploaded_once(self):
+        asset_map = {"gallery/a.jpg": "assets/1.jpg", "gallery/b.jpg": "assets/1.jpg",
+                     "gallery/c.jpg": "assets/2.jpg", "gallery/d.jpg": "assets/3.jpg", "gallery/gone.jpg": "assets/4.jpg"}
+        local_files = {src: (10, 0) for src in ("gallery/a.jpg", "gallery/b.jpg", "gallery/c.jpg", "gallery/d.jpg")}
+        uploads, assets = sync_s3.build_asset_plan(asset_map, {"assets/2.jpg": "gallery/c.jpg"}, local_files,
+                                                   remote_objects={"assets/3.jpg": {}})
+        self.assertEqual(uploads, [("assets/1.jpg", "gallery/a.jpg", 10)])
+        self.assertEqual(assets, {"assets/1.jpg": "gallery/a.jpg", "assets/2.jpg": "gallery/c.jpg",
+                                  "assets/3.jpg": "gallery/d.jpg"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""gallery_catalog.py: compact records behave like the dicts they replace and are written back unchanged."""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gallery_catalog import Catalog, CatalogImage, json_default, load_catalog, loads_catalog, write_catalog
+
+SAMPLE = {
+    "categories": [
+        {"id": "icons", "name": "Icons", "description": "Small éléments",
+         "images": [{"src": "icons/a.png", "alt": "A", "width": 64, "height": 64, "bytes": 1024},
+                    {"alt": "B", "src": "icons/b.svg", "custom": {"tags": ["x", 1.5, None, True]}}]},
+        {"id": "empty", "name": "Empty", "images": []},
+    ],
+    "assets": {"gallery.js": "gallery.1a2b3c4d.js"},
+    "generated": 1.0,
+}
+
+class GalleryCatalogTest(unittest.TestCase):
+    def test_records_behave_like_dicts(self):
+        data = loads_catalog(json.dumps(SAMPLE))
+        self.assertIsInstance(data, Catalog)
+        image = data["categories"][0]["images"][0]
+        self.assertIsInstance(image, CatalogImage)
+        self.assertEqual((image.src, image["width"], image.get("description"), image.description),
+                         ("icons/a.png", 64, None, None))
+        self.assertNotIn("description", image)
+        self.assertEqual(list(data["categories"][0]["images"][1]), ["alt", "src", "custom"])
+        self.assertEqual(image.pop("bytes"), 1024)
+        self.assertEqual(image, {"src": "icons/a.png", "alt": "A", "width": 64, "height": 64})
+        self.assertEqual(json.loads(json.dumps(data, default=json_default))["assets"], SAMPLE["assets"])
+
+    def test_write_matches_json_dump(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            source = os.path.join(tmp, "source.json")
+            with open(source, "w", encoding="utf-8") as f:
+                json.dump(SAMPLE, f, indent=2)
+            target = os.path.join(tmp, "target.json")
+            write_catalog(load_catalog(source), target)
+            with open(source, "rb") as expected, open(target, "rb") as written:
+                self.assertEqual(written.read(), expected.read())
+            # The temporary file has replaced the target
+            self.assertEqual(sorted(os.listdir(tmp)), ["source.json", "target.json"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""gallery_logging.py: the queued writer keeps every line, honours the level and writes JSON on request."""
+
+import io
+import os
+import sys
+import json
+import tempfile
+import threading
+import unittest
+import contextlib
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gallery_logging
+
+class GalleryLoggingTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.log_path = os.path.join(self.dir.name, 'debug_test.log')
+        # The first setup_logging() call in a process owns the log, so release any earlier one
+        gallery_logging.close_logging()
+        self.addCleanup(gallery_logging.close_logging)
+
+    def log(self, messages, level='DEBUG'):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            gallery_logging.setup_logging(self.log_path, 'test_gallery_logging.py')
+            for message in messages:
+                gallery_logging.log_message(message, level=level)
+            gallery_logging.close_logging()
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            return output.getvalue().splitlines(), f.read().splitlines()[2:] # after the two header lines
+
+    def test_lines_from_several_threads_are_all_written(self):
+        def worker(thread):
+            for index in range(500):
+                gallery_logging.log_message(f"thread {thread} line {index}", level='DEBUG')
+        with contextlib.redirect_stdout(io.StringIO()):
+            gallery_logging.setup_logging(self.log_path, 'test_gallery_logging.py')
+            threads = [threading.Thread(target=worker, args=(thread,)) for thread in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            gallery_logging.close_logging()
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()[2:]
+        self.assertEqual(sorted(lines), sorted(f"DEBUG: thread {thread} line {index}" for thread in range(4) for index in range(500)))
+
+    def test_messages_below_the_level_are_dropped(self):
+        with mock.patch.object(gallery_logging, '_threshold', gallery_logging.LEVELS['INFO']):
+            self.assertFalse(gallery_logging.is_enabled('DEBUG'))
+            console, lines = self.log(['hidden'], level='DEBUG')
+            self.assertEqual((console, lines), ([], []))
+            console, lines = self.log(['shown'], level='INFO')
+        self.assertEqual(console, ['INFO: shown'])
+        self.assertEqual(lines, ['INFO: shown'])
+
+    def test_json_format(self):
+        with mock.patch.object(gallery_logging, '_json_format', True):
+            console, lines = self.log(['uploaded gallery/a.jpg'], level='SUCCESS')
+        self.assertEqual(console, ['SUCCESS: uploaded gallery/a.jpg'])
+        record = json.loads(lines[0])
+        self.assertEqual((record['script'], record['level'], record['message']),
+                         ('test_gallery_logging.py', 'SUCCESS', 'uploaded gallery/a.jpg'))
+
+if __name__ == '__main__':
+    unittest.main()
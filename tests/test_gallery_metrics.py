@@ -0,0 +1,53 @@
+"""gallery_metrics.py: spans, counters and latency histograms, and the report formats they end up in."""
+
+import os
+import sys
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import gallery_metrics
+
+class GalleryMetricsTest(unittest.TestCase):
+    def recording(self):
+        return mock.patch.multiple(gallery_metrics, _enabled=True, _script_name='test_gallery_metrics.py',
+                                   _started=time.perf_counter(), _started_wall=time.time(),
+                                   _spans={}, _counters={}, _histograms={})
+
+    def test_disabled_records_nothing(self):
+        with mock.patch.multiple(gallery_metrics, _enabled=False, _spans={}, _counters={}, _histograms={}):
+            with gallery_metrics.span('update.scan'), gallery_metrics.timer('s3.head'):
+                gallery_metrics.add('s3.requests')
+            self.assertEqual((gallery_metrics._spans, gallery_metrics._counters, gallery_metrics._histograms),
+                             ({}, {}, {}))
+
+    def test_report(self):
+        with self.recording():
+            for _ in range(2):
+                with gallery_metrics.span('sync.plan'):
+                    pass
+            gallery_metrics.add('s3.requests')
+            gallery_metrics.add('s3.bytes_uploaded', 2048)
+            gallery_metrics.add('s3.requests')
+            for seconds in (0.003, 0.02, 0.02, 30.0):
+                gallery_metrics.observe('s3.head', seconds)
+            report = gallery_metrics.build_report()
+            text = gallery_metrics.prometheus_text(report)
+
+        self.assertEqual(report['spans']['sync.plan']['count'], 2)
+        self.assertEqual(report['counters'], {'s3.bytes_uploaded': 2048, 's3.requests': 2})
+        histogram = report['histograms']['s3.head']
+        self.assertEqual((histogram['count'], histogram['min_seconds'], histogram['max_seconds']), (4, 0.003, 30.0))
+        # Buckets are cumulative, as in Prometheus
+        self.assertEqual((histogram['buckets']['0.005'], histogram['buckets']['0.025'], histogram['buckets']['10.0'],
+                          histogram['buckets']['+Inf']), (1, 3, 3, 4))
+
+        self.assertIn('joyful_events_total{script="test_gallery_metrics.py",counter="s3.requests"} 2', text)
+        self.assertIn('joyful_remote_call_seconds_bucket{script="test_gallery_metrics.py",call="s3.head",le="+Inf"} 4',
+                      text)
+        self.assertIn('joyful_remote_call_seconds_count{script="test_gallery_metrics.py",call="s3.head"} 4', text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""update_gallery_data.save_gallery_shards: content-hashed shards are only ever written whole."""
+
+import io
+import os
+import sys
+import json
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import update_gallery_data
+
+DATA = {"categories": [{"id": "nature", "name": "Nature", "images": [{"src": "gallery/nature/a.jpg", "alt": "A"}]}]}
+
+class SaveGalleryShardsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.index_path = os.path.join(self.dir.name, 'gallery-index.json')
+        self.shards_path = os.path.join(self.dir.name, update_gallery_data.GALLERY_SHARDS_DIR)
+        patcher = mock.patch.object(update_gallery_data, 'GALLERY_INDEX_PATH', self.index_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def save(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return update_gallery_data.save_gallery_shards(DATA)
+
+    def assert_index_points_at_complete_shard(self):
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            shard = json.load(f)["categories"][0]["shard"]
+        with open(os.path.join(self.dir.name, shard), 'r', encoding='utf-8') as f:
+            self.assertEqual(json.load(f)["images"], DATA["categories"][0]["images"])
+
+    def test_index_points_at_complete_shard(self):
+        self.assertTrue(self.save())
+        self.assert_index_points_at_complete_shard()
+
+    def test_interrupted_write_leaves_no_shard(self):
+        with mock.patch.object(update_gallery_data.os, 'replace', side_effect=OSError("No space left on device")):
+            self.assertFalse(self.save())
+        self.assertFalse([name for name in os.listdir(self.shards_path) if name.endswith('.json')])
+        # The next run writes the shard instead of trusting a truncated one
+        self.assertTrue(self.save())
+        self.assert_index_points_at_complete_shard()
+
+if __name__ == '__main__':
+    unittest.main()
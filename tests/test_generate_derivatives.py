@@ -0,0 +1,70 @@
+"""generate_derivatives.py: resized variants are recorded, reused while the source is unchanged, and pruned."""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_derivatives
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+@unittest.skipIf(Image is None, "Pillow is not installed")
+class GenerateDerivativesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.original_dir = os.getcwd()
+        os.chdir(self.dir.name)
+        self.addCleanup(os.chdir, self.original_dir)
+        self.add('gallery/wide.jpg', (1000, 500))
+        self.add('gallery/small.jpg', (300, 200))
+        self.data = {"categories": [{"id": "sample", "images": [{"src": "gallery/wide.jpg"}, {"src": "gallery/small.jpg"}]}]}
+
+    def add(self, src, size):
+        path = os.path.join(generate_derivatives.IMAGES_BASE_PATH, src)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.new('RGB', size, (200, 120, 40)).save(path, format='JPEG')
+
+    def generate(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return generate_derivatives.generate_derivatives(self.data, jobs=1)
+
+    def variants(self, index):
+        return self.data["categories"][0]["images"][index]["variants"]
+
+    def test_variants_are_written_and_never_upscaled(self):
+        self.assertEqual(self.generate(), (2, 0, 0))
+        formats = len(generate_derivatives.available_formats())
+        self.assertEqual(sorted({(v["width"], v["height"]) for v in self.variants(0)}), [(400, 200), (800, 400)])
+        self.assertEqual(len(self.variants(0)), 2 * formats)
+        self.assertEqual({v["width"] for v in self.variants(1)}, {300})
+        for variant in self.variants(0) + self.variants(1):
+            self.assertTrue(variant["src"].startswith(generate_derivatives.DERIVATIVES_DIR + '/'))
+            self.assertTrue(os.path.exists(os.path.join(generate_derivatives.IMAGES_BASE_PATH, variant["src"])))
+
+    def test_unchanged_sources_are_reused(self):
+        self.generate()
+        first = self.variants(0)
+        self.assertEqual(self.generate(), (0, 2, 0))
+        self.assertEqual(self.variants(0), first)
+
+    def test_derivatives_of_removed_images_are_deleted(self):
+        self.generate()
+        removed = self.variants(1)
+        del self.data["categories"][0]["images"][1]
+        self.generate()
+        for variant in removed:
+            self.assertFalse(os.path.exists(os.path.join(generate_derivatives.IMAGES_BASE_PATH, variant["src"])))
+        self.assertEqual(len(os.listdir(os.path.join(generate_derivatives.IMAGES_BASE_PATH, generate_derivatives.DERIVATIVES_DIR))),
+                         len(self.variants(0)))
+
+if __name__ == '__main__':
+    unittest.main()
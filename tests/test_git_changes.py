@@ -0,0 +1,87 @@
+"""git_changes.py and validate_gallery.py --changed-only against a throwaway git repository."""
+
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import contextlib
+import subprocess
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import git_changes
+import validate_gallery
+
+def catalog(*srcs):
+    return {"categories": [{"id": "nature", "name": "Nature", "images": [{"src": src} for src in srcs]}]}
+
+@unittest.skipIf(shutil.which('git') is None, "git is not installed")
+class StagedGalleryChangesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.repo = self.dir.name
+        self.git('init', '-q')
+        self.images = os.path.join(self.repo, 'docs', 'images')
+        for name in ('kept.jpg', 'dropped.jpg'):
+            self.write_image('gallery/nature/' + name)
+        self.write_catalog(catalog('gallery/nature/kept.jpg', 'gallery/nature/dropped.jpg'))
+        self.git('add', '-A')
+        self.git('commit', '-q', '-m', 'Initial gallery')
+
+    def git(self, *args):
+        subprocess.run(['git', '-C', self.repo, '-c', 'user.name=Test', '-c', 'user.email=test@example.com', *args],
+                       check=True, capture_output=True)
+
+    def write_image(self, src):
+        path = os.path.join(self.images, src.replace('/', os.sep))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'jpeg')
+
+    def write_catalog(self, data):
+        with open(os.path.join(self.repo, 'docs', 'gallery-data.json'), 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def stage_removal(self):
+        # The entry goes but its file stays: the file is now unreferenced
+        self.write_catalog(catalog('gallery/nature/kept.jpg'))
+        self.git('add', 'docs/gallery-data.json')
+
+    def test_nothing_staged(self):
+        self.assertEqual(git_changes.staged_gallery_changes(self.repo), (set(), set()))
+
+    def test_added_image_and_entry(self):
+        self.write_image('gallery/nature/new.jpg')
+        self.write_catalog(catalog('gallery/nature/kept.jpg', 'gallery/nature/dropped.jpg', 'gallery/nature/new.jpg'))
+        self.git('add', '-A')
+        self.assertEqual(git_changes.staged_gallery_changes(self.repo),
+                         ({'gallery/nature/new.jpg'}, {'gallery/nature/new.jpg'}))
+
+    def test_removed_entry_is_an_unreferenced_candidate(self):
+        self.stage_removal()
+        self.assertEqual(git_changes.changed_catalog_srcs(self.repo, 'docs/gallery-data.json'),
+                         {'gallery/nature/dropped.jpg'})
+        self.assertEqual(git_changes.staged_gallery_changes(self.repo),
+                         ({'gallery/nature/dropped.jpg'}, {'gallery/nature/dropped.jpg'}))
+
+    def test_changed_only_validation_rejects_removed_entry(self):
+        self.stage_removal()
+        output = io.StringIO()
+        with mock.patch.multiple(validate_gallery, ABS_SCRIPT_DIR=self.repo,
+                                 GALLERY_DATA_FILE=os.path.join(self.repo, 'docs', 'gallery-data.json'),
+                                 LOCAL_IMAGE_BASE_PATH=self.images,
+                                 LOCAL_GALLERY_IMAGE_PATH=os.path.join(self.images, 'gallery'),
+                                 LOG_FILE_PATH=os.path.join(self.repo, 'debug.log')), \
+                contextlib.redirect_stdout(output), contextlib.redirect_stderr(output), \
+                self.assertRaises(SystemExit) as exit:
+            validate_gallery.main(['--changed-only'])
+        self.assertEqual(exit.exception.code, 1)
+        self.assertIn("gallery/nature/dropped.jpg", output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+"""Header parsing of truncated and complete images, and how the updater copes with them."""
+
+import os
+import sys
+import struct
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import update_gallery_data
+from image_headers import read_image_size
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00\x00\x00\x0dIHDR' + struct.pack('>II', 640, 480) + b'\x08\x02\x00\x00\x00'
+GIF = b'GIF89a' + struct.pack('<HH', 320, 200) + b'\x00\x00\x00'
+WEBP_VP8 = b'RIFF\x00\x00\x00\x00WEBPVP8 ' + b'\x00' * 7 + b'\x9d\x01\x2a' + struct.pack('<HH', 800, 600) + b'\x00\x00'
+WEBP_VP8L = b'RIFF\x00\x00\x00\x00WEBPVP8L' + b'\x00' * 4 + b'\x2f' + bytes([0x3f, 0xc0, 0x3f, 0x00]) + b'\x00' * 7
+WEBP_VP8X = b'RIFF\x00\x00\x00\x00WEBPVP8X' + b'\x00' * 8 + (1023).to_bytes(3, 'little') + (767).to_bytes(3, 'little') + b'\x00\x00'
+JPEG = (b'\xff\xd8' + b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00' + b'\x00' * 9
+        + b'\xff\xc0' + struct.pack('>H', 17) + b'\x08' + struct.pack('>HH', 1080, 1920) + b'\x03' + b'\x00' * 9
+        + b'\xff\xd9')
+
+class ReadImageSizeTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def size_of(self, data):
+        path = os.path.join(self.dir.name, 'image')
+        with open(path, 'wb') as f:
+            f.write(data)
+        return read_image_size(path)
+
+    def test_complete_headers(self):
+        self.assertEqual(self.size_of(PNG), (640, 480))
+        self.assertEqual(self.size_of(GIF), (320, 200))
+        self.assertEqual(self.size_of(WEBP_VP8), (800, 600))
+        self.assertEqual(self.size_of(WEBP_VP8L), (64, 256))
+        self.assertEqual(self.size_of(WEBP_VP8X), (1024, 768))
+        self.assertEqual(self.size_of(JPEG), (1920, 1080))
+
+    def test_truncated_headers_give_none(self):
+        cases = {'PNG': (PNG, 20), 'GIF': (GIF, 7), 'WebP VP8': (WEBP_VP8, 27), 'WebP VP8L': (WEBP_VP8L, 22),
+                 'WebP VP8X': (WEBP_VP8X, 26), 'JPEG': (JPEG, 24)}
+        for name, (data, length) in cases.items():
+            with self.subTest(name):
+                self.assertIsNone(self.size_of(data[:length]))
+
+    def test_every_truncation_is_handled(self):
+        for data in (PNG, GIF, WEBP_VP8, WEBP_VP8L, WEBP_VP8X, JPEG):
+            for length in range(len(data)):
+                # Must not raise: either None or a size read from a complete header
+                self.size_of(data[:length])
+
+    def test_bad_jpeg_segment_length(self):
+        self.assertIsNone(self.size_of(b'\xff\xd8\xff\xe0\x00\x01' + b'\x00' * 16))
+
+class RecordImageDimensionsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.original_dir = os.getcwd()
+        os.chdir(self.dir.name)
+        self.addCleanup(os.chdir, self.original_dir)
+        os.makedirs(update_gallery_data.GALLERY_IMAGES_PATH + '/ballet')
+
+    def write(self, name, data):
+        with open(os.path.join(update_gallery_data.GALLERY_IMAGES_PATH, 'ballet', name), 'wb') as f:
+            f.write(data)
+
+    def test_truncated_image_does_not_stop_the_update(self):
+        self.write('short.gif', GIF[:7])
+        self.write('good.png', PNG)
+        data = {"categories": [{"id": "ballet", "images": [
+            {"src": "gallery/ballet/short.gif", "width": 5, "height": 5},
+            {"src": "gallery/ballet/good.png"},
+        ]}]}
+        update_gallery_data.record_image_dimensions(data)
+        short, good = data["categories"][0]["images"]
+        self.assertEqual(short, {"src": "gallery/ballet/short.gif", "bytes": 7})
+        self.assertEqual((good["width"], good["height"], good["bytes"]), (640, 480, len(PNG)))
+
+    def test_missing_image_loses_its_dimensions(self):
+        data = {"categories": [{"id": "ballet", "images": [
+            {"src": "gallery/ballet/gone.jpg", "alt": "Gone", "width": 10, "height": 20, "bytes": 300},
+        ]}]}
+        update_gallery_data.record_image_dimensions(data)
+        self.assertEqual(data["categories"][0]["images"][0], {"src": "gallery/ballet/gone.jpg", "alt": "Gone"})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""joyful.py sees the exit status of the scripts it runs."""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import joyful
+import update_gallery_data
+
+class UpdateExitStatusTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.original_dir = os.getcwd()
+        os.chdir(self.dir.name)
+        self.addCleanup(os.chdir, self.original_dir)
+        os.makedirs(os.path.join(update_gallery_data.GALLERY_IMAGES_PATH, 'ballet'))
+
+    def run_update(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            code = joyful.exit_code(joyful.run_update, [])
+        return code, output.getvalue()
+
+    def test_success(self):
+        code, output = self.run_update()
+        self.assertEqual(code, 0)
+        self.assertIn("Gallery data update complete!", output)
+
+    def test_failed_save_is_a_failure(self):
+        with mock.patch.object(update_gallery_data, 'save_gallery_data', return_value=False):
+            code, output = self.run_update()
+        self.assertEqual(code, 1)
+        self.assertIn("Gallery data update failed", output)
+
+    def test_run_all_stops_after_a_failed_update(self):
+        with mock.patch.object(update_gallery_data, 'save_gallery_data', return_value=False), \
+                mock.patch.object(joyful, 'run_render') as run_render, \
+                contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            code = joyful.run_all(joyful.parse_args(['all', '--dry-run'])[0])
+        self.assertEqual(code, 1)
+        run_render.assert_not_called()
+
+class RunAllTest(unittest.TestCase):
+    def test_derivatives_run_between_update_and_render(self):
+        steps = mock.Mock()
+        with mock.patch.multiple(joyful, run_update=steps.update, run_derivatives=steps.derivatives,
+                                 run_render=steps.render, run_validate=steps.validate, run_sync=steps.sync), \
+                contextlib.redirect_stdout(io.StringIO()):
+            code = joyful.run_all(joyful.parse_args(['all', '--dry-run'])[0])
+        self.assertEqual(code, 0)
+        self.assertEqual([name for name, _, _ in steps.mock_calls], ['update', 'derivatives', 'render', 'validate', 'sync'])
+        steps.derivatives.assert_called_once_with(['--if-available'])
+
+    def test_missing_pillow_only_skips_derivatives_in_run_all(self):
+        import generate_derivatives
+        with mock.patch.object(generate_derivatives, 'Image', None), contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(joyful.exit_code(joyful.run_derivatives, ['--if-available']), 0)
+            self.assertEqual(joyful.exit_code(joyful.run_derivatives, []), 1)
+
+if __name__ == '__main__':
+    unittest.main()
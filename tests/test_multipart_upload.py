@@ -0,0 +1,115 @@
+"""multipart_upload.py against fake_s3.py: interrupted uploads resume from their checkpoint."""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sync_s3
+import multipart_upload
+from fake_s3 import FakeS3Server
+from multipart_upload import MB
+
+try:
+    import boto3 # noqa: F401
+    import botocore.exceptions
+except ImportError:
+    boto3 = None
+
+BUCKET = sync_s3.S3_BUCKET_NAME
+KEY = sync_s3.S3_PREFIX + 'gallery/large.jpg'
+PART_SIZE = 5 * MB # three parts for the file below
+
+@unittest.skipIf(boto3 is None, "boto3 is not installed")
+class ResumeUploadTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, 'large.jpg')
+        with open(self.path, 'wb') as f:
+            f.write(os.urandom(11 * MB + 123))
+        self.checkpoints = os.path.join(self.dir.name, 'checkpoints')
+        self.checkpoint = multipart_upload.checkpoint_path(self.checkpoints, BUCKET, KEY)
+
+        self.server = FakeS3Server(buckets=[BUCKET]).start()
+        self.addCleanup(self.server.stop)
+        patcher = mock.patch.object(sync_s3, 'S3_ENDPOINT_URL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        environ = mock.patch.dict(os.environ, self.server.environ())
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.client = sync_s3.create_s3_client(1)
+
+    def upload(self, part_size=PART_SIZE):
+        # One part at a time, so the parts are sent in order
+        return multipart_upload.multipart_upload(self.client, BUCKET, KEY, self.path, self.checkpoints,
+                                                 part_size=part_size, part_jobs=1)
+
+    def interrupt_at_part(self, part_number):
+        # 403 is not retried, so the upload stops at once
+        self.server.fail('upload_part', status=403, code='AccessDenied', after=part_number - 1)
+        with self.assertRaises(botocore.exceptions.ClientError):
+            self.upload()
+        self.assertTrue(os.path.exists(self.checkpoint))
+
+    def read_checkpoint(self):
+        with open(self.checkpoint, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def sent(self, operation):
+        return self.server.requests.get(operation, 0)
+
+    def assert_uploaded(self, part_size=PART_SIZE):
+        with open(self.path, 'rb') as f:
+            self.assertEqual(self.server.object(BUCKET, KEY)['body'], f.read())
+        self.assertEqual(self.server.object(BUCKET, KEY)['etag'], multipart_upload.multipart_etag(self.path, part_size))
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_resume_sends_only_the_missing_parts(self):
+        self.interrupt_at_part(3)
+        self.assertEqual(sorted(self.read_checkpoint()['parts']), ['1', '2'])
+        self.assertEqual(self.upload(), 1)
+        self.assertEqual(self.sent('upload_part'), 4) # parts 1, 2, the failed 3 and its resend
+        self.assertEqual(self.sent('create_multipart_upload'), 1)
+        self.assert_uploaded()
+
+    def test_resume_trusts_list_parts_over_the_checkpoint(self):
+        self.interrupt_at_part(3)
+        # Lose the record of part 2, as if the checkpoint write had not made it to disk
+        checkpoint = self.read_checkpoint()
+        del checkpoint['parts']['2']
+        with open(self.checkpoint, 'w', encoding='utf-8') as f:
+            json.dump(checkpoint, f)
+        self.assertEqual(self.upload(), 1)
+        self.assertEqual(self.sent('list_parts'), 1)
+        self.assert_uploaded()
+
+    def test_checkpoint_of_a_modified_file_is_discarded(self):
+        self.interrupt_at_part(3)
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(self.upload(), 3)
+        self.assertEqual(self.sent('create_multipart_upload'), 2)
+        self.assert_uploaded()
+
+    def test_checkpoint_of_a_resized_file_is_discarded(self):
+        self.interrupt_at_part(3)
+        with open(self.path, 'ab') as f:
+            f.write(b'more')
+        self.assertEqual(self.upload(), 3)
+        self.assertEqual(self.sent('create_multipart_upload'), 2)
+        self.assert_uploaded()
+
+    def test_checkpoint_with_another_part_size_is_discarded(self):
+        self.interrupt_at_part(3)
+        self.assertEqual(self.upload(part_size=6 * MB), 2)
+        self.assertEqual(self.sent('create_multipart_upload'), 2)
+        self.assert_uploaded(part_size=6 * MB)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+"""sync_s3.py --prune against fake_s3.py: what it deletes and which protected keys it keeps."""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+from argparse import Namespace
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sync_s3
+from fake_s3 import FakeS3Server
+
+try:
+    import boto3 # noqa: F401
+except ImportError:
+    boto3 = None
+
+BUCKET = sync_s3.S3_BUCKET_NAME
+PREFIX = sync_s3.S3_PREFIX
+
+@unittest.skipIf(boto3 is None, "boto3 is not installed")
+class PruneBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        gallery_data = os.path.join(self.dir.name, 'gallery-data.json')
+        with open(gallery_data, 'w', encoding='utf-8') as f:
+            json.dump({"categories": [{"id": "nature", "images": [{"src": "nature/kept.jpg"}]}]}, f)
+        config_js = os.path.join(self.dir.name, 'config.js')
+        with open(config_js, 'w', encoding='utf-8') as f:
+            f.write("const siteConfig = {\n  homepageImages: { hero: 'website/hero.jpg' },\n  siteImages: {}\n};\n")
+        local_images = os.path.join(self.dir.name, 'images')
+        os.makedirs(os.path.join(local_images, 'nature'))
+        with open(os.path.join(local_images, 'nature', 'local.jpg'), 'wb') as f:
+            f.write(b'local')
+
+        self.server = FakeS3Server(buckets=[BUCKET]).start()
+        self.addCleanup(self.server.stop)
+        patcher = mock.patch.multiple(sync_s3, S3_ENDPOINT_URL=self.server.url, GALLERY_DATA_FILE=gallery_data,
+                                      CONFIG_JS_FILE=config_js, LOCAL_IMAGE_BASE_PATH=local_images,
+                                      SYNC_MANIFEST_PATH=os.path.join(self.dir.name, 'manifest.json'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        environ = mock.patch.dict(os.environ, self.server.environ())
+        environ.start()
+        self.addCleanup(environ.stop)
+
+        for key in ('nature/kept.jpg', 'nature/local.jpg', 'nature/orphan.jpg', 'website/hero.jpg',
+                    'website/old-hero.jpg', 'logo.png', 'press/cover.jpg', 'press/notes.txt'):
+            self.server.put(BUCKET, PREFIX + key, b'x')
+        # Site assets live outside the prefix, so prune never even lists them
+        self.server.put(BUCKET, sync_s3.SITE_S3_PREFIX + 'index.html', b'<html>')
+
+    def prune(self, protect=None, dry_run=False):
+        return sync_s3.prune_bucket(Namespace(jobs=2, dry_run=dry_run, protect=protect))
+
+    def test_keeps_protected_keys(self):
+        self.assertEqual(self.prune(protect=[PREFIX + 'press/*.jpg']), 0)
+        self.assertEqual(sorted(self.server.keys(BUCKET)), sorted([
+            PREFIX + 'logo.png',
+            PREFIX + 'nature/kept.jpg',
+            PREFIX + 'nature/local.jpg',
+            PREFIX + 'press/cover.jpg',
+            PREFIX + 'website/hero.jpg',
+            PREFIX + 'website/old-hero.jpg',
+            sync_s3.SITE_S3_PREFIX + 'index.html',
+        ]))
+
+    def test_protect_patterns_match_full_keys(self):
+        # A pattern relative to the prefix matches nothing, so press/ is pruned
+        self.assertEqual(self.prune(protect=['press/*']), 0)
+        keys = self.server.keys(BUCKET)
+        self.assertNotIn(PREFIX + 'press/cover.jpg', keys)
+        self.assertIn(PREFIX + 'website/old-hero.jpg', keys)
+
+    def test_dry_run_deletes_nothing(self):
+        before = sorted(self.server.keys(BUCKET))
+        self.assertEqual(self.prune(dry_run=True), 0)
+        self.assertEqual(sorted(self.server.keys(BUCKET)), before)
+
+if __name__ == '__main__':
+    unittest.main()
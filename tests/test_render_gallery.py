@@ -0,0 +1,40 @@
+"""render_gallery.py: the rendered tiles carry both the S3 URL and the catalogue path."""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import render_gallery
+
+BASE_URL = 'https://bucket.example/website-images'
+
+class RenderImageTest(unittest.TestCase):
+    def render(self, item, assets=None):
+        return render_gallery.render_image(item, render_gallery.image_url_resolver(BASE_URL, assets))
+
+    def test_img_keeps_catalogue_path_for_local_previews(self):
+        tile = self.render({"src": "gallery/ballet/Ada GP.jpg", "alt": "Ada"},
+                           assets={"gallery/ballet/Ada GP.jpg": "gallery/ballet/Ada GP.0123abcd.jpg"})
+        self.assertIn(f'src="{BASE_URL}/gallery/ballet/Ada%20GP.0123abcd.jpg"', tile)
+        self.assertIn('data-src="gallery/ballet/Ada GP.jpg"', tile)
+        self.assertNotIn('/images/', tile)
+
+    def test_sources_keep_variant_paths(self):
+        tile = self.render({"src": "gallery/a.jpg", "variants": [
+            {"src": "derivatives/a-400w.webp", "width": 400, "type": "image/webp"},
+            {"src": "derivatives/a-800w.webp", "width": 800, "type": "image/webp"},
+        ]})
+        self.assertIn(f'srcset="{BASE_URL}/derivatives/a-400w.webp 400w, {BASE_URL}/derivatives/a-800w.webp 800w"', tile)
+        self.assertIn('data-srcset="derivatives/a-400w.webp 400w, derivatives/a-800w.webp 800w"', tile)
+
+    def test_variant_without_src_is_skipped(self):
+        tile = self.render({"src": "gallery/a.jpg", "variants": [
+            {"width": 400, "type": "image/webp"},
+            {"src": "derivatives/a-800w.webp", "width": 800, "type": "image/webp"},
+        ]})
+        self.assertIn(f'srcset="{BASE_URL}/derivatives/a-800w.webp 800w"', tile)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+"""update_gallery_data.py on a warm scan cache: only the changed folders are merged."""
+
+import io
+import os
+import sys
+import json
+import shutil
+import tempfile
+import unittest
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import update_gallery_data
+
+class ScanChangesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.original_dir = os.getcwd()
+        os.chdir(self.dir.name)
+        self.addCleanup(os.chdir, self.original_dir)
+        for src in ('ballet/one.jpg', 'ballet/two.jpg', 'nature/three.jpg'):
+            self.add(src)
+        self.update()
+
+    def add(self, src):
+        path = os.path.join(update_gallery_data.GALLERY_IMAGES_PATH, src)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb'):
+            pass
+
+    def update(self, *argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            update_gallery_data.main(list(argv))
+        return output.getvalue()
+
+    def catalog(self):
+        with open(update_gallery_data.GALLERY_DATA_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {category["id"]: sorted(img["src"] for img in category["images"]) for category in data["categories"]}
+
+    def change_gallery(self):
+        self.add('ballet/four.jpg')
+        os.remove(os.path.join(update_gallery_data.GALLERY_IMAGES_PATH, 'ballet', 'one.jpg'))
+        shutil.rmtree(os.path.join(update_gallery_data.GALLERY_IMAGES_PATH, 'nature'))
+        os.makedirs(os.path.join(update_gallery_data.GALLERY_IMAGES_PATH, 'street'))
+
+    def test_warm_run_merges_only_the_changes(self):
+        self.change_gallery()
+        output = self.update()
+        self.assertIn("Merged the changes of 3 categories", output)
+        delta = self.catalog()
+        self.assertEqual(delta, {"ballet": ["gallery/ballet/four.jpg", "gallery/ballet/two.jpg"], "street": []})
+        # The same as merging every folder
+        self.update('--full-rescan')
+        self.assertEqual(self.catalog(), delta)
+
+    def test_unchanged_gallery_merges_nothing(self):
+        self.assertIn("Merged the changes of 0 categories", self.update())
+
+    def test_hand_edited_catalogue_gets_a_full_merge(self):
+        with open(update_gallery_data.GALLERY_DATA_PATH, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        data["categories"][0]["images"].pop()
+        with open(update_gallery_data.GALLERY_DATA_PATH, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        output = self.update()
+        self.assertNotIn("Merged the changes", output)
+        self.assertEqual(self.catalog(), {"ballet": ["gallery/ballet/one.jpg", "gallery/ballet/two.jpg"],
+                                          "nature": ["gallery/nature/three.jpg"]})
+
+if __name__ == '__main__':
+    unittest.main()
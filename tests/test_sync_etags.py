@@ -0,0 +1,81 @@
+"""Bootstrapping the sync manifest from a listing with single-part and multipart ETags."""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import sync_s3
+from fake_s3 import FakeS3Server
+from multipart_upload import MB, multipart_upload
+
+try:
+    import boto3 # noqa: F401
+except ImportError:
+    boto3 = None
+
+BUCKET = sync_s3.S3_BUCKET_NAME
+PREFIX = sync_s3.S3_PREFIX
+
+@unittest.skipIf(boto3 is None, "boto3 is not installed")
+class MultipartEtagTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.images = os.path.join(self.dir.name, 'images')
+        os.makedirs(os.path.join(self.images, 'gallery'))
+        self.write('gallery/small.jpg', b'small image')
+        self.write('gallery/large.jpg', os.urandom(11 * MB + 123))
+
+        self.server = FakeS3Server(buckets=[BUCKET]).start()
+        self.addCleanup(self.server.stop)
+        patcher = mock.patch.object(sync_s3, 'S3_ENDPOINT_URL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        environ = mock.patch.dict(os.environ, self.server.environ())
+        environ.start()
+        self.addCleanup(environ.stop)
+        self.client = sync_s3.create_s3_client(2)
+
+    def write(self, rel_path, data):
+        with open(os.path.join(self.images, rel_path), 'wb') as f:
+            f.write(data)
+
+    def upload_large(self, part_size):
+        multipart_upload(self.client, BUCKET, PREFIX + 'gallery/large.jpg', os.path.join(self.images, 'gallery/large.jpg'),
+                         os.path.join(self.dir.name, 'checkpoints'), part_size=part_size)
+
+    def plan(self, **options):
+        self.server.put(BUCKET, PREFIX + 'gallery/small.jpg', b'small image')
+        remote_objects = sync_s3.list_remote_objects(self.client)
+        local_files = sync_s3.scan_local_files(self.images)
+        return sync_s3.build_sync_plan(local_files, {}, remote_objects, base_path=self.images, **options)
+
+    def test_multipart_etag_matches_the_local_file(self):
+        self.upload_large(5 * MB)
+        self.assertTrue(self.server.object(BUCKET, PREFIX + 'gallery/large.jpg')['etag'].endswith('-3'))
+        uploads, _, files = self.plan()
+        self.assertEqual(uploads, [])
+        self.assertEqual(files['gallery/large.jpg']['md5'], sync_s3.file_md5(os.path.join(self.images, 'gallery/large.jpg')))
+
+    def test_part_size_from_the_command_line(self):
+        self.upload_large(6 * MB)
+        self.assertEqual(self.plan(part_size=6 * MB)[0], [])
+        self.assertEqual([rel_path for rel_path, _ in self.plan()[0]], ['gallery/large.jpg'])
+
+    def test_changed_file_is_uploaded(self):
+        self.upload_large(5 * MB)
+        self.write('gallery/large.jpg', os.urandom(11 * MB + 123))
+        self.assertEqual([rel_path for rel_path, _ in self.plan()[0]], ['gallery/large.jpg'])
+
+class EtagMatchesTest(unittest.TestCase):
+    def test_single_part_and_malformed_etags(self):
+        self.assertTrue(sync_s3.etag_matches('unused', 10, 'abc', 'abc'))
+        self.assertFalse(sync_s3.etag_matches('unused', 10, 'abc', 'abd'))
+        self.assertFalse(sync_s3.etag_matches('unused', 10, 'abc', 'abc-x'))
+
+if __name__ == '__main__':
+    unittest.main()
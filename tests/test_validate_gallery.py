@@ -0,0 +1,109 @@
+"""validate_gallery.py: streamed and loaded catalogues, and the legacy entry points that run it."""
+
+import io
+import os
+import sys
+import json
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import validate_gallery
+import validate_gallery_local
+
+try:
+    import ijson # noqa: F401
+except ImportError:
+    ijson = None
+
+CATALOG = {
+    "categories": [
+        {"id": "nature", "name": "Nature", "images": [{"src": "gallery/nature/a.jpg"}, {"alt": "no src"}]},
+        # Images listed before the name
+        {"id": "city", "images": [{"src": "gallery/city/b.jpg"}, "bare"], "name": "City"},
+        {"id": "empty", "name": "Empty"},
+        {"id": "unnamed", "images": [{"src": "gallery/c.jpg"}]},
+    ],
+    "assets": {"gallery/nature/a.jpg": "gallery/nature/a.0123abcd.jpg"},
+}
+
+class CatalogTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, 'gallery-data.json')
+        self.write_catalog(CATALOG)
+
+    def write_catalog(self, data):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+
+    def records(self, stream):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return list(validate_gallery.iter_catalog_records(self.path, stream=stream))
+
+class IterCatalogRecordsTest(CatalogTestCase):
+    def test_loaded_records(self):
+        self.assertEqual(self.records(stream=False), [
+            ('image', 'Nature', {"src": "gallery/nature/a.jpg"}),
+            ('image', 'Nature', {"alt": "no src"}),
+            ('image', 'City', {"src": "gallery/city/b.jpg"}),
+            ('image', 'City', "bare"),
+            ('missing_images', 'Empty', None),
+            ('image', None, {"src": "gallery/c.jpg"}),
+            ('asset', 'gallery/nature/a.jpg', 'gallery/nature/a.0123abcd.jpg'),
+        ])
+
+    @unittest.skipIf(ijson is None, "ijson is not installed")
+    def test_streamed_records_match_loaded_ones(self):
+        self.assertEqual(self.records(stream=True), self.records(stream=False))
+
+    @unittest.skipIf(ijson is None, "ijson is not installed")
+    def test_streamed_catalog_without_categories(self):
+        self.write_catalog({"assets": {}})
+        with self.assertRaises(validate_gallery.CatalogError):
+            self.records(stream=True)
+
+class EntryPointsTest(CatalogTestCase):
+    def setUp(self):
+        super().setUp()
+        self.images = os.path.join(self.dir.name, 'images')
+        os.makedirs(os.path.join(self.images, 'gallery', 'nature'))
+        for src in ('gallery/nature/a.jpg', 'gallery/nature/unlisted.jpg'):
+            with open(os.path.join(self.images, src), 'wb') as f:
+                f.write(b'jpeg')
+        patcher = mock.patch.multiple(validate_gallery, GALLERY_DATA_FILE=self.path, LOCAL_IMAGE_BASE_PATH=self.images,
+                                      LOCAL_GALLERY_IMAGE_PATH=os.path.join(self.images, 'gallery'))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_main(self, main, log_module):
+        output = io.StringIO()
+        with mock.patch.object(log_module, 'LOG_FILE_PATH', os.path.join(self.dir.name, 'debug.log')), \
+                contextlib.redirect_stdout(output), contextlib.redirect_stderr(output), \
+                self.assertRaises(SystemExit) as exit:
+            main([])
+        return exit.exception.code, output.getvalue()
+
+    def test_local_script_runs_the_combined_validator(self):
+        code, output = self.run_main(validate_gallery.main, validate_gallery)
+        self.assertEqual(code, 1)
+        self.assertIn("Missing local file: gallery/city/b.jpg", output)
+        self.assertIn("  - gallery/nature/unlisted.jpg", output)
+        self.assertEqual(self.run_main(validate_gallery_local.main, validate_gallery_local), (code, output))
+
+    def test_variant_without_src_is_reported(self):
+        self.write_catalog({"categories": [{"id": "nature", "name": "Nature", "images": [
+            {"src": "gallery/nature/a.jpg", "variants": [{"width": 400, "type": "image/webp"}]},
+            {"src": "gallery/nature/unlisted.jpg"},
+        ]}]})
+        code, output = self.run_main(validate_gallery.main, validate_gallery)
+        self.assertEqual(code, 1)
+        self.assertIn("Derivative of gallery/nature/a.jpg in category 'Nature' missing 'src' key", output)
+        self.assertIn("Local validation failed with 1 errors.", output)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""HEAD and listing checks against fake_s3.py: found, missing, and S3 errors that outlast the retries."""
+
+import io
+import os
+import sys
+import json
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import validate_gallery
+import validate_gallery_s3
+from fake_s3 import FakeS3Server
+
+BUCKET = validate_gallery_s3.S3_BUCKET_NAME
+PREFIX = validate_gallery_s3.S3_PREFIX
+
+class CheckS3ImagesTest(unittest.TestCase):
+    def setUp(self):
+        validate_gallery_s3.import_requests()
+        self.server = FakeS3Server(buckets=[BUCKET]).start()
+        self.addCleanup(self.server.stop)
+        self.server.put(BUCKET, PREFIX + 'gallery/found.jpg', b'x')
+        patcher = mock.patch.multiple(validate_gallery_s3, S3_BASE_URL=f"{self.server.url}/{BUCKET}/",
+                                      RETRY_BACKOFF_SECONDS=0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_found_and_missing(self):
+        self.assertEqual(validate_gallery_s3.check_s3_images(['gallery/found.jpg', 'gallery/gone.jpg'], jobs=2, rate_limit=0),
+                         {'gallery/found.jpg': True, 'gallery/gone.jpg': False})
+
+    def test_retried_server_error_is_found(self):
+        self.server.fail('head_object', count=2, status=503, code='SlowDown')
+        self.assertIs(validate_gallery_s3.check_s3_image_exists('gallery/found.jpg', retries=2), True)
+
+    def test_server_errors_after_retries_are_not_missing(self):
+        self.server.fail('head_object', count=3, status=500)
+        self.assertIsNone(validate_gallery_s3.check_s3_image_exists('gallery/found.jpg', retries=2))
+
+    def test_listing_pages_through_the_prefix(self):
+        self.server.put(BUCKET, PREFIX + 'gallery/empty.jpg')
+        self.server.put(BUCKET, PREFIX + 'gallery/third.jpg', b'xyz')
+        self.server.put(BUCKET, 'elsewhere/other.jpg', b'x')
+        with mock.patch.object(validate_gallery_s3, 'LIST_PAGE_SIZE', 2):
+            objects = validate_gallery_s3.list_s3_objects()
+        self.assertEqual({key: obj['size'] for key, obj in objects.items()},
+                         {'gallery/empty.jpg': 0, 'gallery/found.jpg': 1, 'gallery/third.jpg': 3})
+        self.assertEqual(self.server.requests['list_objects_v2'], 2)
+
+    def test_main_reports_unchecked_images_separately(self):
+        with tempfile.TemporaryDirectory() as folder:
+            data_path = os.path.join(folder, 'gallery-data.json')
+            with open(data_path, 'w', encoding='utf-8') as f:
+                json.dump({"categories": [{"name": "Sample", "images": [{"src": "gallery/found.jpg"}]}]}, f)
+            self.server.fail('head_object', count=2, status=500)
+            output = io.StringIO()
+            with mock.patch.object(validate_gallery, 'GALLERY_DATA_FILE', data_path), \
+                    mock.patch.object(validate_gallery_s3, 'LOG_FILE_PATH', os.path.join(folder, 'debug.log')), \
+                    contextlib.redirect_stderr(output), self.assertRaises(SystemExit) as exit:
+                validate_gallery_s3.main(['--retries', '1', '--rate-limit', '0'])
+        self.assertEqual(exit.exception.code, 1)
+        self.assertIn("S3 error (not checked): gallery/found.jpg", output.getvalue())
+        self.assertIn("1 images could not be checked", output.getvalue())
+        self.assertNotIn("Missing in S3", output.getvalue())
+
+if __name__ == '__main__':
+    unittest.main()
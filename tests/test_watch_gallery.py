@@ -0,0 +1,58 @@
+"""Watch mode batches: new images get their derivatives before the catalogue is saved."""
+
+import io
+import os
+import sys
+import tempfile
+import unittest
+import contextlib
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generate_derivatives
+import watch_gallery
+
+class UpdateCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.original_dir = os.getcwd()
+        os.chdir(self.dir.name)
+        self.addCleanup(os.chdir, self.original_dir)
+        os.makedirs(os.path.join(watch_gallery.update_gallery_data.GALLERY_IMAGES_PATH, 'ballet'))
+        self.updater = watch_gallery.GalleryUpdater(sync=False)
+
+    def update(self, data):
+        saved = []
+        def save(data):
+            saved.append([img.get("variants") for category in data["categories"] for img in category["images"]])
+            return True
+        with mock.patch.object(watch_gallery, 'save_gallery_data', side_effect=save), \
+                mock.patch.object(watch_gallery, 'save_gallery_shards', return_value=True), \
+                mock.patch.object(watch_gallery.render_gallery, 'render_page'), \
+                contextlib.redirect_stdout(io.StringIO()):
+            self.updater.update_catalog(data, {'gallery/ballet/new.jpg'}, set())
+        return saved
+
+    def test_new_images_get_derivatives(self):
+        def generate(data, **kwargs):
+            for category in data["categories"]:
+                for img in category["images"]:
+                    img["variants"] = [{"src": "derivatives/x-400w.webp", "width": 400, "height": 300, "type": "image/webp"}]
+            return 1, 0, 0
+        with mock.patch.object(generate_derivatives, 'Image', object()), \
+                mock.patch.object(generate_derivatives, 'generate_derivatives', side_effect=generate) as derive:
+            saved = self.update({"categories": []})
+        derive.assert_called_once()
+        self.assertEqual(saved[0][0][0]["src"], "derivatives/x-400w.webp")
+
+    def test_without_pillow_the_catalogue_is_still_saved(self):
+        with mock.patch.object(generate_derivatives, 'Image', None), \
+                mock.patch.object(generate_derivatives, 'generate_derivatives') as derive:
+            saved = self.update({"categories": []})
+        derive.assert_not_called()
+        self.assertEqual(saved, [[None]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,54 +8,149 @@ generated alt text and TODO descriptions.
 """
 
 import os
+import sys
 import json
 import re
-from pathlib import Path
+import time
+import argparse
+import struct
+import hashlib
+
+import gallery_metrics as metrics
+from content_hash import HashCache
+from gallery_catalog import Catalog, CatalogCategory, CatalogImage, load_catalog, write_catalog, json_default
+from image_headers import read_image_size
 
 # Configuration
 GALLERY_DATA_PATH = "docs/gallery-data.json"
+# Small index loaded first by gallery.js, plus one lazily fetched shard per category
+GALLERY_INDEX_PATH = "docs/gallery-index.json"
+GALLERY_SHARDS_DIR = "gallery-shards" # relative to the docs folder
 GALLERY_IMAGES_PATH = "docs/images/gallery"
 SUPPORTED_EXTENSIONS = ['.jpg', '.jpeg', '.png', '.gif', '.webp']
+SCAN_CACHE_PATH = ".gallery_scan_cache.json"
+SCAN_CACHE_VERSION = 1
+DIMENSIONS_CACHE_PATH = ".gallery_dimensions_cache.json"
+# Fingerprint mode: images are also published under content-hashed keys below this folder
+ASSETS_DIR = "assets"
+CONTENT_HASH_CACHE_PATH = ".content_hash_cache.json"
 
 def load_gallery_data():
-    """Load the existing gallery data JSON file"""
+    """Load the existing gallery data JSON file into the compact model of gallery_catalog.py"""
     try:
-        with open(GALLERY_DATA_PATH, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return load_catalog(GALLERY_DATA_PATH)
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"Error loading gallery data: {e}")
         # Return a minimal structure if file doesn't exist or is invalid
-        return {"categories": []}
+        return Catalog({"categories": []})
 
-def scan_gallery_folders():
-    """Scan the gallery directory for subfolders (categories) and images"""
-    gallery_structure = {}
-    
+def catalog_digest(data):
+    """Hash of which images the catalogue lists in which category, in order"""
+    digest = hashlib.sha1()
+    for category in data.get("categories", []):
+        digest.update(f"\0{category.get('id', '')}\0".encode('utf-8'))
+        digest.update('\n'.join(img.get("src") or '' for img in category.get("images", [])).encode('utf-8'))
+    return digest.hexdigest()
+
+def load_scan_cache():
+    """Load the scan cache: (per-category listings, digest of the catalogue saved with them)"""
     try:
-        # Get all subdirectories in the gallery folder
-        gallery_path = Path(GALLERY_IMAGES_PATH)
-        if not gallery_path.exists():
-            print(f"Gallery path not found: {gallery_path}")
-            return gallery_structure
-            
+        with open(SCAN_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}, None
+    if cache.get("version") != SCAN_CACHE_VERSION or cache.get("gallery_path") != GALLERY_IMAGES_PATH:
+        return {}, None
+    return cache.get("categories", {}), cache.get("catalog")
+
+def save_scan_cache(folders, catalog=None):
+    """Save the per-category listings of scan_gallery_folders() for the next scan
+
+    Call it once `catalog`, the catalogue merged from this scan, has been saved: the
+    next scan only reports changes against these listings while the catalogue still
+    lists the same images.
+    """
+    try:
+        temp_path = SCAN_CACHE_PATH + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": SCAN_CACHE_VERSION, "gallery_path": GALLERY_IMAGES_PATH, "categories": folders,
+                       "catalog": catalog_digest(catalog) if catalog is not None else None}, f)
+        os.replace(temp_path, SCAN_CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: could not save scan cache: {e}")
+
+def list_category_images(category_path):
+    """List the supported image files directly inside a category folder"""
+    with os.scandir(category_path) as entries:
+        return [entry.name for entry in entries
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in SUPPORTED_EXTENSIONS]
+
+def scan_gallery_folders(full_rescan=False, catalog=None):
+    """Scan the gallery directory for subfolders (categories) and images
+
+    Returns (folders, changes). folders maps each category folder to its listing,
+    {"key": [mtime_ns, inode], "files": [file names]}, as save_scan_cache() stores it;
+    gallery_structure() turns it into the input of update_gallery_json().
+
+    A category folder is only listed again when its mtime or inode differs from the
+    scan cache; adding, removing or renaming a file inside it changes the mtime.
+    changes maps every folder whose listing differs from the cache to the (added,
+    removed) file names, a removed folder listing all of its files as removed, for
+    patch_gallery_data(). It is None when there is nothing to compare with: with
+    full_rescan=True, without a cache, or when `catalog` no longer lists the images
+    it listed when the cache was saved (it was edited by hand or by watch_gallery.py).
+    """
+    try:
+        if not os.path.isdir(GALLERY_IMAGES_PATH):
+            print(f"Gallery path not found: {GALLERY_IMAGES_PATH}")
+            return {}, None
+
+        cache, cached_catalog = ({}, None) if full_rescan else load_scan_cache()
+        folders = {}
+        changes = {}
+        
         # Map each subfolder to its image files
-        for category_dir in [d for d in gallery_path.iterdir() if d.is_dir()]:
-            category_name = category_dir.name
-            gallery_structure[category_name] = []
-            
-            # Find all image files in this category
-            for file_path in category_dir.glob("*"):
-                if file_path.is_file() and file_path.suffix.lower() in SUPPORTED_EXTENSIONS:
-                    relative_path = f"gallery/{category_name}/{file_path.name}"
-                    gallery_structure[category_name].append({
-                        "file_name": file_path.name,
-                        "relative_path": relative_path
-                    })
-                    
-        return gallery_structure
+        with os.scandir(GALLERY_IMAGES_PATH) as category_entries:
+            for category_entry in category_entries:
+                if not category_entry.is_dir():
+                    continue
+                category_name = category_entry.name
+                cache_key = [category_entry.stat().st_mtime_ns, category_entry.inode()]
+                cached = cache.get(category_name)
+                if cached and cached["key"] == cache_key:
+                    file_names = cached["files"]
+                else:
+                    file_names = list_category_images(category_entry.path)
+                    old_names = set(cached["files"]) if cached else set()
+                    changes[category_name] = ([name for name in file_names if name not in old_names],
+                                              sorted(old_names.difference(file_names)))
+                folders[category_name] = {"key": cache_key, "files": file_names}
+
+        removed = sorted(set(cache) - set(folders))
+        for category_name in removed:
+            changes[category_name] = ([], cache[category_name]["files"])
+        rescanned = len(changes) - len(removed)
+        metrics.add('update.categories_rescanned', rescanned)
+        metrics.add('update.scan_cache_hits', len(folders) - rescanned)
+        metrics.add('update.files_scanned', sum(len(entry["files"]) for entry in folders.values()))
+        print(f"Rescanned {rescanned} of {len(folders)} categories"
+              + (f" (changed: {', '.join(sorted(set(changes) - set(removed)))})" if rescanned and cache else "")
+              + (f"; removed: {', '.join(removed)}" if removed else ""))
+
+        if not cache or (catalog is not None and catalog_digest(catalog) != cached_catalog):
+            changes = None
+        return folders, changes
     except Exception as e:
         print(f"Error scanning gallery folders: {e}")
-        return {}
+        return {}, None
+
+def gallery_structure(folders):
+    """The {category folder: [{"file_name", "relative_path"}]} input of update_gallery_json()"""
+    return {
+        category_name: [{"file_name": file_name, "relative_path": f"gallery/{category_name}/{file_name}"}
+                        for file_name in entry["files"]]
+        for category_name, entry in folders.items()
+    }
 
 def generate_alt_text(file_name, category):
     """Generate alt text based on the filename and category"""
@@ -67,42 +162,48 @@ def generate_alt_text(file_name, category):
     return f"{name} - {category.title()} photography"
 
 def update_gallery_json(existing_data, gallery_structure):
-    """Update the gallery JSON data based on scanned folder structure"""
+    """Update the gallery JSON data based on scanned folder structure
+
+    Categories and images are looked up through dict indexes built once per
+    call, so the merge is linear in the number of images.
+    """
     # If gallery data is completely empty, initialize with basic structure
     if not existing_data.get("categories"):
         existing_data["categories"] = []
     
-    # Create a lookup of existing images by their src path
+    # Create a lookup of existing images by their src path (the last occurrence wins)
     existing_images = {}
+    # Index categories by lowercased id and name; the first category to claim a key wins
+    categories_by_key = {}
     for category in existing_data["categories"]:
         for img in category.get("images", []):
             if "src" in img:
                 existing_images[img["src"]] = img
+        categories_by_key.setdefault(category.get("id", "").lower(), category)
+        categories_by_key.setdefault(category.get("name", "").lower(), category)
     
     # Create or update each category
     updated_categories = []
     
     for category_name, files in gallery_structure.items():
         # Look for existing category or create new one
-        existing_category = None
-        for category in existing_data["categories"]:
-            if category.get("id", "").lower() == category_name.lower() or \
-               category.get("name", "").lower() == category_name.lower():
-                existing_category = category
-                break
+        existing_category = categories_by_key.get(category_name.lower())
         
         if not existing_category:
             # Create new category
             title_name = category_name.replace('-', ' ').replace('_', ' ').title()
-            existing_category = {
+            existing_category = CatalogCategory({
                 "id": category_name,
                 "name": title_name,
                 "description": f"{title_name} photography collection", 
                 "images": []
-            }
+            })
         
-        # Create a set of existing image paths in this category
-        existing_category_srcs = {img.get("src") for img in existing_category.get("images", [])}
+        # Index the images currently in this category by src (the first occurrence wins).
+        # Built here rather than up front because two folders can map to the same category.
+        category_images = {}
+        for img in existing_category.get("images", []):
+            category_images.setdefault(img.get("src"), img)
         
         # Update images for this category
         updated_images = []
@@ -112,12 +213,9 @@ def update_gallery_json(existing_data, gallery_structure):
             file_name = file_info["file_name"]
             
             # Check if this image already exists in the category
-            if relative_path in existing_category_srcs:
-                # Find and retain the existing image data
-                for img in existing_category.get("images", []):
-                    if img.get("src") == relative_path:
-                        updated_images.append(img)
-                        break
+            if relative_path in category_images:
+                # Retain the existing image data
+                updated_images.append(category_images[relative_path])
             elif relative_path in existing_images:
                 # Image exists in another category, copy its metadata
                 img = existing_images[relative_path].copy()
@@ -126,10 +224,10 @@ def update_gallery_json(existing_data, gallery_structure):
             else:
                 # New image, create entry with generated alt text
                 # Omit description field by default for new images
-                updated_images.append({
+                updated_images.append(CatalogImage({
                     "src": relative_path,
                     "alt": generate_alt_text(file_name, category_name)
-                })
+                }))
         
         # Update the category with new images
         existing_category["images"] = updated_images
@@ -142,34 +240,277 @@ def update_gallery_json(existing_data, gallery_structure):
     existing_data["categories"] = updated_categories
     return existing_data
 
+def patch_gallery_data(data, changes):
+    """Apply the file changes of some category folders to the catalogue
+
+    changes maps category folders to the (added, removed) names of image files in
+    them (see scan_gallery_folders()). Only the categories of those folders are touched,
+    with the same results update_gallery_json() gives for them: folders map to categories
+    by lowercased id or name, new folders become new categories (with generated alt
+    text for their images) and categories whose folder is gone are removed. Returns
+    True if anything changed.
+    """
+    categories = data.setdefault("categories", [])
+    categories_by_key = {}
+    for category in categories:
+        categories_by_key.setdefault(category.get("id", "").lower(), category)
+        categories_by_key.setdefault(category.get("name", "").lower(), category)
+
+    changed = False
+    new_category = False
+    gone = set()
+    for category_name, (added, removed) in sorted(changes.items()):
+        category = categories_by_key.get(category_name.lower())
+        if not os.path.isdir(os.path.join(GALLERY_IMAGES_PATH, category_name)):
+            if category is not None:
+                gone.add(id(category))
+            continue
+        if category is None:
+            title_name = category_name.replace('-', ' ').replace('_', ' ').title()
+            category = CatalogCategory({
+                "id": category_name,
+                "name": title_name,
+                "description": f"{title_name} photography collection",
+                "images": []
+            })
+            categories.append(category)
+            categories_by_key[category_name.lower()] = category
+            new_category = changed = True
+        images = category.setdefault("images", [])
+        if removed:
+            removed_srcs = {f"gallery/{category_name}/{file_name}" for file_name in removed}
+            kept = [img for img in images if img.get("src") not in removed_srcs]
+            if len(kept) != len(images):
+                category["images"] = images = kept
+                changed = True
+        if added:
+            present = {img.get("src") for img in images}
+            for file_name in added:
+                relative_path = f"gallery/{category_name}/{file_name}"
+                if relative_path not in present:
+                    images.append(CatalogImage({"src": relative_path, "alt": generate_alt_text(file_name, category_name)}))
+                    present.add(relative_path)
+                    changed = True
+
+    if gone:
+        data["categories"] = categories = [category for category in categories if id(category) not in gone]
+        changed = True
+    if new_category:
+        categories.sort(key=lambda x: x.get("name", ""))
+    return changed
+
+def record_image_dimensions(data):
+    """Record width, height and byte size on every image entry
+
+    Dimensions come from the file header (see image_headers.py) and are cached by
+    size and mtime, so unchanged images are only stat()ed, never reopened.
+    Returns the number of images whose header had to be read.
+    """
+    try:
+        with open(DIMENSIONS_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        cache = {}
+    new_cache = {}
+    headers_read = 0
+    images_base_path = os.path.dirname(GALLERY_IMAGES_PATH)
+
+    for category in data.get("categories", []):
+        for img in category.get("images", []):
+            src = img.get("src")
+            if not src:
+                continue
+            if src not in new_cache:
+                try:
+                    stat = os.stat(os.path.join(images_base_path, src))
+                except OSError:
+                    # The file is gone: its old size must not outlive it (validation reports it missing)
+                    for key in ("width", "height", "bytes"):
+                        img.pop(key, None)
+                    continue
+                cached = cache.get(src)
+                if cached and cached[:2] == [stat.st_size, stat.st_mtime_ns]:
+                    new_cache[src] = cached
+                    metrics.add('update.dimensions_cache_hits')
+                else:
+                    try:
+                        size = read_image_size(os.path.join(images_base_path, src))
+                    except (OSError, struct.error, IndexError, ValueError) as e:
+                        print(f"Could not read image header for {src}: {e}")
+                        size = None
+                    width, height = size or (None, None)
+                    new_cache[src] = [stat.st_size, stat.st_mtime_ns, width, height]
+                    headers_read += 1
+            file_size, _, width, height = new_cache[src]
+            if width and height:
+                img["width"] = width
+                img["height"] = height
+            else:
+                img.pop("width", None)
+                img.pop("height", None)
+            img["bytes"] = file_size
+
+    try:
+        temp_path = DIMENSIONS_CACHE_PATH + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(new_cache, f)
+        os.replace(temp_path, DIMENSIONS_CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: could not save dimensions cache: {e}")
+    metrics.add('update.headers_read', headers_read)
+    return headers_read
+
+def fingerprint_assets(data):
+    """Map every image src to a content-hashed key in data["assets"]
+
+    sync_s3.py uploads each image under its hashed key with a long-lived Cache-Control
+    header, and siteConfig.s3.getImageUrl resolves srcs through this map. Replacing a
+    photo changes its hash and therefore its URL. Returns the number of files hashed.
+    """
+    cache = HashCache(CONTENT_HASH_CACHE_PATH, os.path.dirname(GALLERY_IMAGES_PATH))
+    assets = {}
+    for category in data.get("categories", []):
+        for img in category.get("images", []):
+            src = img.get("src")
+            if not src or src in assets:
+                continue
+            content_hash = cache.get(src)
+            if content_hash:
+                assets[src] = f"{ASSETS_DIR}/{content_hash[:20]}{os.path.splitext(src)[1].lower()}"
+    data["assets"] = assets
+    try:
+        cache.save()
+    except OSError as e:
+        print(f"Warning: could not save content hash cache: {e}")
+    metrics.add('update.files_hashed', cache.hashed)
+    metrics.add('update.hash_cache_hits', len(cache.used) - cache.hashed)
+    return cache.hashed
+
 def save_gallery_data(data):
-    """Save the updated gallery data back to the JSON file"""
+    """Save the updated gallery data back to the JSON file
+
+    Streamed category by category and swapped in atomically; the text is the same
+    as json.dump(data, f, indent=2) would write.
+    """
     try:
-        with open(GALLERY_DATA_PATH, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2)
+        write_catalog(data, GALLERY_DATA_PATH)
         print(f"Gallery data successfully updated at {GALLERY_DATA_PATH}")
         return True
     except Exception as e:
         print(f"Error saving gallery data: {e}")
         return False
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Update gallery-data.json from the folders under docs/images/gallery.")
+    parser.add_argument("--full-rescan", action="store_true",
+                        help="Ignore the scan cache and list every category folder again")
+    fingerprint = parser.add_mutually_exclusive_group()
+    fingerprint.add_argument("--fingerprint", action="store_true",
+                             help="Publish images under content-hashed names (stays on for later runs)")
+    fingerprint.add_argument("--no-fingerprint", action="store_true",
+                             help="Turn fingerprinting off and remove the asset map")
+    return parser.parse_args(argv)
+
+def shard_file_name(category_id, content):
+    """Build a content-hashed shard file name, so browsers can cache shards indefinitely"""
+    safe_id = re.sub(r'[^A-Za-z0-9_-]+', '-', category_id).strip('-') or "category"
+    return f"{safe_id}.{hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]}.json"
+
+def save_gallery_shards(data):
+    """Write the category index and one JSON shard per category
+
+    Shards that already exist are left untouched, new ones are written to a temporary
+    file first, and shards no longer referenced by the index are removed.
+    """
+    docs_path = os.path.dirname(GALLERY_INDEX_PATH)
+    shards_path = os.path.join(docs_path, GALLERY_SHARDS_DIR)
+    try:
+        os.makedirs(shards_path, exist_ok=True)
+        index = {"categories": []}
+        shard_names = set()
+        for category in data.get("categories", []):
+            images = category.get("images", [])
+            shard = {"id": category.get("id", ""), "images": images}
+            if "assets" in data:
+                shard["assets"] = {img["src"]: data["assets"][img["src"]] for img in images if img.get("src") in data["assets"]}
+            content = json.dumps(shard, separators=(',', ':'), default=json_default)
+            shard_name = shard_file_name(category.get("id", ""), content)
+            shard_names.add(shard_name)
+            shard_path = os.path.join(shards_path, shard_name)
+            if not os.path.exists(shard_path):
+                # Swapped in complete: an existing shard is never rewritten, so it must not be left truncated
+                temp_path = shard_path + '.tmp'
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(temp_path, shard_path)
+            entry = {key: value for key, value in category.items() if key != "images"}
+            entry["count"] = len(images)
+            if images:
+                entry["cover"] = {key: images[0][key] for key in ("src", "alt", "width", "height") if key in images[0]}
+            entry["shard"] = f"{GALLERY_SHARDS_DIR}/{shard_name}"
+            index["categories"].append(entry)
+
+        write_catalog(index, GALLERY_INDEX_PATH)
+
+        with os.scandir(shards_path) as entries:
+            for entry in entries:
+                if entry.is_file() and entry.name.endswith(".json") and entry.name not in shard_names:
+                    os.remove(entry.path)
+        print(f"Gallery index written to {GALLERY_INDEX_PATH} with {len(shard_names)} category shards")
+        return True
+    except Exception as e:
+        print(f"Error saving gallery shards: {e}")
+        return False
+
+def main(argv=None):
     """Main script execution"""
+    args = parse_args(argv)
+    metrics.setup_metrics('update_gallery_data.py')
     print("Starting gallery data update process...")
     
     # Load existing gallery data
-    gallery_data = load_gallery_data()
+    with metrics.span('update.load'):
+        gallery_data = load_gallery_data()
     print(f"Loaded gallery data with {len(gallery_data.get('categories', []))} categories")
     
     # Scan gallery folders for image files
-    gallery_structure = scan_gallery_folders()
-    print(f"Found {len(gallery_structure)} gallery categories")
+    scan_started = time.perf_counter()
+    with metrics.span('update.scan'):
+        folders, changes = scan_gallery_folders(full_rescan=args.full_rescan, catalog=gallery_data)
+    print(f"Found {len(folders)} gallery categories in {time.perf_counter() - scan_started:.3f}s")
+    
+    # Update gallery JSON with new structure: just the changed folders when the scan cache
+    # knows what changed since the catalogue was saved, otherwise every folder
+    with metrics.span('update.merge'):
+        if changes is None:
+            updated_data = update_gallery_json(gallery_data, gallery_structure(folders))
+        else:
+            patch_gallery_data(gallery_data, changes)
+            updated_data = gallery_data
+            metrics.add('update.categories_merged', len(changes))
+            print(f"Merged the changes of {len(changes)} categories")
+    
+    # Record image sizes so the page can reserve layout space before images load
+    with metrics.span('update.dimensions'):
+        headers_read = record_image_dimensions(updated_data)
+    print(f"Read image headers for {headers_read} new or changed images")
     
-    # Update gallery JSON with new structure
-    updated_data = update_gallery_json(gallery_data, gallery_structure)
+    # Fingerprinting stays enabled once the catalogue has an asset map
+    if args.no_fingerprint:
+        updated_data.pop("assets", None)
+    elif args.fingerprint or "assets" in updated_data:
+        with metrics.span('update.fingerprint'):
+            files_hashed = fingerprint_assets(updated_data)
+        print(f"Fingerprinted {len(updated_data['assets'])} images ({files_hashed} hashed)")
     
     # Save updated gallery data
-    success = save_gallery_data(updated_data)
+    with metrics.span('update.save'):
+        success = save_gallery_data(updated_data)
+        if success:
+            success = save_gallery_shards(updated_data)
+        # Only now, so that a failed save is merged again next time
+        if success and changes != {}:
+            save_scan_cache(folders, updated_data)
     
     if success:
         print("Gallery data update complete!")
@@ -183,6 +524,7 @@ def main():
             print(f"  - {category.get('name', 'Unnamed')}: {len(category.get('images', []))} images")
     else:
         print("Gallery data update failed")
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
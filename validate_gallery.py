@@ -0,0 +1,398 @@
+import os
+import sys
+import json
+import argparse
+
+import gallery_metrics as metrics
+from gallery_logging import setup_logging, log_message, print_error, print_success, print_info
+
+ABS_SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
+LOG_FILE_PATH = os.path.join(ABS_SCRIPT_DIR, 'debug_validate.log')
+
+# Configuration
+GALLERY_DATA_FILE = os.path.join(ABS_SCRIPT_DIR, 'docs', 'gallery-data.json')
+LOCAL_IMAGE_BASE_PATH = os.path.join(ABS_SCRIPT_DIR, 'docs', 'images')
+# Repository-relative forms, as git reports them
+GALLERY_DATA_GIT_PATH = 'docs/gallery-data.json'
+LOCAL_IMAGE_GIT_PATH = 'docs/images'
+LOCAL_GALLERY_IMAGE_PATH = os.path.join(LOCAL_IMAGE_BASE_PATH, 'gallery')
+
+class CatalogError(Exception):
+    """gallery-data.json cannot be read or does not have a 'categories' list."""
+
+def iter_catalog_records(path, stream=False):
+    """Parses gallery-data.json once and yields one record per catalogue entry.
+
+    Records are ('image', category_name, item) for every image item,
+    ('missing_images', category_name, None) for a category without an 'images'
+    list and ('asset', src, hashed_key) for each entry of the fingerprint map.
+
+    With stream=True the file is parsed incrementally with ijson, so only one
+    image item is held in memory at a time. The images of a category that lists
+    them before its name are held until the name is read.
+    """
+    if stream:
+        yield from _iter_catalog_stream(path)
+        return
+    try:
+        with open(path, 'r', encoding='utf-8') as f, metrics.span('validate.parse'):
+            gallery_data = json.load(f)
+    except json.JSONDecodeError as e:
+        raise CatalogError(f"gallery-data.json is not valid JSON: {e}")
+    except Exception as e:
+        raise CatalogError(f"Could not read gallery-data.json: {e}")
+    print_success("gallery-data.json is valid JSON")
+    if 'categories' not in gallery_data or not isinstance(gallery_data['categories'], list):
+        raise CatalogError("'categories' key missing or not a list in gallery-data.json")
+    for category in gallery_data['categories']:
+        if 'images' not in category or not isinstance(category['images'], list):
+            yield ('missing_images', category.get('name', 'N/A'), None)
+            continue
+        for item in category['images']:
+            yield ('image', category.get('name'), item)
+    for src, key in gallery_data.get('assets', {}).items():
+        yield ('asset', src, key)
+
+def _iter_catalog_stream(path):
+    try:
+        import ijson
+    except ImportError as e:
+        raise CatalogError(f"Streaming mode needs 'ijson': {e}. Please install it ('pip install ijson').")
+
+    saw_categories = False
+    category_name = None
+    has_images = False
+    waiting_for_name = [] # image items read before their category's name
+    builder = None
+    asset_src = None
+    try:
+        with open(path, 'rb') as f:
+            for prefix, event, value in ijson.parse(f):
+                if builder is not None:
+                    builder.event(event, value)
+                    if prefix == 'categories.item.images.item' and event in ('end_map', 'end_array'):
+                        if category_name is None:
+                            waiting_for_name.append(builder.value)
+                        else:
+                            yield ('image', category_name, builder.value)
+                        builder = None
+                elif prefix == 'categories.item.images.item':
+                    if event in ('start_map', 'start_array'):
+                        builder = ijson.ObjectBuilder()
+                        builder.event(event, value)
+                    elif category_name is None: # a bare scalar where an image object belongs
+                        waiting_for_name.append(value)
+                    else:
+                        yield ('image', category_name, value)
+                elif prefix == 'categories' and event == 'start_array':
+                    saw_categories = True
+                elif prefix == 'categories.item':
+                    if event == 'start_map':
+                        category_name, has_images = None, False
+                    elif event == 'end_map':
+                        # A category without a name reports its images without one, as json.load() does
+                        for item in waiting_for_name:
+                            yield ('image', category_name, item)
+                        waiting_for_name = []
+                        if not has_images:
+                            yield ('missing_images', category_name or 'N/A', None)
+                elif prefix == 'categories.item.name' and event == 'string':
+                    category_name = value
+                    for item in waiting_for_name:
+                        yield ('image', category_name, item)
+                    waiting_for_name = []
+                elif prefix == 'categories.item.images' and event == 'start_array':
+                    has_images = True
+                elif prefix == 'assets' and event == 'map_key':
+                    asset_src = value
+                elif prefix.startswith('assets.') and event == 'string' and asset_src is not None:
+                    yield ('asset', asset_src, value)
+                    asset_src = None
+    except ijson.JSONError as e:
+        raise CatalogError(f"gallery-data.json is not valid JSON: {e}")
+    except OSError as e:
+        raise CatalogError(f"Could not read gallery-data.json: {e}")
+    if not saw_categories:
+        raise CatalogError("'categories' key missing or not a list in gallery-data.json")
+    print_success("gallery-data.json is valid JSON")
+
+class ValidationPass:
+    """One check over the catalogue records. Subclasses print their own errors."""
+
+    def __init__(self):
+        self.errors = 0
+        self.structural_errors = 0
+
+    def structural_error(self):
+        self.errors += 1
+        self.structural_errors += 1
+
+    def check(self, category_name, item):
+        pass
+
+    def check_asset(self, src, key):
+        pass
+
+    def finish(self):
+        """Runs any deferred work, prints the summary and returns the error count."""
+        return self.errors
+
+class LocalFilesPass(ValidationPass):
+    """Every referenced image (and derivative) exists under docs/images.
+
+    With `only`, just the entries whose src is in that set are checked.
+    """
+
+    def __init__(self, only=None):
+        super().__init__()
+        self.only = only
+        self.image_references_count = 0
+
+    def check(self, category_name, item):
+        image_src = item['src']
+        if self.only is not None and image_src not in self.only:
+            return
+        self.image_references_count += 1
+        full_local_path = os.path.join(LOCAL_IMAGE_BASE_PATH, image_src.replace('/', os.sep))
+        if not os.path.exists(full_local_path):
+            print_error(f"Missing local file: {image_src} (Expected at {full_local_path})")
+            self.errors += 1
+        for variant in item.get('variants') or []:
+            if not isinstance(variant, dict) or 'src' not in variant:
+                continue # reported by run_passes
+            variant_path = os.path.join(LOCAL_IMAGE_BASE_PATH, variant['src'].replace('/', os.sep))
+            if not os.path.exists(variant_path):
+                print_error(f"Missing derivative file: {variant['src']} for {image_src} (Expected at {variant_path})")
+                self.errors += 1
+
+    def finish(self):
+        print_info(f"Found {self.image_references_count} image references in gallery-data.json")
+        metrics.add('validate.references_checked', self.image_references_count)
+        return self.errors
+
+class UnreferencedFilesPass(ValidationPass):
+    """Every file under docs/images/gallery is referenced by the catalogue.
+
+    With `candidates` (paths relative to docs/images), only those files are
+    checked instead of walking the gallery folder.
+    """
+
+    def __init__(self, candidates=None):
+        super().__init__()
+        self.candidates = candidates
+        self.referenced_images = set()
+
+    def check(self, category_name, item):
+        self.referenced_images.add(item['src'])
+
+    def finish(self):
+        print_info(f"Checking for unreferenced images in {LOCAL_GALLERY_IMAGE_PATH}...")
+        if not os.path.exists(LOCAL_GALLERY_IMAGE_PATH):
+            print_info(f"Local gallery image path {LOCAL_GALLERY_IMAGE_PATH} does not exist. Skipping unreferenced check.")
+            return self.errors
+        if self.candidates is not None:
+            gallery_folder = os.path.basename(LOCAL_GALLERY_IMAGE_PATH) + '/'
+            local_gallery_files = {path for path in self.candidates if path.startswith(gallery_folder)
+                                   and os.path.isfile(os.path.join(LOCAL_IMAGE_BASE_PATH, path.replace('/', os.sep)))}
+        else:
+            local_gallery_files = set()
+            with metrics.span('validate.walk'):
+                for root, _, files in os.walk(LOCAL_GALLERY_IMAGE_PATH):
+                    for file_name in files:
+                        relative_to_base = os.path.relpath(os.path.join(root, file_name), LOCAL_IMAGE_BASE_PATH)
+                        local_gallery_files.add(relative_to_base.replace(os.sep, '/'))
+        metrics.add('validate.files_listed', len(local_gallery_files))
+        unreferenced_files = local_gallery_files - self.referenced_images
+        if unreferenced_files:
+            print_error(f"Found {len(unreferenced_files)} unreferenced images in {LOCAL_GALLERY_IMAGE_PATH}:")
+            for unreferenced_file in unreferenced_files:
+                if unreferenced_file.startswith('gallery/'):
+                    print_error(f"  - {unreferenced_file}")
+                    self.errors += 1
+        else:
+            print_success(f"No unreferenced images found in {LOCAL_GALLERY_IMAGE_PATH}.")
+        return self.errors
+
+class S3Pass(ValidationPass):
+    """Every referenced image (and derivative) exists in the S3 bucket."""
+
+    def __init__(self, mode='head', jobs=None, rate_limit=None, retries=None, only=None):
+        super().__init__()
+        # Imported here so that local-only runs do not need 'requests'
+        import validate_gallery_s3
+        validate_gallery_s3.import_requests()
+        self.s3 = validate_gallery_s3
+        self.mode = mode
+        self.jobs = jobs or validate_gallery_s3.DEFAULT_JOBS
+        self.rate_limit = validate_gallery_s3.DEFAULT_RATE_LIMIT if rate_limit is None else rate_limit
+        self.retries = validate_gallery_s3.DEFAULT_RETRIES if retries is None else retries
+        self.only = only
+        self.image_srcs = []
+        self.image_references_count = 0
+        self.asset_keys = {}
+
+    def check(self, category_name, item):
+        if self.only is not None and item['src'] not in self.only:
+            return
+        self.image_srcs.append(item['src'])
+        self.image_references_count += 1
+        self.image_srcs.extend(variant['src'] for variant in item.get('variants') or []
+                               if isinstance(variant, dict) and 'src' in variant)
+
+    def check_asset(self, src, key):
+        self.asset_keys[src] = key
+
+    def finish(self):
+        s3 = self.s3
+        # Fingerprinted copies of referenced images must be uploaded too
+        referenced = set(self.image_srcs)
+        self.image_srcs.extend(key for src, key in self.asset_keys.items() if src in referenced)
+        print_info(f"Validating image references against S3 bucket: {s3.S3_BUCKET_NAME}/{s3.S3_PREFIX}")
+        empty_srcs = []
+        if self.mode == 'list':
+            try:
+                exists_in_s3, empty_srcs = s3.check_s3_images_by_listing(self.image_srcs)
+            except (s3.requests.exceptions.RequestException, s3.ElementTree.ParseError) as e:
+                print_error(f"Could not list S3 bucket contents: {e}. Use --mode=head if the bucket does not allow listing.")
+                return self.errors + 1
+            for image_src in empty_srcs:
+                print_error(f"Empty object in S3: {image_src}")
+        else:
+            print_info(f"Checking {len(self.image_srcs)} references with {self.jobs} concurrent requests...")
+            exists_in_s3 = s3.check_s3_images(self.image_srcs, jobs=self.jobs, rate_limit=self.rate_limit, retries=self.retries)
+        missing_in_s3_count = 0
+        unchecked_in_s3_count = 0
+        for image_src in self.image_srcs:
+            if exists_in_s3[image_src] is None:
+                print_error(f"S3 error (not checked): {image_src}")
+                unchecked_in_s3_count += 1
+            elif not exists_in_s3[image_src]:
+                print_error(f"Missing in S3: {image_src}")
+                missing_in_s3_count += 1
+        print_info(f"Checked {self.image_references_count} image references ({len(self.image_srcs)} files including derivatives and fingerprinted copies) against S3.")
+
+        self.errors += missing_in_s3_count + len(empty_srcs) + unchecked_in_s3_count
+        if self.errors == 0:
+            print_success("All S3 validations passed! All referenced images found in S3.")
+        else:
+            if missing_in_s3_count > 0:
+                print_error(f"{missing_in_s3_count} images are referenced in JSON but missing from S3.")
+            if empty_srcs:
+                print_error(f"{len(empty_srcs)} images exist in S3 but are zero bytes.")
+            if unchecked_in_s3_count > 0:
+                print_error(f"{unchecked_in_s3_count} images could not be checked: S3 kept returning errors or timing out "
+                            f"after {self.retries} retries. This is not a missing upload; try again later or raise --retries.")
+            if self.structural_errors:
+                print_error("Additional structural errors found in gallery-data.json during S3 validation.")
+            print_error(f"S3 validation failed with a total of {self.errors} errors.")
+        return self.errors
+
+def run_passes(records, passes):
+    """Feeds every record to every pass, reporting structural problems once."""
+    record_count = 0
+    for kind, name, value in records:
+        record_count += 1
+        if kind == 'asset':
+            for validation_pass in passes:
+                validation_pass.check_asset(name, value)
+        elif kind == 'missing_images':
+            print_error(f"Category '{name}' missing 'images' list.")
+            for validation_pass in passes:
+                validation_pass.structural_error()
+        elif not isinstance(value, dict) or 'src' not in value:
+            print_error(f"Image item in category '{name}' missing 'src' key: {value}")
+            for validation_pass in passes:
+                validation_pass.structural_error()
+        else:
+            for variant in value.get('variants') or []:
+                if not isinstance(variant, dict) or 'src' not in variant:
+                    print_error(f"Derivative of {value['src']} in category '{name}' missing 'src' key: {variant}")
+                    for validation_pass in passes:
+                        validation_pass.structural_error()
+            for validation_pass in passes:
+                validation_pass.check(name, value)
+    metrics.add('validate.records', record_count)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Validate gallery-data.json against local files and, optionally, S3 in a single pass.")
+    parser.add_argument('--s3', action='store_true', help="Also check that every referenced image exists in S3")
+    parser.add_argument('--skip-local', action='store_true',
+                        help="Skip the local file and unreferenced image checks")
+    parser.add_argument('--stream', action='store_true',
+                        help="Parse gallery-data.json incrementally (requires 'pip install ijson')")
+    parser.add_argument('--mode', choices=['head', 'list'], default='head', help="S3 check mode (see validate_gallery_s3.py)")
+    parser.add_argument('--jobs', type=int, default=None, help="Concurrent S3 requests")
+    parser.add_argument('--rate-limit', type=float, default=None, help="Maximum S3 requests per second per host")
+    parser.add_argument('--retries', type=int, default=None, help="Retries for S3 5xx responses and timeouts")
+    parser.add_argument('--changed-only', action='store_true',
+                        help="Only check the catalogue entries and image files staged in git (for the pre-commit hook)")
+    return parser.parse_args(argv)
+
+def staged_gallery_changes():
+    """Return (srcs, image_files) touched by the staged commit, or None if git cannot tell."""
+    import git_changes
+    try:
+        return git_changes.staged_gallery_changes(ABS_SCRIPT_DIR, GALLERY_DATA_GIT_PATH, LOCAL_IMAGE_GIT_PATH)
+    except git_changes.GitUnavailable as e:
+        log_message(f"Cannot read staged changes ({e}); checking everything.", level='WARNING')
+        return None
+
+def run(args, log_file_path=LOG_FILE_PATH, script_name='validate_gallery.py'):
+    """Runs the passes `args` selects (see parse_args) and exits with 1 if any of them failed.
+
+    validate_gallery_local.py and validate_gallery_s3.py call this with their own
+    log file, so all three report the same messages and exit codes.
+    """
+    setup_logging(log_file_path, script_name)
+    metrics.setup_metrics(script_name)
+    log_message(f"GALLERY_DATA_FILE = {GALLERY_DATA_FILE}", level='DEBUG')
+    print_info("Starting gallery validation...")
+
+    only = candidates = None
+    if args.changed_only:
+        staged = staged_gallery_changes()
+        if staged is not None:
+            only, candidates = staged
+            if not only:
+                print_success("No staged changes to gallery-data.json or docs/images; nothing to validate.")
+                sys.exit(0)
+            print_info(f"Checking {len(only)} staged catalogue entries and image files.")
+
+    local_passes = [] if args.skip_local else [LocalFilesPass(only), UnreferencedFilesPass(candidates)]
+    s3_passes = [S3Pass(args.mode, args.jobs, args.rate_limit, args.retries, only)] if args.s3 else []
+
+    print_info(f"Checking gallery-data.json at {GALLERY_DATA_FILE}")
+    if not os.path.exists(GALLERY_DATA_FILE):
+        print_error(f"gallery-data.json not found at {GALLERY_DATA_FILE}")
+        sys.exit(1)
+    try:
+        with metrics.span('validate.catalog'):
+            run_passes(iter_catalog_records(GALLERY_DATA_FILE, stream=args.stream), local_passes + s3_passes)
+    except CatalogError as e:
+        print_error(str(e))
+        sys.exit(1)
+
+    failed = False
+    if local_passes:
+        with metrics.span('validate.local'):
+            local_errors = sum(validation_pass.finish() for validation_pass in local_passes)
+        # Both local passes counted each structural error, but it is one problem
+        local_errors -= local_passes[1].structural_errors
+        if local_errors == 0:
+            print_success("All local validations passed!")
+        else:
+            print_error(f"Local validation failed with {local_errors} errors.")
+            failed = True
+    for validation_pass in s3_passes:
+        with metrics.span('validate.s3'):
+            if validation_pass.finish():
+                failed = True
+
+    sys.exit(1 if failed else 0)
+
+def main(argv=None):
+    run(parse_args(argv))
+
+if __name__ == "__main__":
+    main()
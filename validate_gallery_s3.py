@@ -1,143 +1,192 @@
 import os
 import sys
-import json
-
-# Attempt to set up logging as the VERY FIRST operation
-LOG_FILE_PATH = '' # Initialize
-ABS_SCRIPT_DIR = '' # Initialize
-try:
-    ABS_SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__) if '__file__' in locals() else os.getcwd())
-    LOG_FILE_PATH = os.path.join(ABS_SCRIPT_DIR, 'debug_validate_s3.log')
-    with open(LOG_FILE_PATH, 'w', encoding='utf-8') as lf:
-        lf.write("--- Log Start (validate_gallery_s3.py) ---\n")
-        lf.write(f"Initial log path: {LOG_FILE_PATH}\n")
-        lf.write(f"ABS_SCRIPT_DIR: {ABS_SCRIPT_DIR}\n")
-except Exception as e:
-    print(f"CRITICAL: Failed to initialize logging for validate_gallery_s3.py: {e}", file=sys.stderr)
-
-def log_message(message, level='INFO'):
-    formatted_message = f"{level}: {message}\n"
-    if level == 'ERROR':
-        print(formatted_message.strip(), file=sys.stderr)
-    else:
-        print(formatted_message.strip(), file=sys.stdout)
-    if LOG_FILE_PATH:
-        try:
-            with open(LOG_FILE_PATH, 'a', encoding='utf-8') as lf:
-                lf.write(formatted_message)
-        except Exception as e:
-            print(f"ERROR: Failed to write to log file {LOG_FILE_PATH}: {e}", file=sys.stderr)
-
-# Proceed with other imports AFTER basic logging is attempted
-try:
-    import requests # For HTTP HEAD requests
-    log_message("Successfully imported 'requests' library.", level='DEBUG')
-except ImportError as e:
-    log_message(f"Failed to import 'requests': {e}. Please ensure it is installed ('pip install requests').", level='ERROR')
-    sys.exit(1)
-except Exception as e:
-    log_message(f"An unexpected error occurred during imports: {e}", level='ERROR')
-    sys.exit(1)
-
-log_message(f"DEBUG: __file__ = {__file__ if '__file__' in locals() else 'not_defined'}", level='DEBUG')
-log_message(f"DEBUG: ABS_SCRIPT_DIR = {ABS_SCRIPT_DIR}", level='DEBUG')
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+
+import gallery_metrics as metrics
+import validate_gallery
+from gallery_logging import log_message, print_info
+
+ABS_SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
+# Logging is set up in main(), so importing this module (e.g. from joyful.py) does no work
+LOG_FILE_PATH = os.path.join(ABS_SCRIPT_DIR, 'debug_validate_s3.log')
+
+# 'requests' is imported on first use (see import_requests), as it takes longer to load than everything else here
+requests = None
 
 # Configuration
-GALLERY_DATA_FILE = os.path.join(ABS_SCRIPT_DIR, 'docs', 'gallery-data.json')
-log_message(f"DEBUG: GALLERY_DATA_FILE = {GALLERY_DATA_FILE}", level='DEBUG')
 S3_BUCKET_NAME = "photos-joyfulphotographs-com"
 S3_PREFIX = "website-images/"
+# Another S3-compatible endpoint to use instead of AWS, such as a local fake_s3.py server (path-style URLs)
+S3_ENDPOINT_URL = os.environ.get('JOYFUL_S3_ENDPOINT', '').rstrip('/') or None
 # Construct the base URL for S3 objects. Adjust if your region or URL format is different.
-S3_BASE_URL = f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/"
-
-def print_error(message):
-    log_message(message, level='ERROR')
-
-def print_success(message):
-    log_message(message, level='SUCCESS')
-
-def print_info(message):
-    log_message(message, level='INFO')
-
-def check_s3_image_exists(image_relative_path):
-    """Checks if an image exists in S3 using an HTTP HEAD request."""
+S3_BASE_URL = f"{S3_ENDPOINT_URL}/{S3_BUCKET_NAME}/" if S3_ENDPOINT_URL else f"https://{S3_BUCKET_NAME}.s3.amazonaws.com/"
+REQUEST_TIMEOUT = 5 # seconds per HEAD request
+DEFAULT_JOBS = 16
+DEFAULT_RATE_LIMIT = 100 # requests per second per host
+DEFAULT_RETRIES = 3
+RETRY_BACKOFF_SECONDS = 0.5
+LIST_PAGE_SIZE = 1000 # S3 never returns more than 1000 keys per ListObjectsV2 page
+S3_XML_NS = {'s3': 'http://s3.amazonaws.com/doc/2006-03-01/'}
+
+def import_requests():
+    """Imports 'requests' on first use and returns it."""
+    global requests
+    if requests is None:
+        try:
+            import requests as requests_module # For HTTP HEAD requests
+        except ImportError as e:
+            log_message(f"Failed to import 'requests': {e}. Please ensure it is installed ('pip install requests').", level='ERROR')
+            sys.exit(1)
+        requests = requests_module
+        log_message("Successfully imported 'requests' library.", level='DEBUG')
+    return requests
+
+class HostRateLimiter:
+    """Spaces out requests to each host so that at most `rate` start per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+def create_session(jobs=DEFAULT_JOBS):
+    """Creates a keep-alive session whose connection pool matches the worker count."""
+    import_requests()
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=max(jobs, 1))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def check_s3_image_exists(image_relative_path, session=None, rate_limiter=None, retries=0):
+    """Checks if an image exists in S3 using an HTTP HEAD request.
+
+    Returns True if it exists and False if S3 answers that it does not (any other 4xx).
+    5xx responses, throttling (429) and timeouts are retried up to `retries` times
+    with exponential backoff; if S3 still fails after that, or the request cannot be
+    sent at all, returns None: the image could not be checked, which is not the same
+    as missing.
+    """
     s3_key = os.path.join(S3_PREFIX, image_relative_path).replace("\\", "/")
     image_url = S3_BASE_URL + s3_key
-    
-    try:
-        response = requests.head(image_url, timeout=5) # 5 second timeout
-        if response.status_code == 200:
-            # print_info(f"Found in S3: {image_relative_path} (URL: {image_url})")
-            return True
-        else:
-            # print_error(f"Missing in S3 (HTTP {response.status_code}): {image_relative_path} (URL: {image_url})")
-            return False
-    except requests.exceptions.RequestException as e:
-        # print_error(f"HTTP request failed for {image_relative_path} (URL: {image_url}): {e}")
-        return False
-
-def main():
-    print_info("Starting S3 gallery validation...")
-    errors_found = 0
-
-    # 1. Check gallery-data.json exists and is valid JSON
-    print_info(f"Checking gallery-data.json at {GALLERY_DATA_FILE}")
-    if not os.path.exists(GALLERY_DATA_FILE):
-        print_error(f"gallery-data.json not found at {GALLERY_DATA_FILE}")
-        sys.exit(1)
-
-    try:
-        with open(GALLERY_DATA_FILE, 'r', encoding='utf-8') as f:
-            gallery_data = json.load(f)
-        print_success("gallery-data.json is valid JSON")
-    except json.JSONDecodeError as e:
-        print_error(f"gallery-data.json is not valid JSON: {e}")
-        sys.exit(1)
-    except Exception as e:
-        print_error(f"Could not read gallery-data.json: {e}")
-        sys.exit(1)
-
-    # 2. Validate image references in gallery_data.json against S3
-    image_references_count = 0
-    missing_in_s3_count = 0
-
-    if 'categories' not in gallery_data or not isinstance(gallery_data['categories'], list):
-        print_error("'categories' key missing or not a list in gallery-data.json")
-        sys.exit(1)
-
-    print_info(f"Validating image references against S3 bucket: {S3_BUCKET_NAME}/{S3_PREFIX}")
-    for category in gallery_data.get('categories', []):
-        if 'images' not in category or not isinstance(category['images'], list):
-            # This should ideally be caught by local validation first
-            print_error(f"Category '{category.get('name', 'N/A')}' missing 'images' list.")
-            errors_found +=1 # Count as a structural error too
-            continue
-        for item in category.get('images', []):
-            if 'src' not in item:
-                print_error(f"Image item in category '{category.get('name')}' missing 'src' key: {item}")
-                errors_found += 1
-                continue
-            
-            image_src = item['src'] # e.g., "gallery/sample-nature.jpg"
-            image_references_count += 1
-            
-            if not check_s3_image_exists(image_src):
-                print_error(f"Missing in S3: {image_src}")
-                missing_in_s3_count += 1
-    
-    print_info(f"Checked {image_references_count} image references against S3.")
-    errors_found += missing_in_s3_count
-
-    if errors_found == 0:
-        print_success("All S3 validations passed! All referenced images found in S3.")
-        sys.exit(0)
-    else:
-        if missing_in_s3_count > 0:
-            print_error(f"{missing_in_s3_count} images are referenced in JSON but missing from S3.")
-        if errors_found > missing_in_s3_count:
-             print_error("Additional structural errors found in gallery-data.json during S3 validation.")
-        print_error(f"S3 validation failed with a total of {errors_found} errors.")
-        sys.exit(1)
+    http = session or import_requests()
+    host = urlsplit(image_url).netloc
+
+    for attempt in range(retries + 1):
+        if rate_limiter:
+            rate_limiter.wait(host)
+        metrics.add('s3.requests')
+        try:
+            with metrics.timer('s3.head'):
+                response = http.head(image_url, timeout=REQUEST_TIMEOUT)
+            if response.status_code == 200:
+                return True
+            if response.status_code != 429 and response.status_code < 500:
+                return False
+            metrics.add('s3.throttled' if response.status_code in (429, 503) else 's3.server_errors')
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            metrics.add('s3.connection_errors')
+        except requests.exceptions.RequestException as e:
+            log_message(f"HEAD {image_url} failed: {e}", level='WARNING')
+            return None
+        if attempt < retries:
+            metrics.add('s3.retries')
+            time.sleep(RETRY_BACKOFF_SECONDS * (2 ** attempt))
+    log_message(f"HEAD {image_url} still failing after {retries} retries", level='WARNING')
+    return None
+
+def check_s3_images(image_relative_paths, jobs=DEFAULT_JOBS, rate_limit=DEFAULT_RATE_LIMIT, retries=DEFAULT_RETRIES):
+    """Checks many images concurrently over a shared session.
+
+    Returns a dict mapping each distinct path to True (found), False (missing) or
+    None (S3 errors or timeouts outlasted the retries).
+    """
+    unique_paths = list(dict.fromkeys(image_relative_paths))
+    if not unique_paths:
+        return {}
+    jobs = max(1, min(jobs, len(unique_paths)))
+    rate_limiter = HostRateLimiter(rate_limit)
+    with create_session(jobs) as session, ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(
+            lambda path: check_s3_image_exists(path, session, rate_limiter, retries),
+            unique_paths,
+        )
+        return dict(zip(unique_paths, results))
+
+def list_s3_objects(prefix=S3_PREFIX, session=None):
+    """Lists every object under `prefix` with paginated ListObjectsV2 requests.
+
+    Returns a dict mapping each key (relative to `prefix`) to its size and ETag,
+    so callers can answer existence and size questions without further requests.
+    """
+    http = session or import_requests()
+    objects = {}
+    params = {'list-type': '2', 'prefix': prefix, 'max-keys': str(LIST_PAGE_SIZE)}
+    while True:
+        metrics.add('s3.requests')
+        with metrics.timer('s3.list'):
+            response = http.get(S3_BASE_URL, params=params, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        root = ElementTree.fromstring(response.content)
+        for contents in root.iterfind('s3:Contents', S3_XML_NS):
+            key = contents.findtext('s3:Key', '', S3_XML_NS)
+            objects[key[len(prefix):]] = {
+                'size': int(contents.findtext('s3:Size', '0', S3_XML_NS)),
+                'etag': contents.findtext('s3:ETag', '', S3_XML_NS).strip('"'),
+            }
+        if root.findtext('s3:IsTruncated', 'false', S3_XML_NS) != 'true':
+            return objects
+        params['continuation-token'] = root.findtext('s3:NextContinuationToken', '', S3_XML_NS)
+
+def check_s3_images_by_listing(image_relative_paths):
+    """Checks many images against a single listing of the S3 prefix.
+
+    Returns (exists, empty): a dict mapping each path to True/False, and the
+    distinct paths whose object exists but is zero bytes.
+    """
+    print_info(f"Listing s3://{S3_BUCKET_NAME}/{S3_PREFIX} ...")
+    with create_session(1) as session:
+        s3_objects = list_s3_objects(S3_PREFIX, session)
+    print_info(f"Listed {len(s3_objects)} objects under {S3_PREFIX}")
+    exists = {path: path in s3_objects for path in image_relative_paths}
+    empty = [path for path in dict.fromkeys(image_relative_paths)
+             if path in s3_objects and s3_objects[path]['size'] == 0]
+    return exists, empty
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Validate that every image in gallery-data.json exists in S3.")
+    parser.add_argument('--mode', choices=['head', 'list'], default='head',
+                        help="'head' checks each image individually; 'list' lists the bucket prefix once and "
+                             "diffs it against the catalogue (requires list permission on the bucket)")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f"Number of concurrent HEAD requests (default: {DEFAULT_JOBS})")
+    parser.add_argument('--rate-limit', type=float, default=DEFAULT_RATE_LIMIT,
+                        help=f"Maximum requests per second per host, 0 for unlimited (default: {DEFAULT_RATE_LIMIT})")
+    parser.add_argument('--retries', type=int, default=DEFAULT_RETRIES,
+                        help=f"Retries for 5xx responses and timeouts (default: {DEFAULT_RETRIES})")
+    parser.add_argument('--changed-only', action='store_true',
+                        help="Only check catalogue entries added or changed in the staged commit (for the pre-commit hook)")
+    parser.set_defaults(s3=True, skip_local=True, stream=False)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    # The S3 pass of validate_gallery.py, on its own
+    validate_gallery.run(parse_args(argv), LOG_FILE_PATH, 'validate_gallery_s3.py')
 
 if __name__ == "__main__":
     log_message("This script uses the 'requests' library. If not installed, run: pip install requests", level='INFO')
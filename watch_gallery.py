@@ -0,0 +1,318 @@
+#!/usr/bin/env python
+"""
+Gallery Watch Mode
+
+Keeps gallery-data.json and the S3 bucket up to date while you work: drop photos into
+docs/images/gallery/<category> (or delete them) and within a few seconds the catalogue,
+the category shards and the bucket reflect the change.
+
+Only the files that changed are looked at. New images get a catalogue entry with
+generated alt text, removed images lose theirs, and just the changed files are queued
+for upload through the same manifest sync_s3.py uses. Bursts of events (copying a
+whole folder) are debounced into one batch. New images also get their resized derivatives
+(see generate_derivatives.py; needs Pillow), which are then uploaded like any other new
+file, and the pre-rendered gallery page is brought up to date as well (see render_gallery.py).
+
+File events come from the watchdog package (inotify on Linux, ReadDirectoryChangesW
+on Windows) when it is installed ('pip install watchdog'); otherwise, or with --poll,
+the tree is polled with os.scandir every --interval seconds.
+"""
+
+import os
+import sys
+
+from gallery_logging import setup_logging, log_message, print_error, print_success, print_info, print_warning
+
+import time
+import argparse
+import threading
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+SCRIPT_DIR = os.path.abspath(os.path.dirname(__file__))
+
+import update_gallery_data
+import render_gallery
+import generate_derivatives
+from update_gallery_data import (load_gallery_data, save_gallery_data, save_gallery_shards, patch_gallery_data,
+                                 record_image_dimensions, fingerprint_assets, SUPPORTED_EXTENSIONS)
+from sync_s3 import (LOCAL_IMAGE_BASE_PATH, DEFAULT_JOBS, scan_local_files, load_manifest, save_manifest,
+                     list_remote_objects, build_sync_plan, find_server_side_copies, build_asset_plan, create_s3_client, run_uploads,
+                     delete_objects, S3_BUCKET_NAME, S3_PREFIX)
+
+DEFAULT_DEBOUNCE = 1.0 # seconds without new events before a batch is processed
+DEFAULT_POLL_INTERVAL = 2.0
+GALLERY_FOLDER = os.path.basename(update_gallery_data.GALLERY_IMAGES_PATH) # "gallery", relative to docs/images
+
+def is_ignored(rel_path):
+    """Temporary files are written by our own tools (and editors) and renamed into place"""
+    return rel_path.endswith('.tmp')
+
+def catalog_folder(rel_path):
+    """Return the category folder of a gallery image path, or None for any other file"""
+    parts = rel_path.split('/')
+    if len(parts) == 3 and parts[0] == GALLERY_FOLDER and os.path.splitext(parts[2])[1].lower() in SUPPORTED_EXTENSIONS:
+        return parts[1]
+    return None
+
+def folder_changes(added, removed):
+    """Group added and removed gallery image paths by category folder, for patch_gallery_data()"""
+    changes = {}
+    for index, paths in enumerate((added, removed)):
+        for rel_path in sorted(paths):
+            _, folder, file_name = rel_path.split('/')
+            changes.setdefault(folder, ([], []))[index].append(file_name)
+    return changes
+
+class GalleryUpdater:
+    """Applies batches of changed paths to the catalogue and the bucket"""
+
+    def __init__(self, sync=True, delete=False, jobs=DEFAULT_JOBS):
+        self.sync = sync
+        self.delete = delete
+        self.jobs = jobs
+        self.client = None
+        self.local_files = {}
+        self.files = {}
+        self.assets = {}
+
+    def start(self):
+        """Take the initial snapshot and catch up with anything changed while not watching"""
+        self.local_files = {rel_path: stat for rel_path, stat in scan_local_files(LOCAL_IMAGE_BASE_PATH).items()
+                            if not is_ignored(rel_path)}
+        data = load_gallery_data()
+        on_disk = {rel_path for rel_path in self.local_files if catalog_folder(rel_path)}
+        in_catalog = {img["src"] for category in data.get("categories", []) for img in category.get("images", [])
+                      if catalog_folder(img.get("src", ""))}
+        if generate_derivatives.Image is None:
+            print_warning("Pillow is not installed ('pip install Pillow'); new images get no derivatives")
+        self.update_catalog(data, on_disk - in_catalog, in_catalog - on_disk, force_save=False)
+
+        if not self.sync:
+            return
+        manifest = load_manifest()
+        remote_objects = None
+        if manifest is None:
+            print_info(f"Listing s3://{S3_BUCKET_NAME}/{S3_PREFIX} to build the sync manifest...")
+            remote_objects = list_remote_objects(self.get_client())
+            manifest = ({}, {})
+        manifest_files, self.assets = manifest
+        uploads, deletes, self.files = build_sync_plan(self.local_files, manifest_files, remote_objects, delete=self.delete)
+        self.upload(uploads, deletes, data, remote_objects)
+
+    def get_client(self):
+        if self.client is None:
+            self.client = create_s3_client(self.jobs)
+        return self.client
+
+    def apply(self, changed_paths):
+        """Process one debounced batch of paths (relative to docs/images) that changed on disk"""
+        started = time.perf_counter()
+        present, removed = {}, set()
+        for rel_path in self.expand(changed_paths):
+            if is_ignored(rel_path):
+                continue
+            try:
+                stat = os.stat(os.path.join(LOCAL_IMAGE_BASE_PATH, rel_path))
+            except OSError:
+                if self.local_files.pop(rel_path, None) is not None:
+                    removed.add(rel_path)
+                continue
+            present[rel_path] = (stat.st_size, stat.st_mtime_ns)
+        added = {rel_path for rel_path in present if rel_path not in self.local_files}
+        modified = {rel_path for rel_path in present if self.local_files.get(rel_path, present[rel_path]) != present[rel_path]}
+        self.local_files.update(present)
+        if not (added or modified or removed):
+            return
+        print_info(f"Detected {len(added)} new, {len(modified)} changed and {len(removed)} removed files")
+
+        data = load_gallery_data() # re-read so hand edits made while watching are kept
+        catalog_changed = any(catalog_folder(rel_path) for rel_path in modified)
+        self.update_catalog(data, {p for p in added if catalog_folder(p)}, {p for p in removed if catalog_folder(p)},
+                            force_save=catalog_changed)
+
+        if self.sync:
+            uploads, _, unchanged = build_sync_plan({p: present[p] for p in added | modified}, self.files)
+            self.files.update(unchanged)
+            for rel_path, _ in uploads: # their objects are about to change, so they cannot be copy sources
+                self.files.pop(rel_path, None)
+            deletes = sorted(p for p in removed if p in self.files) if self.delete else []
+            for rel_path in removed:
+                self.files.pop(rel_path, None)
+            self.upload(uploads, deletes, data)
+        print_success(f"Batch processed in {time.perf_counter() - started:.2f}s")
+
+    def expand(self, changed_paths):
+        """Turn directory events into the files below them (moved or deleted folders send one event)"""
+        paths = set()
+        for rel_path in changed_paths:
+            full_path = os.path.join(LOCAL_IMAGE_BASE_PATH, rel_path)
+            if os.path.isdir(full_path):
+                paths.update(f"{rel_path}/{sub_path}" for sub_path in scan_local_files(full_path))
+            elif rel_path in self.local_files or os.path.exists(full_path):
+                paths.add(rel_path)
+            else:
+                prefix = rel_path + '/'
+                paths.update(p for p in self.local_files if p.startswith(prefix))
+                paths.add(rel_path)
+        return paths
+
+    def update_catalog(self, data, added, removed, force_save=False):
+        if not (patch_gallery_data(data, folder_changes(added, removed)) or force_save):
+            return
+        record_image_dimensions(data)
+        if generate_derivatives.Image is not None:
+            # Only new or changed images are encoded; removed ones lose their derivative files
+            encoded, _, failed = generate_derivatives.generate_derivatives(data)
+            if encoded or failed:
+                print_info(f"Derivatives: {encoded} images encoded, {failed} failed")
+        if "assets" in data:
+            fingerprint_assets(data)
+        if save_gallery_data(data) and save_gallery_shards(data):
+            print_info(f"Catalogue updated: {len(added)} images added, {len(removed)} removed")
+        else:
+            print_error("Failed to save the catalogue; see the messages above")
+            return
+        try:
+            render_gallery.render_page(data)
+        except (OSError, ValueError) as e:
+            print_error(f"Could not render the gallery page: {e}")
+
+    def upload(self, uploads, deletes, data, remote_objects=None):
+        uploads, copies = find_server_side_copies(uploads, self.files)
+        asset_uploads, self.assets = build_asset_plan(data.get("assets", {}), self.assets, self.local_files, remote_objects)
+        failures = 0
+        if uploads or asset_uploads or copies:
+            print_info(f"Uploading {len(uploads) + len(asset_uploads)} files, copying {len(copies)} identical ones...")
+            failures = run_uploads(self.get_client(), uploads, asset_uploads, self.files, self.assets, self.jobs,
+                                   copies=copies)
+        if deletes:
+            try:
+                failed_deletes = set(delete_objects(self.get_client(), deletes))
+            except Exception as e:
+                print_error(f"Failed to delete removed files from S3: {e}")
+                failed_deletes = set(deletes)
+            failures += len(failed_deletes)
+            for rel_path in deletes:
+                if rel_path in failed_deletes:
+                    print_error(f"Failed to delete {rel_path}")
+                else:
+                    log_message(f"delete: s3://{S3_BUCKET_NAME}/{S3_PREFIX}{rel_path}", level='INFO')
+        save_manifest(self.files, self.assets)
+        if failures:
+            print_warning(f"{failures} transfers failed; they are retried with the next change or sync_s3.py run")
+
+class ChangeCollector(FileSystemEventHandler):
+    """Collects changed paths from watchdog events and hands them out in debounced batches"""
+
+    def __init__(self, base_path):
+        super().__init__()
+        self.base_path = base_path
+        self.pending = set()
+        self.last_event = 0.0
+        self.condition = threading.Condition()
+
+    def on_any_event(self, event):
+        paths = [event.src_path, getattr(event, 'dest_path', '')]
+        with self.condition:
+            for path in paths:
+                if path:
+                    rel_path = os.path.relpath(os.fsdecode(path), self.base_path).replace(os.sep, '/')
+                    if not rel_path.startswith('..') and rel_path != '.':
+                        self.pending.add(rel_path)
+            self.last_event = time.monotonic()
+            self.condition.notify()
+
+    def wait_for_batch(self, debounce):
+        """Block until events have arrived and then stopped for `debounce` seconds"""
+        with self.condition:
+            while not self.pending:
+                self.condition.wait()
+            while (quiet := time.monotonic() - self.last_event) < debounce:
+                self.condition.wait(debounce - quiet)
+            batch, self.pending = self.pending, set()
+            return batch
+
+def process_batch(updater, changed_paths):
+    """Apply one batch, keeping the watcher alive if it fails"""
+    try:
+        updater.apply(changed_paths)
+    except Exception as e:
+        print_error(f"Failed to process changes: {e}")
+
+def watch_events(updater, debounce):
+    collector = ChangeCollector(LOCAL_IMAGE_BASE_PATH)
+    observer = Observer()
+    observer.schedule(collector, LOCAL_IMAGE_BASE_PATH, recursive=True)
+    observer.start()
+    try:
+        while True:
+            process_batch(updater, collector.wait_for_batch(debounce))
+    finally:
+        observer.stop()
+        observer.join()
+
+def watch_polling(updater, interval, debounce):
+    snapshot = scan_local_files(LOCAL_IMAGE_BASE_PATH)
+    pending = set()
+    last_change = 0.0
+    while True:
+        time.sleep(interval if not pending else min(interval, debounce))
+        current = scan_local_files(LOCAL_IMAGE_BASE_PATH)
+        changed = {rel_path for rel_path in current.keys() | snapshot.keys() if current.get(rel_path) != snapshot.get(rel_path)}
+        snapshot = current
+        if changed:
+            pending |= changed
+            last_change = time.monotonic()
+        elif pending and time.monotonic() - last_change >= debounce:
+            process_batch(updater, pending)
+            pending = set()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Watch docs/images and keep the catalogue and S3 in sync as files change.")
+    parser.add_argument('--poll', action='store_true', help="Poll the folder instead of using file system events")
+    parser.add_argument('--interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help=f"Seconds between scans when polling (default: {DEFAULT_POLL_INTERVAL})")
+    parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                        help=f"Seconds of quiet before a batch of changes is processed (default: {DEFAULT_DEBOUNCE})")
+    parser.add_argument('--no-sync', action='store_true', help="Only update the catalogue; do not upload to S3")
+    parser.add_argument('--delete', action='store_true', help="Also delete S3 objects of files removed locally")
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS,
+                        help=f"Number of concurrent uploads (default: {DEFAULT_JOBS})")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup_logging(os.path.join(SCRIPT_DIR, 'debug_watch.log'), 'watch_gallery.py')
+    # update_gallery_data.py works with paths relative to the repository root
+    os.chdir(SCRIPT_DIR)
+    if not os.path.isdir(LOCAL_IMAGE_BASE_PATH):
+        print_error(f"Local image directory not found: {LOCAL_IMAGE_BASE_PATH}")
+        sys.exit(1)
+
+    updater = GalleryUpdater(sync=not args.no_sync, delete=args.delete, jobs=args.jobs)
+    try:
+        updater.start()
+    except Exception as e:
+        print_error(f"Initial sync failed: {e}")
+        sys.exit(1)
+
+    use_events = Observer is not None and not args.poll
+    if not use_events and not args.poll:
+        print_info("watchdog is not installed ('pip install watchdog'); falling back to polling.")
+    print_info(f"Watching {LOCAL_IMAGE_BASE_PATH} ({'file system events' if use_events else f'polling every {args.interval}s'}). Press Ctrl+C to stop.")
+    try:
+        if use_events:
+            watch_events(updater, args.debounce)
+        else:
+            watch_polling(updater, args.interval, args.debounce)
+    except KeyboardInterrupt:
+        print_info("Stopped watching.")
+
+if __name__ == "__main__":
+    main()